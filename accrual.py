@@ -0,0 +1,364 @@
+import time
+from collections import defaultdict
+from datetime import date
+import logging
+from sqlalchemy import event
+from db import db
+from models import Guest, Room, Payment, BillingAccount, Accrual
+from receivables import invalidate_receivables
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rows written per transaction
+DEFAULT_CHUNK_SIZE = 5000
+
+# Payments with these statuses have not been received and do not reduce the balance
+UNPAID_STATUSES = ('informed & pending',)
+
+def to_paise(amount):
+    """Convert a rupee amount to integer paise"""
+    return int(round(float(amount or 0) * 100))
+
+def charge_paise(price_per_month, days):
+    """
+    Room charge for a number of days at a monthly price, in integer paise
+
+    The daily rate is a thirtieth of the monthly price. The total is rounded
+    once, half up, so no per-day rounding error accumulates.
+
+    Args:
+        price_per_month: float, monthly room price in rupees
+        days: int, number of days charged
+
+    Returns:
+        int: charge in paise
+    """
+    return (days * to_paise(price_per_month) * 2 + 30) // 60
+
+def billable_days(start, check_out_date, through_date):
+    """
+    Get the end and length of the period charged from ``start``
+
+    Args:
+        start: date, first day not yet charged
+        check_out_date: date the guest left, or None
+        through_date: date, first day not to charge
+
+    Returns:
+        tuple: (end date, days), days is 0 when nothing is due
+    """
+    end = through_date if check_out_date is None else min(through_date, check_out_date)
+    return end, max((end - start).days, 0)
+
+def _billing_cursor():
+    # Guests without an account start from their last bill, or their check-in
+    return db.func.coalesce(BillingAccount.accrued_through, Guest.last_bill_date, Guest.check_in_date)
+
+def accrue(through_date=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Charge every guest for the days since their billing cursor
+
+    One query loads each guest's room price, check-out date and cursor. The
+    new periods and paise amounts are computed in a single pass, and the
+    accrual rows and cursor moves are written in chunked bulk transactions.
+    Periods stop at ``check_out_date``, so guests who have left stop accruing,
+    and running twice for the same date charges nothing the second time.
+
+    Args:
+        through_date: date, first day not charged, defaults to today
+        chunk_size: int, guests written per transaction
+
+    Returns:
+        dict: guests charged, days, amount_paise, elapsed and guests_per_sec
+    """
+    through_date = through_date or date.today()
+    started = time.perf_counter()
+
+    cursor = _billing_cursor()
+    rows = db.session.query(
+        Guest.id, Guest.room_id, Room.price_per_month, Guest.check_out_date, cursor, BillingAccount.guest_id
+    ).join(Room, Guest.room_id == Room.id)\
+        .outerjoin(BillingAccount, BillingAccount.guest_id == Guest.id)\
+        .filter(cursor < through_date,
+                db.or_(Guest.check_out_date.is_(None), Guest.check_out_date > cursor))\
+        .all()
+
+    charges = []
+    for guest_id, room_id, price_per_month, check_out_date, start, account_id in rows:
+        end, days = billable_days(start, check_out_date, through_date)
+        if days:
+            charges.append((guest_id, room_id, start, end, days, charge_paise(price_per_month, days),
+                            account_id is not None))
+
+    accounts = BillingAccount.__table__
+    move_cursor = accounts.update()\
+        .where(accounts.c.guest_id == db.bindparam('b_guest_id'))\
+        .values(accrued_through=db.bindparam('b_end'),
+                charged_paise=accounts.c.charged_paise + db.bindparam('b_amount'))
+
+    for offset in range(0, len(charges), chunk_size):
+        chunk = charges[offset:offset + chunk_size]
+        accrual_rows = [{
+            'guest_id': guest_id, 'room_id': room_id, 'bill_id': None, 'period_start': start,
+            'period_end': end, 'days': days, 'amount_paise': amount
+        } for guest_id, room_id, start, end, days, amount, _ in chunk]
+        moved = [{'b_guest_id': guest_id, 'b_end': end, 'b_amount': amount}
+                 for guest_id, _, _, end, _, amount, has_account in chunk if has_account]
+        opened = [{'guest_id': guest_id, 'accrued_through': end, 'charged_paise': amount, 'paid_paise': 0}
+                  for guest_id, _, _, end, _, amount, has_account in chunk if not has_account]
+        try:
+            db.session.execute(Accrual.__table__.insert(), accrual_rows)
+            if moved:
+                db.session.execute(move_cursor, moved)
+            if opened:
+                db.session.execute(accounts.insert(), opened)
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error writing accruals: {str(e)}")
+            db.session.rollback()
+            raise
+
+    elapsed = time.perf_counter() - started
+    guests_per_sec = len(charges) / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Accrued charges through {through_date} for {len(charges)} guests "
+                f"in {elapsed:.2f}s ({guests_per_sec:.0f} guests/sec)")
+    return {
+        'guests': len(charges),
+        'days': sum(charge[4] for charge in charges),
+        'amount_paise': sum(charge[5] for charge in charges),
+        'elapsed': elapsed,
+        'guests_per_sec': guests_per_sec
+    }
+
+def accrue_guest(guest, room, through_date=None):
+    """
+    Charge one guest for the days since their billing cursor
+
+    Works inside the caller's transaction, so a manual bill can accrue, link
+    and move the cursor atomically. The caller commits.
+
+    Args:
+        guest: Guest model instance
+        room: Room model instance
+        through_date: date, first day not charged, defaults to today
+
+    Returns:
+        Accrual: the new accrual, or None if nothing was due
+    """
+    through_date = through_date or date.today()
+    account = db.session.get(BillingAccount, guest.id)
+    start = (account.accrued_through if account else None) or guest.last_bill_date or guest.check_in_date
+    end, days = billable_days(start, guest.check_out_date, through_date)
+    if not days:
+        return None
+
+    amount = charge_paise(room.price_per_month, days)
+    accrual = Accrual(guest_id=guest.id, room_id=room.id, period_start=start, period_end=end, days=days,
+                      amount_paise=amount)
+    db.session.add(accrual)
+    if account is None:
+        db.session.add(BillingAccount(guest_id=guest.id, accrued_through=end, charged_paise=amount, paid_paise=0))
+    else:
+        account.accrued_through = end
+        account.charged_paise = BillingAccount.charged_paise + amount
+    return accrual
+
+def link_unbilled(guest_id, bill_id):
+    """
+    Attach a guest's unbilled accruals to a bill
+
+    The caller commits.
+
+    Returns:
+        int: number of accruals linked
+    """
+    return Accrual.query.filter(Accrual.guest_id == guest_id, Accrual.bill_id.is_(None))\
+        .update({'bill_id': bill_id}, synchronize_session=False)
+
+def adjust_account(guest, room, bill_id, amount_paise):
+    """
+    Post an adjustment, such as a bill discount, to a guest's account
+
+    Recorded as a zero-day accrual on the bill, so the account balance and
+    ``rebuild_accounts`` both include it. The caller commits.
+
+    Args:
+        guest: Guest model instance
+        room: Room model instance
+        bill_id: int, bill the adjustment belongs to
+        amount_paise: int, change to the guest's charges, negative for a discount
+
+    Returns:
+        Accrual: the adjustment row
+    """
+    account = db.session.get(BillingAccount, guest.id)
+    cursor = (account.accrued_through if account else None) or guest.last_bill_date or guest.check_in_date
+    adjustment = Accrual(guest_id=guest.id, room_id=room.id, bill_id=bill_id, period_start=cursor,
+                         period_end=cursor, days=0, amount_paise=amount_paise)
+    db.session.add(adjustment)
+    if account is None:
+        db.session.add(BillingAccount(guest_id=guest.id, accrued_through=None, charged_paise=amount_paise,
+                                      paid_paise=0))
+    else:
+        account.charged_paise = BillingAccount.charged_paise + amount_paise
+    return adjustment
+
+def outstanding_balance(guest_id):
+    """
+    Get a guest's account balance as of their billing cursor
+
+    A single primary key read of the guest's billing account. This includes
+    accrued charges not yet billed; the bill and receivables pages show the
+    billed balance instead (``receivables.guest_balance``).
+
+    Returns:
+        int: charges minus received payments, in paise
+    """
+    account = db.session.get(BillingAccount, guest_id)
+    return account.balance_paise if account else 0
+
+def unbilled_charges(guest, room, through_date=None):
+    """
+    Get the days and amount a new bill for a guest would cover
+
+    Accrued charges not yet on a bill, plus the days between the billing
+    cursor and ``through_date`` that have not been accrued yet.
+
+    Args:
+        guest: Guest model instance
+        room: Room model instance
+        through_date: date, first day not charged, defaults to today
+
+    Returns:
+        tuple: (days, amount in paise)
+    """
+    through_date = through_date or date.today()
+    account = db.session.get(BillingAccount, guest.id)
+    start = (account.accrued_through if account else None) or guest.last_bill_date or guest.check_in_date
+    accrued_days, accrued_paise = db.session.query(db.func.sum(Accrual.days), db.func.sum(Accrual.amount_paise))\
+        .filter(Accrual.guest_id == guest.id, Accrual.bill_id.is_(None)).one()
+    _, days = billable_days(start, guest.check_out_date, through_date)
+    return (accrued_days or 0) + days, (accrued_paise or 0) + charge_paise(room.price_per_month, days)
+
+def amounts_owed(through_date=None):
+    """
+    Get what every guest owes as of a date, in one pass
+
+    Each guest's account balance plus the charge for days since their billing
+    cursor that have not been accrued yet, capped at check-out.
+
+    Args:
+        through_date: date, first day not charged, defaults to today
+
+    Returns:
+        dict: guest id to amount owed in paise, for guests with a non-zero amount
+    """
+    through_date = through_date or date.today()
+    rows = db.session.query(
+        Guest.id, Room.price_per_month, Guest.check_out_date, _billing_cursor(),
+        db.func.coalesce(BillingAccount.charged_paise - BillingAccount.paid_paise, 0)
+    ).join(Room, Guest.room_id == Room.id)\
+        .outerjoin(BillingAccount, BillingAccount.guest_id == Guest.id)\
+        .all()
+
+    owed = {}
+    for guest_id, price_per_month, check_out_date, start, balance in rows:
+        _, days = billable_days(start, check_out_date, through_date)
+        amount = balance + charge_paise(price_per_month, days)
+        if amount:
+            owed[guest_id] = amount
+    return owed
+
+def _paid_paise(payment_status, amount):
+    return 0 if payment_status in UNPAID_STATUSES else to_paise(amount)
+
+def _stored_payments(connection, objects):
+    # Paid amounts as the database holds them, before the flush rewrites the rows.
+    # Read from the table because expired attributes keep no history of their old value.
+    ids = [db.inspect(obj).identity[0] for obj in objects]
+    return [(guest_id, _paid_paise(payment_status, amount)) for guest_id, payment_status, amount in connection.execute(
+        db.select(Payment.guest_id, Payment.payment_status, Payment.amount).where(Payment.id.in_(ids))
+    )]
+
+def _updated_payments(session):
+    return [obj for obj in session.dirty if isinstance(obj, Payment) and session.is_modified(obj)]
+
+def _apply_payments(connection, deltas):
+    table = BillingAccount.__table__
+    for guest_id, amount in deltas.items():
+        updated = connection.execute(
+            table.update().where(table.c.guest_id == guest_id).values(paid_paise=table.c.paid_paise + amount)
+        )
+        if updated.rowcount == 0:
+            connection.execute(table.insert().values(guest_id=guest_id, charged_paise=0, paid_paise=amount))
+
+def _before_flush(session, flush_context, instances):
+    changed = _updated_payments(session) + [obj for obj in session.deleted if isinstance(obj, Payment)]
+    if changed:
+        with session.no_autoflush:
+            flush_context.attributes['accrual_previous'] = _stored_payments(session.connection(), changed)
+
+def _after_flush(session, flush_context):
+    deltas = defaultdict(int)
+    # Updated payments move from their old guest and amount to the new ones, deleted ones only leave
+    for guest_id, amount in flush_context.attributes.pop('accrual_previous', []):
+        deltas[guest_id] -= amount
+    for obj in list(session.new) + _updated_payments(session):
+        if isinstance(obj, Payment):
+            deltas[obj.guest_id] += _paid_paise(obj.payment_status, obj.amount)
+    deltas = {int(guest_id): amount for guest_id, amount in deltas.items() if amount}
+    if deltas:
+        _apply_payments(session.connection(), deltas)
+
+def register_accrual_events(session=None):
+    """
+    Keep billing account balances in step with Payment writes
+
+    Balances are updated inside the same transaction as the flush that writes
+    the payment. Bulk insert paths bypass session events, so run
+    ``rebuild_accounts`` after using them.
+
+    Args:
+        session: scoped session to listen on, defaults to ``db.session``
+    """
+    session = session or db.session
+    for name, listener in (('before_flush', _before_flush), ('after_flush', _after_flush)):
+        if not event.contains(session, name, listener):
+            event.listen(session, name, listener)
+
+def rebuild_accounts():
+    """
+    Rebuild every billing account from the accrual ledger and payment history
+
+    Returns:
+        int: number of accounts written
+    """
+    accrued = db.session.query(
+        Accrual.guest_id, db.func.max(Accrual.period_end), db.func.sum(Accrual.amount_paise)
+    ).group_by(Accrual.guest_id).all()
+    paid = db.session.query(
+        Payment.guest_id, db.func.sum(db.func.round(Payment.amount * 100))
+    ).filter(Payment.payment_status.notin_(UNPAID_STATUSES)).group_by(Payment.guest_id).all()
+
+    accounts = {guest_id: {'guest_id': guest_id, 'accrued_through': end, 'charged_paise': int(total),
+                           'paid_paise': 0}
+                for guest_id, end, total in accrued}
+    for guest_id, total in paid:
+        account = accounts.setdefault(guest_id, {'guest_id': guest_id, 'accrued_through': None,
+                                                 'charged_paise': 0, 'paid_paise': 0})
+        account['paid_paise'] = int(total or 0)
+
+    try:
+        BillingAccount.query.delete()
+        db.session.bulk_insert_mappings(BillingAccount, list(accounts.values()))
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Error rebuilding billing accounts: {str(e)}")
+        db.session.rollback()
+        raise
+
+    invalidate_receivables()
+    logger.info(f"Billing accounts rebuilt for {len(accounts)} guests")
+    return len(accounts)
@@ -0,0 +1,102 @@
+import logging
+from db import db
+from models import Guest, Room, ROOM_CAPACITIES
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def allocate_bed(room_id):
+    """
+    Claim one free bed in a room
+
+    The check and the increment happen in a single conditional UPDATE, so two
+    concurrent check-ins can never both take the last bed: the second one
+    matches no row once the first has committed. The claim is part of the
+    current transaction and is undone by a rollback.
+
+    Args:
+        room_id: int, room to allocate in
+
+    Returns:
+        bool: True if a bed was claimed, False if the room is full or missing
+    """
+    table = Room.__table__
+    result = db.session.execute(
+        table.update()
+        .where(table.c.id == room_id, table.c.beds_occupied < table.c.capacity)
+        .values(beds_occupied=table.c.beds_occupied + 1,
+                occupancy=table.c.beds_occupied + 1 >= table.c.capacity)
+    )
+    return result.rowcount == 1
+
+def available_rooms(room_type=None):
+    """
+    Get rooms with at least one free bed
+
+    Served from the (occupancy, room_type, room_number) index rather than a
+    scan of every room.
+
+    Args:
+        room_type: str, only rooms of this type (optional)
+
+    Returns:
+        list: Room objects ordered by room type and number
+    """
+    query = Room.query.filter_by(occupancy=False)
+    if room_type:
+        query = query.filter_by(room_type=room_type)
+    return query.order_by(Room.room_type, Room.room_number).all()
+
+def bed_occupancy():
+    """
+    Get bed totals across all rooms
+
+    Returns:
+        tuple: (beds occupied, total beds)
+    """
+    occupied, total = db.session.query(db.func.sum(Room.beds_occupied), db.func.sum(Room.capacity)).one()
+    return occupied or 0, total or 0
+
+def sync_room_occupancy(room_ids=None):
+    """
+    Recompute capacity and occupied beds from room types and current guests
+
+    Used to backfill databases created before rooms tracked beds, and after
+    bulk inserts that bypass ``allocate_bed``.
+
+    Args:
+        room_ids: iterable of room ids to update, defaults to every room
+
+    Returns:
+        int: number of rooms updated
+    """
+    table = Room.__table__
+    capacity = db.case(*[(table.c.room_type == room_type, beds) for room_type, beds in ROOM_CAPACITIES.items()],
+                       else_=1)
+    current_guests = db.select(db.func.count(Guest.id))\
+        .where(Guest.room_id == table.c.id, Guest.check_out_date.is_(None))\
+        .scalar_subquery()
+
+    updated = 0
+    try:
+        if room_ids is None:
+            updated = _sync_rooms(table, capacity, current_guests, None)
+        else:
+            room_ids = sorted(set(room_ids))
+            for start in range(0, len(room_ids), 500):
+                updated += _sync_rooms(table, capacity, current_guests, room_ids[start:start + 500])
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Error syncing room occupancy: {str(e)}")
+        db.session.rollback()
+        raise
+    return updated
+
+def _sync_rooms(table, capacity, current_guests, room_ids):
+    condition = table.c.id.in_(room_ids) if room_ids is not None else db.true()
+    db.session.execute(table.update().where(condition).values(capacity=capacity, beds_occupied=current_guests))
+    result = db.session.execute(
+        table.update().where(condition).values(occupancy=table.c.beds_occupied >= table.c.capacity)
+    )
+    return result.rowcount
@@ -0,0 +1,239 @@
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+import logging
+from db import db
+from models import Guest, Room, DailyLedger
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Default and longest span of the multi-year views
+DEFAULT_YEARS = 5
+MAX_YEARS = 10
+
+def year_span(start_year=None, end_year=None, years=DEFAULT_YEARS, max_years=MAX_YEARS):
+    """
+    Resolve a range of calendar years, ending with the current year by default
+
+    Returns:
+        tuple: (first date included, first date excluded, start_year, end_year)
+
+    Raises:
+        ValueError: if the range is reversed or longer than ``max_years``
+    """
+    end_year = end_year or date.today().year
+    start_year = start_year or end_year - years + 1
+    if start_year > end_year:
+        raise ValueError('start_year must not be after end_year')
+    if end_year - start_year + 1 > max_years:
+        raise ValueError(f"a range of at most {max_years} years can be requested")
+    return date(start_year, 1, 1), date(end_year + 1, 1, 1), start_year, end_year
+
+def _months(start, end):
+    # (year, month) for every month touching the half-open range
+    months = []
+    year, month = start.year, start.month
+    while date(year, month, 1) < end:
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+def _label(year, month):
+    return f"{year:04d}-{month:02d}"
+
+def _ledger_by_month(start, end, *columns, filters=()):
+    # Sum the daily ledger per (year, month, *columns) inside the database
+    year = db.extract('year', DailyLedger.day)
+    month = db.extract('month', DailyLedger.day)
+    return db.session.query(year, month, *columns, db.func.sum(DailyLedger.total))\
+        .filter(DailyLedger.day >= start, DailyLedger.day < end, *filters)\
+        .group_by(year, month, *columns).all()
+
+def monthly_trends(start, end):
+    """
+    Get income, expenses and net per month for a half-open date range
+
+    Args:
+        start: date, first day included
+        end: date, first day excluded
+
+    Returns:
+        dict: months as 'YYYY-MM' strings with zero-filled income, expenses and net lists
+    """
+    rows = _ledger_by_month(start, end, DailyLedger.kind)
+    totals = {(int(year), int(month), kind): total for year, month, kind, total in rows}
+    months = _months(start, end)
+    income = [totals.get((year, month, 'income'), 0) for year, month in months]
+    expenses = [totals.get((year, month, 'expense'), 0) for year, month in months]
+    return {
+        'months': [_label(year, month) for year, month in months],
+        'income': income,
+        'expenses': expenses,
+        'net': [i - e for i, e in zip(income, expenses)]
+    }
+
+def year_over_year(start_year=None, end_year=None):
+    """
+    Get monthly income and expenses side by side for each year, with yearly growth
+
+    Args:
+        start_year: int, first year included, defaults to five years back
+        end_year: int, last year included, defaults to the current year
+
+    Returns:
+        dict: years, per-year monthly series and per-year totals with income growth in percent
+    """
+    start, end, start_year, end_year = year_span(start_year, end_year)
+    trends = monthly_trends(start, end)
+
+    series = {}
+    totals = {}
+    previous = None
+    for index, year in enumerate(range(start_year, end_year + 1)):
+        months = slice(index * 12, index * 12 + 12)
+        income = trends['income'][months]
+        expenses = trends['expenses'][months]
+        total_income = sum(income)
+        series[year] = {'income': income, 'expenses': expenses}
+        totals[year] = {
+            'income': total_income,
+            'expenses': sum(expenses),
+            'net': total_income - sum(expenses),
+            'income_growth': ((total_income - previous) / previous * 100) if previous else None
+        }
+        previous = total_income
+
+    return {'years': list(range(start_year, end_year + 1)), 'series': series, 'totals': totals}
+
+def expense_categories_by_year(start_year=None, end_year=None):
+    """
+    Get expense totals per category for each year
+
+    Returns:
+        dict: years, categories (largest overall first) and a per-category list of yearly totals
+    """
+    start, end, start_year, end_year = year_span(start_year, end_year)
+    year = db.extract('year', DailyLedger.day)
+    rows = db.session.query(year, DailyLedger.category, db.func.sum(DailyLedger.total))\
+        .filter(DailyLedger.kind == 'expense', DailyLedger.day >= start, DailyLedger.day < end)\
+        .group_by(year, DailyLedger.category).all()
+
+    years = list(range(start_year, end_year + 1))
+    series = defaultdict(lambda: [0] * len(years))
+    for row_year, category, total in rows:
+        series[category][int(row_year) - start_year] = total
+    categories = sorted(series, key=lambda category: -sum(series[category]))
+    return {'years': years, 'categories': categories, 'series': {category: series[category] for category in categories}}
+
+def revenue_by_room_type(start, end):
+    """
+    Get income per month split by the paying guest's room type
+
+    Args:
+        start: date, first day included
+        end: date, first day excluded
+
+    Returns:
+        dict: months as 'YYYY-MM' strings and a zero-filled list per room type
+    """
+    rows = _ledger_by_month(start, end, DailyLedger.category, filters=(DailyLedger.kind == 'income',))
+    months = _months(start, end)
+    index = {month: i for i, month in enumerate(months)}
+    series = defaultdict(lambda: [0] * len(months))
+    for year, month, room_type, total in rows:
+        # Income recorded before the ledger kept room types has no category
+        series[room_type or 'unknown'][index[(int(year), int(month))]] += total
+    return {'months': [_label(year, month) for year, month in months], 'series': dict(sorted(series.items()))}
+
+def _stay_counts(column, end):
+    # Arrivals or departures per (day, room type), counted in the database
+    return db.session.query(column, Room.room_type, db.func.count(Guest.id))\
+        .join(Room, Guest.room_id == Room.id)\
+        .filter(column.isnot(None), column < end)\
+        .group_by(column, Room.room_type).all()
+
+def monthly_occupancy(start, end):
+    """
+    Get the share of bed-nights occupied per month, overall and per room type
+
+    Arrivals and departures are counted per day in the database, and a single
+    walk over the days turns them into the number of occupied beds each night.
+    A guest occupies a bed from check-in up to, not including, check-out.
+    Rates are against the current bed count, and days after today are left
+    out so open stays are not projected forward.
+
+    Args:
+        start: date, first day included
+        end: date, first day excluded
+
+    Returns:
+        dict: months, guest_nights, occupancy_rate and by_room_type rates, in percent
+    """
+    end = min(end, date.today() + timedelta(days=1))
+    if end <= start:
+        return {'months': [], 'guest_nights': [], 'occupancy_rate': [], 'by_room_type': {}}
+    beds = dict(db.session.query(Room.room_type, db.func.sum(Room.capacity)).group_by(Room.room_type).all())
+    room_types = sorted(beds)
+
+    changes = defaultdict(lambda: defaultdict(int))
+    occupied = defaultdict(int)
+    for column, sign in ((Guest.check_in_date, 1), (Guest.check_out_date, -1)):
+        for day, room_type, count in _stay_counts(column, end):
+            if day < start:
+                occupied[room_type] += sign * count
+            else:
+                changes[day][room_type] += sign * count
+
+    months = _months(start, end)
+    index = {month: i for i, month in enumerate(months)}
+    nights = {room_type: [0] * len(months) for room_type in room_types}
+    days_counted = [0] * len(months)
+    day = start
+    while day < end:
+        for room_type, change in changes.get(day, {}).items():
+            occupied[room_type] += change
+        i = index[(day.year, day.month)]
+        days_counted[i] += 1
+        for room_type in room_types:
+            nights[room_type][i] += occupied[room_type]
+        day += timedelta(days=1)
+
+    def rate(guest_nights, bed_count, days):
+        capacity = bed_count * days
+        return round(guest_nights / capacity * 100, 2) if capacity else 0
+
+    total_beds = sum(beds.values())
+    guest_nights = [sum(nights[room_type][i] for room_type in room_types) for i in range(len(months))]
+    return {
+        'months': [_label(year, month) for year, month in months],
+        'guest_nights': guest_nights,
+        'occupancy_rate': [rate(guest_nights[i], total_beds, days_counted[i]) for i in range(len(months))],
+        'by_room_type': {room_type: [rate(nights[room_type][i], beds[room_type], days_counted[i])
+                                     for i in range(len(months))]
+                         for room_type in room_types}
+    }
+
+def multi_year_summary(start_year=None, end_year=None):
+    """
+    Get every multi-year view for a range of years in one call
+
+    Returns:
+        dict: start_year, end_year, trends, year_over_year, expense_categories,
+        revenue_by_room_type, occupancy and elapsed_ms
+    """
+    started = time.perf_counter()
+    start, end, start_year, end_year = year_span(start_year, end_year)
+    summary = {
+        'start_year': start_year,
+        'end_year': end_year,
+        'trends': monthly_trends(start, end),
+        'year_over_year': year_over_year(start_year, end_year),
+        'expense_categories': expense_categories_by_year(start_year, end_year),
+        'revenue_by_room_type': revenue_by_room_type(start, end),
+        'occupancy': monthly_occupancy(start, end)
+    }
+    summary['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"Analytics for {start_year}-{end_year} computed in {summary['elapsed_ms']}ms")
+    return summary
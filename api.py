@@ -0,0 +1,203 @@
+import hashlib
+from datetime import date, datetime, timezone
+import logging
+from db import db
+from models import Guest, Room, Bill, Payment, Expense
+from pagination import MAX_PAGE_SIZE
+from table_versions import table_versions
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+API_VERSION = 'v1'
+
+class ApiError(ValueError):
+    """Invalid API request, reported to the client as a 400"""
+
+class Resource:
+    """
+    A model exposed through the JSON API
+
+    Args:
+        model: SQLAlchemy model class
+        fields: dict of field name to column or SQL expression
+        default_fields: field names returned when the client selects none
+        filters: dict of query argument to the column it must equal
+    """
+
+    def __init__(self, model, fields, default_fields, filters=None):
+        self.model = model
+        self.fields = fields
+        self.default_fields = default_fields
+        self.filters = filters or {}
+        self.tables = (model.__tablename__,)
+
+RESOURCES = {
+    'rooms': Resource(Room, {
+        'id': Room.id,
+        'room_number': Room.room_number,
+        'room_type': Room.room_type,
+        'price_per_month': Room.price_per_month,
+        'capacity': Room.capacity,
+        'beds_occupied': Room.beds_occupied,
+        'free_beds': Room.capacity - Room.beds_occupied,
+        'occupancy': Room.occupancy
+    }, ('id', 'room_number', 'room_type', 'price_per_month', 'capacity', 'beds_occupied', 'free_beds'),
+        filters={'room_type': Room.room_type, 'occupancy': Room.occupancy}),
+    'guests': Resource(Guest, {
+        'id': Guest.id,
+        'full_name': Guest.full_name,
+        'citizen_number': Guest.citizen_number,
+        'email': Guest.email,
+        'emergency_contact': Guest.emergency_contact,
+        'address': Guest.address,
+        'date_of_birth': Guest.date_of_birth,
+        'food_preference': Guest.food_preference,
+        'room_id': Guest.room_id,
+        'check_in_date': Guest.check_in_date,
+        'check_out_date': Guest.check_out_date,
+        'last_bill_date': Guest.last_bill_date
+    }, ('id', 'full_name', 'room_id', 'food_preference', 'check_in_date', 'check_out_date'),
+        filters={'room_id': Guest.room_id, 'food_preference': Guest.food_preference}),
+    'bills': Resource(Bill, {
+        'id': Bill.id,
+        'guest_id': Bill.guest_id,
+        'room_id': Bill.room_id,
+        'billing_month': Bill.billing_month,
+        'billing_year': Bill.billing_year,
+        'total_days': Bill.total_days,
+        'discount': Bill.discount,
+        'total_amount': Bill.total_amount,
+        'generated_date': Bill.generated_date,
+        'has_pdf': Bill.pdf_path.isnot(None)
+    }, ('id', 'guest_id', 'room_id', 'billing_month', 'billing_year', 'total_amount', 'generated_date'),
+        filters={'guest_id': Bill.guest_id, 'room_id': Bill.room_id,
+                 'billing_year': Bill.billing_year, 'billing_month': Bill.billing_month}),
+    'payments': Resource(Payment, {
+        'id': Payment.id,
+        'guest_id': Payment.guest_id,
+        'bill_id': Payment.bill_id,
+        'amount': Payment.amount,
+        'date': Payment.date,
+        'payment_status': Payment.payment_status
+    }, ('id', 'guest_id', 'bill_id', 'amount', 'date', 'payment_status'),
+        filters={'guest_id': Payment.guest_id, 'bill_id': Payment.bill_id, 'payment_status': Payment.payment_status}),
+    'expenses': Resource(Expense, {
+        'id': Expense.id,
+        'category': Expense.category,
+        'description': Expense.description,
+        'amount': Expense.amount,
+        'date': Expense.date
+    }, ('id', 'category', 'amount', 'date'),
+        filters={'category': Expense.category})
+}
+
+def get_resource(name):
+    """Look up an API resource by its URL name, or raise LookupError"""
+    try:
+        return RESOURCES[name]
+    except KeyError:
+        raise LookupError(f"Unknown resource: {name}")
+
+def select_fields(resource, fields_arg):
+    """
+    Resolve a comma separated ``fields`` query argument
+
+    Returns:
+        list: field names, the resource defaults when none are given
+    """
+    if not fields_arg:
+        return list(resource.default_fields)
+    fields = [field.strip() for field in fields_arg.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in resource.fields]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(fields))
+
+def _filter_value(column, value):
+    python_type = column.type.python_type
+    if python_type is bool:
+        if value.lower() not in ('true', 'false', '1', '0'):
+            raise ApiError(f"Invalid value for {column.key}: {value}")
+        return value.lower() in ('true', '1')
+    try:
+        return python_type(value)
+    except ValueError:
+        raise ApiError(f"Invalid value for {column.key}: {value}")
+
+def validators(resource, args):
+    """
+    Get the ETag and Last-Modified time of a resource from its table versions
+
+    The ETag covers the table versions and the query arguments, so it can be
+    checked without loading any rows.
+
+    Returns:
+        tuple: (unquoted ETag string, last modified datetime in UTC or None)
+    """
+    versions, last_modified = table_versions(resource.tables)
+    query = '&'.join(f"{key}={value}" for key, value in sorted(args.items(multi=True)))
+    digest = hashlib.sha1(query.encode()).hexdigest()[:12]
+    etag = f"{API_VERSION}-{resource.model.__tablename__}-{'.'.join(map(str, versions))}-{digest}"
+    if last_modified is not None:
+        last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+    return etag, last_modified
+
+def _serialize(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def _rows(resource, fields, conditions, limit):
+    # Select only the requested columns; the id is always read for the cursor
+    columns = [resource.fields['id']] + [resource.fields[field].label(field) for field in fields]
+    rows = db.session.query(*columns).filter(*conditions)\
+        .order_by(resource.fields['id']).limit(limit).all()
+    return [(row[0], {field: _serialize(value) for field, value in zip(fields, row[1:])}) for row in rows]
+
+def list_items(resource, args, default_per_page):
+    """
+    Get one page of a resource, ordered by id
+
+    Pages continue from the ``after_id`` argument with an index range
+    condition instead of OFFSET.
+
+    Args:
+        resource: Resource to list
+        args: request query arguments
+        default_per_page: int, page size when ``per_page`` is not given
+
+    Returns:
+        dict: data, per_page and next_after_id (None on the last page)
+    """
+    fields = select_fields(resource, args.get('fields'))
+    try:
+        per_page = max(1, min(int(args.get('per_page', default_per_page)), MAX_PAGE_SIZE))
+        after_id = int(args.get('after_id', 0))
+    except ValueError:
+        raise ApiError('per_page and after_id must be integers')
+
+    conditions = [resource.fields['id'] > after_id]
+    for name, column in resource.filters.items():
+        if name in args:
+            conditions.append(column == _filter_value(column, args[name]))
+
+    rows = _rows(resource, fields, conditions, per_page + 1)
+    next_after_id = rows[per_page - 1][0] if len(rows) > per_page else None
+    return {
+        'data': [item for _, item in rows[:per_page]],
+        'per_page': per_page,
+        'next_after_id': next_after_id
+    }
+
+def get_item(resource, item_id, args):
+    """
+    Get a single resource item by id
+
+    Returns:
+        dict: the selected fields, or None if there is no such item
+    """
+    fields = select_fields(resource, args.get('fields'))
+    rows = _rows(resource, fields, [resource.fields['id'] == item_id], 1)
+    return rows[0][1] if rows else None
@@ -1,11 +1,39 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file
-from datetime import datetime, timedelta
+from flask import Flask, current_app, render_template, request, redirect, url_for, flash, jsonify, abort, Response, stream_with_context
+from datetime import datetime, date, timedelta
 import os
+import calendar
+import click
+from flask.cli import AppGroup
 from config import Config
-from db import init_db, db
-from models import Guest, Room, Bill, Payment, Expense
-from utils import calculate_bill, generate_bill_pdf, generate_monthly_report_pdf, auto_generate_bills
-from apscheduler.schedulers.background import BackgroundScheduler
+from db import init_db, create_schema, db
+from sqlalchemy.orm import contains_eager, selectinload
+from models import Guest, Room, Bill, Payment, Expense, Document, RenderJob, JobRun
+from utils import generate_monthly_report_pdf, month_range
+from monthly_report import report_totals, income_page, expense_page, iter_income_rows, iter_expense_rows
+from allocation import allocate_bed, available_rooms, sync_room_occupancy
+from accrual import (register_accrual_events, rebuild_accounts, accrue, unbilled_charges,
+                     to_paise, accrue_guest, link_unbilled, adjust_account)
+from receivables import register_receivables_events, receivables_cache, guest_balance, AGING_BUCKETS
+from ledger import register_ledger_events, rebuild_ledger, daily_series, category_totals
+from analytics import (year_span, monthly_trends, year_over_year, expense_categories_by_year, revenue_by_room_type,
+                       monthly_occupancy, multi_year_summary)
+from api import API_VERSION, RESOURCES, ApiError, get_resource, validators, list_items, get_item
+from table_versions import register_version_events
+from dashboard import dashboard_cache, dashboard_version, dashboard_stats, recent_bills, register_dashboard_events
+from fragment_cache import load_backend
+from bill_archive import archive_entries, stream_bill_archive, bill_download_name
+from documents import (latest_bill_document, report_document, send_document, apply_retention,
+                       index_existing_documents, bill_storage_report)
+from pagination import keyset_paginate, date_range_filter, parse_date_arg, MAX_PAGE_SIZE
+from render_queue import RenderQueue
+from render_farm import render_farm
+from job_scheduler import LeaderScheduler, SCHEDULED_JOBS, execute_job
+from report_cache import ReportCache
+from query_monitor import QueryMonitor
+from metrics import RequestMetrics, render_metrics
+from bulk_io import import_rows, export_rows, TABLES, DEFAULT_BATCH_SIZE
+from synthetic_data import generate as generate_synthetic_data
+import threading
 import logging
 
 # Create context processor to inject datetime
@@ -17,69 +45,53 @@ def inject_datetime():
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Flask app
-app = Flask(__name__, static_url_path='', static_folder='static')
-app.config.from_object(Config)
+# Routes, error handlers and CLI commands, registered on each app by ``create_app``
+views = []
+error_handlers = {}
+commands = AppGroup('hostel')
 
-# Create static folder if it doesn't exist
-if not os.path.exists('static'):
-    os.makedirs('static')
+def route(rule, **options):
+    """Collect a view function to be registered by ``create_app``"""
+    def decorator(view):
+        views.append((rule, view, options))
+        return view
+    return decorator
 
-# Initialize database
-init_db(app)
+def errorhandler(code):
+    """Collect an error handler to be registered by ``create_app``"""
+    def decorator(handler):
+        error_handlers[code] = handler
+        return handler
+    return decorator
 
-# Register context processor
-app.context_processor(inject_datetime)
+# Scheduler for automatic bill generation and document retention, run by one elected worker
+scheduler = LeaderScheduler()
 
-# Initialize scheduler for automatic bill generation
-scheduler = BackgroundScheduler()
-scheduler.add_job(auto_generate_bills, 'cron', day=27)
-scheduler.start()
+# Background queue for bill PDF rendering
+render_queue = RenderQueue()
 
-@app.route('/')
+# Cache for monthly reports
+report_cache = ReportCache()
+
+# Warn about N+1 query patterns in development
+query_monitor = QueryMonitor()
+
+# Record per-request latency, SQL, template and PDF timings
+request_metrics = RequestMetrics()
+
+@route('/')
 def index():
     """Dashboard route"""
     try:
-        # Get summary statistics
-        total_guests = Guest.query.count()
-        occupied_rooms = Room.query.filter_by(occupancy=True).count()
-        total_rooms = Room.query.count()
-        occupancy_rate = (occupied_rooms / total_rooms * 100) if total_rooms > 0 else 0
-        
-        # Get current month's income and expenses
-        current_month = datetime.now().month
-        current_year = datetime.now().year
-        
-        monthly_income = db.session.query(db.func.sum(Payment.amount))\
-            .filter(db.extract('month', Payment.date) == current_month,
-                   db.extract('year', Payment.date) == current_year)\
-            .scalar() or 0
-            
-        monthly_expenses = db.session.query(db.func.sum(Expense.amount))\
-            .filter(db.extract('month', Expense.date) == current_month,
-                   db.extract('year', Expense.date) == current_year)\
-            .scalar() or 0
-        
-        # Get recent bills
-        recent_bills = Bill.query.order_by(Bill.generated_date.desc()).limit(5).all()
-        
-        # Get daily income and expenses for the chart
-        daily_income = [monthly_income * 0.95, monthly_income * 0.9, monthly_income * 1.1,
-                       monthly_income * 0.95, monthly_income * 1.05, monthly_income]
-        daily_expenses = [monthly_expenses * 0.9, monthly_expenses * 0.85, monthly_expenses * 1.15,
-                         monthly_expenses * 0.9, monthly_expenses * 1.1, monthly_expenses]
-        dates = [(datetime.now().replace(day=1) + timedelta(days=x)).strftime('%Y-%m-%d') 
-                for x in range(6)]
-        
-        return render_template('index.html',
-                             total_guests=total_guests,
-                             occupancy_rate=round(occupancy_rate, 2),
-                             monthly_income=monthly_income,
-                             monthly_expenses=monthly_expenses,
-                             recent_bills=recent_bills,
-                             daily_income=daily_income,
-                             daily_expenses=daily_expenses,
-                             dates=dates)
+        # Summary numbers and the rendered recent bills are cached until a relevant write commits
+        today = datetime.now().date()
+        version = dashboard_version()
+        stats = dashboard_cache.get_or_set(('stats', today, version), lambda: dashboard_stats(today))
+        recent_bills_html = dashboard_cache.get_or_set(
+            ('recent_bills', version),
+            lambda: render_template('_recent_bills.html', recent_bills=recent_bills())
+        )
+        return render_template('index.html', recent_bills_html=recent_bills_html, **stats)
     
     except Exception as e:
         logger.error(f"Error in dashboard route: {str(e)}")
@@ -89,19 +101,20 @@ def index():
                              occupancy_rate=0,
                              monthly_income=0,
                              monthly_expenses=0,
-                             recent_bills=[],
-                             daily_income=[0]*6,
-                             daily_expenses=[0]*6,
-                             dates=[datetime.now().strftime('%Y-%m-%d')]*6)
+                             recent_bills_html='',
+                             daily_income=[],
+                             daily_expenses=[],
+                             dates=[])
 
-@app.route('/guests', methods=['GET', 'POST'])
+@route('/guests', methods=['GET', 'POST'])
 def guests():
     """Guest management route"""
     if request.method == 'POST':
         try:
-            # Get the selected room
-            room = Room.query.get(request.form['room_id'])
-            if not room or room.occupancy:
+            # Claim a bed in the selected room; fails if another check-in took the last one
+            room_id = int(request.form['room_id'])
+            if not allocate_bed(room_id):
+                db.session.rollback()
                 flash("Selected room is not available.", "error")
                 return redirect(url_for('guests'))
 
@@ -115,12 +128,9 @@ def guests():
                 date_of_birth=datetime.strptime(request.form['date_of_birth'], '%Y-%m-%d'),
                 food_preference=request.form['food_preference'],
                 check_in_date=datetime.strptime(request.form['check_in_date'], '%Y-%m-%d'),
-                room_id=room.id
+                room_id=room_id
             )
             
-            # Update room occupancy
-            room.occupancy = True
-            
             db.session.add(new_guest)
             db.session.commit()
             
@@ -132,12 +142,33 @@ def guests():
             db.session.rollback()
             flash("Error adding guest. Please try again.", "error")
     
-    # Get all guests and available rooms for display
-    guests_list = Guest.query.all()
-    available_rooms = Room.query.filter_by(occupancy=False).all()
-    return render_template('guests.html', guests=guests_list, available_rooms=available_rooms)
+    # Filters and cursor for the guest listing
+    per_page = request.args.get('per_page', current_app.config['LIST_PAGE_SIZE'], type=int)
+    start = parse_date_arg(request.args.get('start'))
+    end = parse_date_arg(request.args.get('end'))
+    cursor = request.args.get('cursor')
+    
+    # One page of guests with their room and latest payment status in a single query
+    latest_status = db.select(Payment.payment_status)\
+        .where(Payment.guest_id == Guest.id)\
+        .order_by(Payment.date.desc(), Payment.id.desc())\
+        .limit(1).correlate(Guest).scalar_subquery()
+    guests_query = db.session.query(Guest, latest_status)\
+        .join(Room, Guest.room_id == Room.id)\
+        .options(contains_eager(Guest.room))
+    if start:
+        guests_query = guests_query.filter(Guest.check_in_date >= start)
+    if end:
+        guests_query = guests_query.filter(Guest.check_in_date <= end)
+    guests_page = keyset_paginate(guests_query, Guest.check_in_date, Guest.id, cursor, per_page,
+                                  key_type=date, key_of=lambda row: (row[0].check_in_date, row[0].id))
+    
+    return render_template('guests.html',
+                         guests=guests_page,
+                         available_rooms=available_rooms(),
+                         filters={'start': start, 'end': end, 'per_page': guests_page.per_page})
 
-@app.route('/rooms', methods=['GET', 'POST'])
+@route('/rooms', methods=['GET', 'POST'])
 def rooms():
     """Room management route"""
     try:
@@ -162,28 +193,35 @@ def rooms():
                 flash("Error adding room. Please try again.", "error")
         
         # Get all rooms for display
-        rooms_list = Room.query.all()
+        rooms_list = Room.query.options(selectinload(Room.guests)).all()
         return render_template('rooms.html', rooms=rooms_list)
     except Exception as e:
         logger.error(f"Error in rooms route: {str(e)}")
         flash("An error occurred while loading rooms.", "error")
         return render_template('rooms.html', rooms=[])
 
-@app.route('/bill/<int:guest_id>', methods=['GET', 'POST'])
+@route('/bill/<int:guest_id>', methods=['GET', 'POST'])
 def bill(guest_id):
     """Bill generation route"""
     try:
-        guest = Guest.query.get_or_404(guest_id)
+        guest = Guest.query\
+            .options(selectinload(Guest.bills).selectinload(Bill.payments))\
+            .filter_by(id=guest_id).first_or_404()
         room = Room.query.get_or_404(guest.room_id)
         
         if request.method == 'POST':
-            # Generate new bill
-            total_days = int(request.form['total_days'])
-            discount = float(request.form.get('discount', 0))
+            # Charge up to today and move the billing cursor, so billing runs don't bill these days again
+            accrue_guest(guest, room)
+            db.session.flush()
             
-            # Calculate total amount
-            daily_rate = room.price_per_month / 30
-            total_amount = (total_days * daily_rate) - discount
+            # The bill covers every unbilled charge, less the discount
+            total_days, charged_paise = unbilled_charges(guest, room)
+            if not total_days:
+                db.session.rollback()
+                flash("Nothing to bill since the last bill.", "warning")
+                return redirect(url_for('bill', guest_id=guest_id))
+            discount = float(request.form.get('discount', 0))
+            amount_paise = charged_paise - to_paise(discount)
             
             # Create bill record
             new_bill = Bill(
@@ -193,38 +231,53 @@ def bill(guest_id):
                 billing_year=datetime.now().year,
                 total_days=total_days,
                 discount=discount,
-                total_amount=total_amount
+                total_amount=amount_paise / 100,
+                amount_paise=amount_paise
             )
+            db.session.add(new_bill)
+            db.session.flush()
+            link_unbilled(guest.id, new_bill.id)
+            if discount:
+                adjust_account(guest, room, new_bill.id, -to_paise(discount))
             
-            # Generate PDF
-            pdf_path = generate_bill_pdf(new_bill, guest, room)
-            new_bill.pdf_path = pdf_path
+            # Queue PDF rendering; the file is filled in by the render queue
+            render_queue.enqueue(new_bill)
             
             # Update guest's last bill date
-            guest.last_bill_date = datetime.now()
+            guest.last_bill_date = datetime.now().date()
             
-            db.session.add(new_bill)
             db.session.commit()
+            render_queue.notify()
             
-            flash("Bill generated successfully!", "success")
+            flash("Bill generated successfully! The PDF will be ready shortly.", "success")
             return redirect(url_for('bill', guest_id=guest_id))
         
-        # Calculate default values for GET request
-        last_bill_date = guest.last_bill_date or guest.check_in_date
-        total_days, total_amount = calculate_bill(guest, room, last_bill_date, datetime.now())
+        # Default values for GET request from the guest's billing cursor
+        total_days, unbilled_paise = unbilled_charges(guest, room)
         
         return render_template('bill.html',
                              guest=guest,
                              room=room,
                              total_days=total_days,
-                             total_amount=total_amount)
+                             total_amount=unbilled_paise / 100,
+                             discount=0,
+                             outstanding_balance=guest_balance(guest.id) / 100,
+                             unbilled_amount=unbilled_paise / 100)
     
     except Exception as e:
         logger.error(f"Error in bill route: {str(e)}")
         flash("Error generating bill. Please try again.", "error")
         return redirect(url_for('guests'))
 
-@app.route('/transactions', methods=['GET', 'POST'])
+@route('/bill/<int:bill_id>/status')
+def bill_status(bill_id):
+    """Bill PDF rendering status route"""
+    status = render_queue.status(bill_id)
+    if status is None:
+        abort(404)
+    return jsonify(status)
+
+@route('/transactions', methods=['GET', 'POST'])
 def transactions():
     """Transaction management route"""
     if request.method == 'POST':
@@ -261,88 +314,554 @@ def transactions():
             db.session.rollback()
             flash("Error recording transaction. Please try again.", "error")
     
-    # Get all transactions for display
-    payments = Payment.query.order_by(Payment.date.desc()).all()
-    expenses = Expense.query.order_by(Expense.date.desc()).all()
-    guests = Guest.query.all()  # For payment form
+    # Filters and cursors for the listings
+    per_page = request.args.get('per_page', current_app.config['LIST_PAGE_SIZE'], type=int)
+    start = parse_date_arg(request.args.get('start'))
+    end = parse_date_arg(request.args.get('end'))
+    status = request.args.get('status') or None
+    category = request.args.get('category') or None
+    
+    # One page of payments with guest names joined in
+    payments_query = Payment.query\
+        .join(Guest, Payment.guest_id == Guest.id)\
+        .options(contains_eager(Payment.guest))\
+        .filter(*date_range_filter(Payment.date, start, end))
+    if status:
+        payments_query = payments_query.filter(Payment.payment_status == status)
+    payments = keyset_paginate(payments_query, Payment.date, Payment.id,
+                               request.args.get('payments_cursor'), per_page)
+    
+    # One page of expenses
+    expenses_query = Expense.query.filter(*date_range_filter(Expense.date, start, end))
+    if category:
+        expenses_query = expenses_query.filter(Expense.category == category)
+    expenses = keyset_paginate(expenses_query, Expense.date, Expense.id,
+                               request.args.get('expenses_cursor'), per_page)
+    
+    # Guest names and room numbers for the payment form
+    guests = db.session.query(Guest.id, Guest.full_name, Room.room_number)\
+        .join(Room, Guest.room_id == Room.id)\
+        .order_by(Guest.full_name).all()
     return render_template('transactions.html',
                          payments=payments,
                          expenses=expenses,
-                         guests=guests)
+                         guests=guests,
+                         filters={'start': start, 'end': end, 'status': status,
+                                  'category': category, 'per_page': payments.per_page})
 
-@app.route('/reports', methods=['GET'])
+@route('/reports', methods=['GET'])
 def reports():
     """Financial reports route"""
     try:
         # Get filter parameters
         month = request.args.get('month', datetime.now().month, type=int)
         year = request.args.get('year', datetime.now().year, type=int)
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = current_app.config['REPORT_PAGE_SIZE']
         
-        # Get income data
-        income_data = []
-        payments = Payment.query\
-            .filter(db.extract('month', Payment.date) == month,
-                   db.extract('year', Payment.date) == year)\
-            .all()
-        
-        for payment in payments:
-            income_data.append({
-                'date': payment.date,
-                'guest_name': payment.guest.full_name,
-                'amount': payment.amount,
-                'status': payment.payment_status
-            })
+        # Totals and the data version come from SQL aggregates
+        totals = report_totals(year, month)
+        version = totals['version']
+        total_pages = max(1, -(-max(totals['income_count'], totals['expense_count']) // per_page))
         
-        # Get expense data
-        expense_data = []
-        expenses = Expense.query\
-            .filter(db.extract('month', Expense.date) == month,
-                   db.extract('year', Expense.date) == year)\
-            .all()
+        # Page data and PDF are reused until the month's data changes
+        page_data = report_cache.get_page(year, month, version, page, lambda: {
+            'income_data': income_page(year, month, page, per_page),
+            'expense_data': expense_page(year, month, page, per_page)
+        })
         
-        for expense in expenses:
-            expense_data.append({
-                'date': expense.date,
-                'category': expense.category,
-                'description': expense.description,
-                'amount': expense.amount
-            })
+        # Daily series and category breakdown come from the daily ledger
+        month_start, month_end = month_range(year, month)
+        dates, daily_income, daily_expenses = daily_series(month_start, month_end)
         
-        # Generate PDF report
-        pdf_path = generate_monthly_report_pdf(year, month, income_data, expense_data)
+        # Generate PDF report from streamed rows
+        rendered = []
+        def build_pdf(filename):
+            rendered.append(filename)
+            return generate_monthly_report_pdf(
+                year, month, iter_income_rows(year, month), iter_expense_rows(year, month),
+                totals, filename=filename
+            )
+        pdf_path = report_cache.get_pdf(year, month, version, build_pdf)
+        document = report_document(pdf_path, year, month, bool(rendered))
         
         return render_template('reports.html',
                              month=month,
                              year=year,
-                             income_data=income_data,
-                             expense_data=expense_data,
-                             pdf_path=pdf_path)
+                             current_year=datetime.now().year,
+                             page=page,
+                             total_pages=total_pages,
+                             income_data=page_data['income_data'],
+                             expense_data=page_data['expense_data'],
+                             expense_categories=category_totals(month_start, month_end),
+                             dates=dates,
+                             daily_income=daily_income,
+                             daily_expenses=daily_expenses,
+                             report_document_id=document.id,
+                             **totals)
     
     except Exception as e:
         logger.error(f"Error in reports route: {str(e)}")
         flash("Error generating report. Please try again.", "error")
-        return render_template('reports.html')
+        return redirect(url_for('index'))
 
-@app.route('/download_report/<path:filename>')
-def download_report(filename):
-    """Download report PDF"""
+def _receivables_page(items, default_per_page):
+    """Slice one page out of a cached receivables list"""
+    per_page = max(1, min(request.args.get('per_page', default_per_page, type=int), MAX_PAGE_SIZE))
+    total_pages = max(1, -(-len(items) // per_page))
+    page = min(max(request.args.get('page', 1, type=int), 1), total_pages)
+    return items[(page - 1) * per_page:page * per_page], page, per_page, total_pages
+
+@route('/receivables')
+def receivables():
+    """Receivables and aging route"""
     try:
-        return send_file(filename, as_attachment=True)
+        snapshot = receivables_cache.get()
+        guests, page, per_page, total_pages = _receivables_page(snapshot['guests'], current_app.config['LIST_PAGE_SIZE'])
+        return render_template('receivables.html',
+                             as_of=snapshot['as_of'],
+                             totals=snapshot['totals'],
+                             buckets=AGING_BUCKETS,
+                             guests=guests,
+                             total_guests=len(snapshot['guests']),
+                             rooms=snapshot['rooms'][:current_app.config['LIST_PAGE_SIZE']],
+                             page=page,
+                             total_pages=total_pages)
     except Exception as e:
-        logger.error(f"Error downloading report: {str(e)}")
-        flash("Error downloading report. Please try again.", "error")
-        return redirect(url_for('reports'))
+        logger.error(f"Error in receivables route: {str(e)}")
+        flash("Error loading receivables. Please try again.", "error")
+        return redirect(url_for('index'))
+
+@route('/api/receivables')
+def receivables_api():
+    """Receivables JSON route: totals, aging and one page of guest balances (amounts in paise)"""
+    snapshot = receivables_cache.get()
+    guests, page, per_page, total_pages = _receivables_page(snapshot['guests'], current_app.config['LIST_PAGE_SIZE'])
+    return jsonify({
+        'as_of': snapshot['as_of'].isoformat(),
+        'currency_unit': 'paise',
+        'buckets': [{'key': key, 'label': label} for key, label, _ in AGING_BUCKETS],
+        'totals': snapshot['totals'],
+        'guests': guests,
+        'page': page,
+        'per_page': per_page,
+        'total_pages': total_pages,
+        'total_guests': len(snapshot['guests'])
+    })
+
+@route('/api/receivables/rooms')
+def receivables_rooms_api():
+    """Receivables JSON route: one page of room balances (amounts in paise)"""
+    snapshot = receivables_cache.get()
+    rooms, page, per_page, total_pages = _receivables_page(snapshot['rooms'], current_app.config['LIST_PAGE_SIZE'])
+    return jsonify({
+        'as_of': snapshot['as_of'].isoformat(),
+        'currency_unit': 'paise',
+        'rooms': rooms,
+        'page': page,
+        'per_page': per_page,
+        'total_pages': total_pages,
+        'total_rooms': len(snapshot['rooms'])
+    })
+
+def _analytics_span():
+    """Resolve the start_year/end_year query arguments, or abort with 400"""
+    try:
+        return year_span(request.args.get('start_year', type=int), request.args.get('end_year', type=int))
+    except ValueError as e:
+        abort(400, description=str(e))
+
+@route('/api/analytics')
+def analytics_api():
+    """Analytics JSON route: every multi-year view for start_year..end_year"""
+    _, _, start_year, end_year = _analytics_span()
+    return jsonify(multi_year_summary(start_year, end_year))
+
+@route('/api/analytics/trends')
+def analytics_trends_api():
+    """Analytics JSON route: monthly income, expenses and net"""
+    start, end, start_year, end_year = _analytics_span()
+    return jsonify(dict(monthly_trends(start, end), start_year=start_year, end_year=end_year))
+
+@route('/api/analytics/year-over-year')
+def analytics_yoy_api():
+    """Analytics JSON route: monthly income and expenses per year with yearly growth"""
+    _, _, start_year, end_year = _analytics_span()
+    return jsonify(year_over_year(start_year, end_year))
+
+@route('/api/analytics/expense-categories')
+def analytics_categories_api():
+    """Analytics JSON route: expense totals per category per year"""
+    _, _, start_year, end_year = _analytics_span()
+    return jsonify(expense_categories_by_year(start_year, end_year))
+
+@route('/api/analytics/revenue-by-room-type')
+def analytics_room_type_api():
+    """Analytics JSON route: monthly income per room type"""
+    start, end, start_year, end_year = _analytics_span()
+    return jsonify(dict(revenue_by_room_type(start, end), start_year=start_year, end_year=end_year))
+
+@route('/api/analytics/occupancy')
+def analytics_occupancy_api():
+    """Analytics JSON route: monthly bed occupancy, overall and per room type"""
+    start, end, start_year, end_year = _analytics_span()
+    return jsonify(dict(monthly_occupancy(start, end), start_year=start_year, end_year=end_year))
+
+def _api_response(resource, build):
+    """
+    Serve an API payload, or 304 when the client's copy is still current
+    
+    The validators come from the table version counters, so a conditional
+    request that matches never loads any rows.
+    """
+    etag, last_modified = validators(resource, request.args)
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    else:
+        fresh = last_modified is not None and request.if_modified_since is not None \
+            and last_modified <= request.if_modified_since
+    
+    if fresh:
+        response = Response(status=304)
+    else:
+        try:
+            payload = build()
+        except ApiError as e:
+            return jsonify({'error': str(e)}), 400
+        if payload is None:
+            return jsonify({'error': 'Not found'}), 404
+        response = jsonify(payload)
+    
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
 
-@app.errorhandler(404)
+@route(f'/api/{API_VERSION}')
+def api_index():
+    """API route: the available resources with their fields and filters"""
+    return jsonify({name: {
+        'fields': list(resource.fields),
+        'default_fields': list(resource.default_fields),
+        'filters': list(resource.filters)
+    } for name, resource in RESOURCES.items()})
+
+@route(f'/api/{API_VERSION}/<resource_name>')
+def api_list(resource_name):
+    """API route: one page of rooms, guests, bills, payments or expenses"""
+    try:
+        resource = get_resource(resource_name)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    return _api_response(resource, lambda: list_items(resource, request.args, current_app.config['LIST_PAGE_SIZE']))
+
+@route(f'/api/{API_VERSION}/<resource_name>/<int:item_id>')
+def api_item(resource_name, item_id):
+    """API route: a single room, guest, bill, payment or expense"""
+    try:
+        resource = get_resource(resource_name)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    return _api_response(resource, lambda: get_item(resource, item_id, request.args))
+
+@route('/documents/<int:document_id>')
+def download_document(document_id):
+    """Download an indexed PDF, with Range and conditional request support"""
+    document = db.get_or_404(Document, document_id)
+    try:
+        return send_document(document, current_app.config)
+    except FileNotFoundError:
+        logger.error(f"Document {document_id} is missing from disk: {document.path}")
+        abort(404)
+
+@route('/bills/archive')
+def download_bill_archive():
+    """Stream a ZIP of a billing month's bill PDFs, optionally for some guests only"""
+    year = request.args.get('year', datetime.now().year, type=int)
+    month = request.args.get('month', datetime.now().month, type=int)
+    guest_ids = request.args.getlist('guest_id', type=int)
+    entries = archive_entries(year, month, guest_ids)
+    if not entries:
+        flash(f"No bill PDFs for {calendar.month_name[month]} {year}.", "warning")
+        return redirect(url_for('reports', year=year, month=month))
+    
+    filename = f"bills_{year}_{month:02d}.zip"
+    return Response(stream_with_context(stream_bill_archive(entries)), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@route('/bill/<int:bill_id>/pdf')
+def download_bill(bill_id):
+    """Download a bill's PDF, queueing it for rendering again if it is gone"""
+    bill = db.get_or_404(Bill, bill_id)
+    document = latest_bill_document(bill)
+    if document is not None:
+        try:
+            return send_document(document, current_app.config, bill_download_name(bill.guest.full_name, bill.id))
+        except FileNotFoundError:
+            logger.error(f"Document {document.id} for bill {bill_id} is missing from disk")
+    
+    if not RenderJob.query.filter_by(bill_id=bill_id, status='pending').first():
+        render_queue.enqueue(bill)
+        db.session.commit()
+        render_queue.notify()
+    flash("The bill PDF is being prepared. Please try again shortly.", "info")
+    return redirect(url_for('bill', guest_id=bill.guest_id))
+
+@route('/metrics')
+def metrics():
+    """Prometheus metrics route"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@commands.command('rebuild-ledger')
+def rebuild_ledger_command():
+    """Backfill the daily ledger from the full transaction history"""
+    rows = rebuild_ledger()
+    print(f"Daily ledger rebuilt with {rows} rows")
+
+@commands.command('sync-rooms')
+def sync_rooms_command():
+    """Recompute room capacity and occupied beds from the current guests"""
+    rooms = sync_room_occupancy()
+    print(f"Synced bed counts for {rooms} rooms")
+
+@commands.command('accrue')
+def accrue_command():
+    """Charge every guest for the days since their billing cursor"""
+    result = accrue()
+    print(f"Accrued {result['days']} days (₹{result['amount_paise'] / 100:,.2f}) for {result['guests']} guests "
+          f"in {result['elapsed']:.2f}s")
+
+@commands.command('rebuild-accounts')
+def rebuild_accounts_command():
+    """Rebuild billing account balances from the accrual ledger and payments"""
+    accounts = rebuild_accounts()
+    print(f"Billing accounts rebuilt for {accounts} guests")
+
+@commands.command('import-data')
+@click.argument('table', type=click.Choice(list(TABLES)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True, help='Rows per transaction')
+def import_data_command(table, path, batch_size):
+    """Import rooms, guests, payments or expenses from a CSV or JSONL file"""
+    result = import_rows(table, path, batch_size=batch_size)
+    for line_number, message in result['errors']:
+        print(f"  row {line_number}: {message}")
+    print(f"Imported {result['inserted']} {table}, rejected {result['rejected']} "
+          f"in {result['elapsed']:.2f}s ({result['rows_per_sec']:.0f} rows/sec)")
+
+@commands.command('export-data')
+@click.argument('table', type=click.Choice(list(TABLES)))
+@click.argument('path', type=click.Path(dir_okay=False))
+def export_data_command(table, path):
+    """Export a table to a CSV or JSONL file"""
+    result = export_rows(table, path)
+    print(f"Exported {result['exported']} {table} in {result['elapsed']:.2f}s "
+          f"({result['rows_per_sec']:.0f} rows/sec)")
+
+@commands.command('seed-data')
+@click.option('--rooms', default=10000, show_default=True)
+@click.option('--guests', default=100000, show_default=True)
+@click.option('--payments', default=2000000, show_default=True)
+@click.option('--expenses', default=1000000, show_default=True)
+@click.option('--years', default=5, show_default=True, help='Years of history ending today')
+@click.option('--seed', default=42, show_default=True, help='Random seed')
+def seed_data_command(rooms, guests, payments, expenses, years, seed):
+    """Populate the database with reproducible synthetic data for load testing"""
+    result = generate_synthetic_data(rooms=rooms, guests=guests, payments=payments,
+                                     expenses=expenses, years=years, seed=seed)
+    print(f"Generated {result['rooms']} rooms, {result['guests']} guests, {result['payments']} payments "
+          f"and {result['expenses']} expenses in {result['elapsed']:.1f}s "
+          f"({result['rows_per_sec']:.0f} rows/sec)")
+
+@commands.command('index-documents')
+def index_documents_command():
+    """Add bill and report PDFs generated before the document index to it"""
+    added = index_existing_documents(report_cache.reports_folder)
+    print(f"Indexed {added} existing documents")
+
+@commands.command('export-bills')
+@click.argument('year', type=int)
+@click.argument('month', type=click.IntRange(1, 12))
+@click.argument('path', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--guest-id', 'guest_ids', type=int, multiple=True, help='Only these guests (repeatable)')
+def export_bills_command(year, month, path, guest_ids):
+    """Write a ZIP of a billing month's bill PDFs to PATH ('-' for stdout)"""
+    entries = archive_entries(year, month, list(guest_ids))
+    size = 0
+    with click.open_file(path, 'wb') as f:
+        for chunk in stream_bill_archive(entries):
+            f.write(chunk)
+            size += len(chunk)
+    click.echo(f"Archived {len(entries)} bills ({size} bytes) to {path}", err=True)
+
+@commands.command('apply-retention')
+@click.option('--keep-months', type=int, default=None, help='Months kept, defaults to DOCUMENT_RETENTION_MONTHS')
+def apply_retention_command(keep_months):
+    """Delete PDFs for months past the retention window and compact the document index"""
+    result = apply_retention(keep_months or current_app.config['DOCUMENT_RETENTION_MONTHS'])
+    print(f"Removed {result['expired']} expired documents ({result['bytes_freed']} bytes), "
+          f"dropped {result['missing']} missing, removed {result['folders_removed']} empty folders")
+
+@errorhandler(404)
 def not_found_error(error):
     """Handle 404 errors"""
     return render_template('404.html'), 404
 
-@app.errorhandler(500)
+@errorhandler(500)
 def internal_error(error):
     """Handle 500 errors"""
     db.session.rollback()
     return render_template('500.html'), 500
 
+@commands.command('init-db')
+def init_db_command():
+    """Create or migrate the database schema"""
+    init_schema()
+    print("Database schema is up to date")
+
+@commands.command('run-job')
+@click.argument('job_name', type=click.Choice(list(SCHEDULED_JOBS)))
+@click.option('--date', 'run_date', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Date the run is for, defaults to today')
+def run_job_command(job_name, run_date):
+    """Run a scheduled job now; a period that already ran successfully is skipped"""
+    run = execute_job(job_name, run_date.date() if run_date else None,
+                      stale_after=current_app.config['JOB_RUN_STALE_SECONDS'])
+    if run is None:
+        print(f"{job_name} already ran for this period or is running elsewhere")
+    else:
+        print(f"{job_name} {run.status}: {run.items} items in {run.duration:.2f}s")
+
+@commands.command('job-runs')
+@click.option('--limit', default=20, show_default=True)
+def job_runs_command(limit):
+    """List the most recent scheduled job runs"""
+    for run in JobRun.query.order_by(JobRun.started_date.desc()).limit(limit):
+        duration = f"{run.duration:.2f}s" if run.duration is not None else '-'
+        print(f"{run.started_date:%Y-%m-%d %H:%M:%S}  {run.job_name:<20} {run.run_key:<8} {run.status:<8} "
+              f"{run.items:>7} items {duration:>9}  attempt {run.attempts}  {run.owner}"
+              + (f"  {run.error}" if run.error else ''))
+
+@commands.command('bill-storage')
+def bill_storage_command():
+    """Show how much disk space and render time shared bill PDFs save"""
+    report = bill_storage_report()
+    print(f"{report['bills']} bills in {report['files']} files, {report['bytes_on_disk']} bytes on disk")
+    print(f"Saved {report['bytes_saved']} bytes and {report['seconds_saved']:.2f}s of rendering")
+
+@commands.command('run-worker')
+def run_worker_command():
+    """Run the render farm, the scheduler and the bill PDF render queue until interrupted"""
+    start_background_jobs(current_app._get_current_object())
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.shutdown()
+        render_queue.stop()
+        render_farm.stop()
+
+def init_schema():
+    """
+    Create missing tables, columns and indexes, then backfill derived data
+    
+    Runs in an app context. Startup does not touch the schema unless
+    ``AUTO_CREATE_SCHEMA`` is set; deployments run ``flask init-db`` instead.
+    """
+    create_schema()
+    # Backfill bed counts for databases created before rooms tracked capacity
+    if Room.query.filter_by(capacity=0).first() is not None:
+        sync_room_occupancy()
+
+def start_background_jobs(app):
+    """
+    Start the render farm, the scheduler and the bill PDF render queue for an app
+    
+    Run this in worker processes (``flask run-worker``, or the development
+    server); web workers just queue render jobs, which a worker picks up from
+    the ``render_job`` table. Any number of workers may run: they elect one
+    scheduler leader through the database, and each scheduled run is claimed
+    in ``job_run`` so it executes once.
+    
+    Args:
+        app: Flask app the jobs run against
+    """
+    # Fork the render processes before any other thread starts
+    render_farm.start(app.config['PDF_RENDER_WORKERS'])
+    scheduler.init_app(app)
+    scheduler.start()
+    render_queue.init_app(app)
+    render_queue.start()
+    logger.info("Background jobs started")
+
+def create_app(config_object=Config, **overrides):
+    """
+    Build and configure the Flask app
+    
+    Nothing is written at startup: the schema is only created when
+    ``AUTO_CREATE_SCHEMA`` is set, background jobs only start when
+    ``RUN_BACKGROUND_JOBS`` is set, and ReportLab is imported by the first
+    PDF render rather than here.
+    
+    Args:
+        config_object: config class or object to load
+        **overrides: config values applied on top of it
+    
+    Returns:
+        Flask: the configured app
+    """
+    app = Flask(__name__, static_url_path='', static_folder='static')
+    app.config.from_object(config_object)
+    app.config.update(overrides)
+    
+    # Initialize database
+    init_db(app)
+    with app.app_context():
+        if app.config['AUTO_CREATE_SCHEMA']:
+            init_schema()
+        # Count writes per table for API ETags
+        register_version_events(db.engine)
+    
+    # Keep the daily ledger, billing accounts, receivables and dashboard in step with every write
+    register_ledger_events()
+    register_accrual_events()
+    register_receivables_events()
+    register_dashboard_events()
+    receivables_cache.ttl = app.config['RECEIVABLES_CACHE_TTL']
+    dashboard_cache.ttl = app.config['DASHBOARD_CACHE_TTL']
+    dashboard_cache.backend = load_backend(app.config['DASHBOARD_CACHE_BACKEND'],
+                                           app.config['DASHBOARD_CACHE_MAX_ENTRIES'])
+    
+    query_monitor.init_app(app)
+    request_metrics.init_app(app)
+    
+    # Register context processor and template filters
+    app.context_processor(inject_datetime)
+    app.add_template_filter(lambda m: calendar.month_name[m], 'month_name')
+    
+    for rule, view, options in views:
+        app.add_url_rule(rule, view_func=view, **options)
+    for code, handler in error_handlers.items():
+        app.register_error_handler(code, handler)
+    for command in commands.commands.values():
+        app.cli.add_command(command)
+    
+    render_queue.init_app(app)
+    if app.config['RUN_BACKGROUND_JOBS']:
+        start_background_jobs(app)
+    elif app.config['RENDER_FARM_IN_WEB']:
+        # Report PDFs rendered by this web process go to its own warm render processes
+        render_farm.start(app.config['PDF_RENDER_WORKERS'])
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
+    with app.app_context():
+        init_schema()
+    # With the reloader, only the serving child process runs the background jobs
+    if not Config.DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_jobs(app)
     app.run(debug=Config.DEBUG)
\ No newline at end of file
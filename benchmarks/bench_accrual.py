@@ -0,0 +1,63 @@
+"""
+Accrual pass and outstanding-balance lookups on synthetic data
+
+Times one accrue() pass and one amounts_owed() pass over every guest. It
+then times per-guest balance lookups two ways: recomputed from payments and
+stay dates, and read from the guest's billing account.
+
+Usage:
+    python benchmarks/bench_accrual.py [guests] [payments] [lookups]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from db import db
+from models import Guest, Room, Payment
+from synthetic_data import generate
+from accrual import accrue, amounts_owed, outstanding_balance, charge_paise, billable_days, to_paise, UNPAID_STATUSES
+
+def recomputed_balance(guest_id, today):
+    guest, price = db.session.query(Guest, Room.price_per_month)\
+        .join(Room, Guest.room_id == Room.id).filter(Guest.id == guest_id).one()
+    paid = db.session.query(db.func.sum(Payment.amount))\
+        .filter(Payment.guest_id == guest_id, Payment.payment_status.notin_(UNPAID_STATUSES)).scalar()
+    _, days = billable_days(guest.check_in_date, guest.check_out_date, today)
+    return charge_paise(price, days) - to_paise(paid)
+
+def timed(label, func, count):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<34} {elapsed * 1000:10.1f} ms  ({count / elapsed:12.0f} /s)")
+
+def main():
+    guests = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    payments = int(sys.argv[2]) if len(sys.argv) > 2 else 400000
+    lookups = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            generate(rooms=max(guests // 10, 1), guests=guests, payments=payments, expenses=0, years=3)
+            today = date.today()
+            sample = random.Random(1).sample(range(1, guests + 1), min(lookups, guests))
+            print(f"guests: {guests}  payments: {payments}  lookups: {len(sample)}")
+
+            timed('accrue() all guests', lambda: accrue(today), guests)
+            timed('accrue() again (nothing new)', lambda: accrue(today), guests)
+            timed('amounts_owed() all guests', lambda: amounts_owed(today), guests)
+            timed('balance recomputed per guest', lambda: [recomputed_balance(i, today) for i in sample], len(sample))
+            timed('balance from billing account', lambda: [outstanding_balance(i) for i in sample], len(sample))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Five-year analytics: Python loops over raw rows vs GROUP BY over raw rows vs the daily ledger
+
+Usage:
+    python benchmarks/bench_analytics.py [payments] [expenses] [guests]
+"""
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from db import db
+from models import Payment, Expense
+from synthetic_data import generate
+from analytics import year_span, monthly_trends, multi_year_summary
+
+def python_loops(start, end):
+    # Stream every row and bucket it by month in Python
+    totals = defaultdict(float)
+    for model, kind in ((Payment, 'income'), (Expense, 'expense')):
+        for day, amount in db.session.query(model.date, model.amount)\
+                .filter(model.date >= start, model.date < end).yield_per(10000):
+            totals[(day.year, day.month, kind)] += amount
+    return totals
+
+def raw_group_by(start, end):
+    # GROUP BY pushed down to SQL, but over the raw transaction tables
+    totals = {}
+    for model, kind in ((Payment, 'income'), (Expense, 'expense')):
+        year = db.extract('year', model.date)
+        month = db.extract('month', model.date)
+        for row_year, row_month, total in db.session.query(year, month, db.func.sum(model.amount))\
+                .filter(model.date >= start, model.date < end).group_by(year, month):
+            totals[(int(row_year), int(row_month), kind)] = total
+    return totals
+
+def timed(label, func):
+    started = time.perf_counter()
+    result = func()
+    print(f"{label:<36} {(time.perf_counter() - started) * 1000:10.1f} ms")
+    return result
+
+def main():
+    payments = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+    expenses = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+    guests = int(sys.argv[3]) if len(sys.argv) > 3 else 100000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            generate(rooms=max(guests // 10, 1), guests=guests, payments=payments, expenses=expenses, years=5)
+            start, end, start_year, end_year = year_span()
+            print(f"payments: {payments}  expenses: {expenses}  guests: {guests}  years: {start_year}-{end_year}")
+
+            loops = timed('python loops over raw rows', lambda: python_loops(start, end))
+            grouped = timed('GROUP BY over raw rows', lambda: raw_group_by(start, end))
+            trends = timed('monthly_trends() from ledger', lambda: monthly_trends(start, end))
+            timed('multi_year_summary() all views', lambda: multi_year_summary(start_year, end_year))
+
+            for i, label in enumerate(trends['months']):
+                year, month = int(label[:4]), int(label[5:])
+                for kind, series in (('income', trends['income']), ('expense', trends['expenses'])):
+                    assert abs(loops.get((year, month, kind), 0) - series[i]) < 0.01 * max(1, series[i])
+                    assert abs(grouped.get((year, month, kind), 0) - series[i]) < 0.01 * max(1, series[i])
+
+if __name__ == '__main__':
+    main()
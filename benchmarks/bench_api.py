@@ -0,0 +1,59 @@
+"""
+Polling cost: HTML listings vs the JSON API vs conditional 304 revalidation
+
+Each listing is requested repeatedly, the way a polling tablet does, and the
+response size and server CPU time per request are reported.
+
+Usage:
+    python benchmarks/bench_api.py [guests] [payments] [polls]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def poll(client, url, polls, conditional=False):
+    headers = {}
+    if conditional:
+        headers['If-None-Match'] = client.get(url).headers['ETag']
+    sizes = 0
+    statuses = set()
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    for _ in range(polls):
+        response = client.get(url, headers=headers)
+        sizes += len(response.data)
+        statuses.add(response.status_code)
+    cpu = (time.process_time() - cpu_started) / polls
+    wall = (time.perf_counter() - started) / polls
+    print(f"{url:<44} {'304' if conditional else 'full':>5} {sizes / polls:10.0f} B "
+          f"{cpu * 1000:8.2f} ms cpu {wall * 1000:8.2f} ms wall  status {sorted(statuses)}")
+
+def main():
+    guests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    payments = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    polls = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ['AUTO_CREATE_SCHEMA'] = '1'
+        from app import app
+        from synthetic_data import generate
+        app.config['PROPAGATE_EXCEPTIONS'] = False
+        with app.app_context():
+            generate(rooms=max(guests // 3, 1), guests=guests, payments=payments, expenses=payments // 2, years=1)
+        print(f"guests: {guests}  payments: {payments}  polls: {polls}")
+
+        client = app.test_client()
+        per_page = app.config['LIST_PAGE_SIZE']
+        poll(client, '/rooms', polls)
+        poll(client, '/api/v1/rooms', polls)
+        poll(client, '/api/v1/rooms', polls, conditional=True)
+        poll(client, '/transactions', polls)
+        poll(client, f'/api/v1/payments?per_page={per_page}', polls)
+        poll(client, f'/api/v1/payments?per_page={per_page}', polls, conditional=True)
+
+if __name__ == '__main__':
+    main()
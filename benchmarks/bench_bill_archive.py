@@ -0,0 +1,85 @@
+"""
+Month bill archive: streamed ZIP vs building the whole ZIP in memory
+
+Registers copies of a bill PDF as a month's documents, then builds the
+archive both ways and reports throughput and peak Python memory.
+
+Usage:
+    python benchmarks/bench_bill_archive.py [bills] [pdf size in KiB]
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from db import db
+from models import Guest, Room, Bill, Document
+from bill_archive import archive_entries, stream_bill_archive
+from documents import file_info
+
+def populate(folder, bills, size):
+    room = Room('B1', '4 seater')
+    db.session.add(room)
+    db.session.flush()
+    guest = Guest(full_name='Bench Guest', citizen_number='bench', email='bench@example.com', emergency_contact='0',
+                  address='-', date_of_birth=date(2000, 1, 1), food_preference='veg',
+                  check_in_date=date(2024, 1, 1), room_id=room.id)
+    db.session.add(guest)
+    db.session.flush()
+    for i in range(bills):
+        path = os.path.join(folder, f"bill_{i}.pdf")
+        with open(path, 'wb') as f:
+            f.write(b'%PDF-1.4\n' + os.urandom(size // 2) + b'\0' * (size // 2))
+        bill = Bill(guest_id=guest.id, room_id=room.id, billing_month=1, billing_year=2024, total_days=30,
+                    total_amount=9000.0, pdf_path=path)
+        db.session.add(bill)
+        db.session.flush()
+        db.session.add(Document(kind='bill', path=path, bill_id=bill.id, period_year=2024, period_month=1,
+                                **file_info(path)))
+    db.session.commit()
+
+def in_memory(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for document, *_ in entries:
+            archive.write(os.path.join(os.getcwd(), document.path), document.filename)
+    return len(buffer.getvalue())
+
+def streamed(entries):
+    return sum(len(chunk) for chunk in stream_bill_archive(entries))
+
+def measure(label, func, entries, total_bytes):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = func(entries)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<12} {elapsed:8.2f} s  {total_bytes / elapsed / 1e6:8.1f} MB/s  "
+          f"archive {size / 1e6:8.1f} MB  peak memory {peak / 1e6:8.1f} MB")
+
+def main():
+    bills = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    size = int(sys.argv[2]) * 1024 if len(sys.argv) > 2 else 100 * 1024
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            populate(tmp, bills, size)
+            entries = archive_entries(2024, 1)
+            print(f"bills: {len(entries)}  pdf size: {size // 1024} KiB  total: {bills * size / 1e6:.1f} MB")
+            measure('in memory', in_memory, entries, bills * size)
+            measure('streamed', streamed, entries, bills * size)
+
+if __name__ == '__main__':
+    main()
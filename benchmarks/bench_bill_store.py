@@ -0,0 +1,52 @@
+"""
+Bill PDF rendering with the content-addressed bill store
+
+Renders a batch of bills, renders it again unchanged (every bill's inputs
+are already in the store, so nothing is rendered), then renders a batch in
+which many guests share the same bill (one file per distinct content).
+Reports time, files written and the space and render time saved.
+
+Usage:
+    python benchmarks/bench_bill_store.py [bills]
+"""
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from billing import BillSnapshot, GuestSnapshot, RoomSnapshot, render_bill_job
+
+def make_jobs(count, names):
+    return [(i, BillSnapshot(5, 2024, 30, 0.0, 12000.0), GuestSnapshot(i, f"Guest {i % names}"),
+             RoomSnapshot(1, '101', '1 seater', 12000)) for i in range(count)]
+
+def run(label, jobs):
+    started = time.perf_counter()
+    renders = [render for _, render in map(render_bill_job, jobs)]
+    elapsed = time.perf_counter() - started
+    statuses = Counter(render.status for render in renders)
+    files = {render.path for render in renders}
+    print(f"{label:<12} {elapsed:7.2f} s  {len(files):6} files  "
+          f"{sum(render.saved_bytes for render in renders):10} bytes saved  "
+          f"{sum(render.saved_seconds for render in renders):6.2f} s saved  {dict(statuses)}")
+
+def main():
+    bills = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"bills: {bills}")
+        Config.BILLS_PATH = tempfile.mkdtemp(dir=tmp)
+        jobs = make_jobs(bills, bills)
+        run('first run', jobs)
+        run('re-run', jobs)
+
+        # Ten distinct guest names: bills with the same name are identical
+        Config.BILLS_PATH = tempfile.mkdtemp(dir=tmp)
+        run('shared', make_jobs(bills, 10))
+
+if __name__ == '__main__':
+    main()
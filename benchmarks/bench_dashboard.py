@@ -0,0 +1,46 @@
+"""
+Dashboard latency with and without the fragment cache
+
+Usage:
+    python benchmarks/bench_dashboard.py [guests] [payments] [requests]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def run(client, requests):
+    started = time.perf_counter()
+    for _ in range(requests):
+        assert client.get('/').status_code == 200
+    return (time.perf_counter() - started) / requests
+
+def main():
+    guests = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    payments = int(sys.argv[2]) if len(sys.argv) > 2 else 500000
+    requests = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ['AUTO_CREATE_SCHEMA'] = '1'
+        from app import app
+        from dashboard import dashboard_cache
+        from synthetic_data import generate
+        with app.app_context():
+            generate(rooms=max(guests // 3, 1), guests=guests, payments=payments, expenses=payments // 2, years=1)
+        print(f"guests: {guests}  payments: {payments}  requests: {requests}")
+
+        client = app.test_client()
+        ttl = dashboard_cache.ttl
+        dashboard_cache.ttl = 0
+        uncached = run(client, requests)
+        dashboard_cache.ttl = ttl
+        cached = run(client, requests)
+        print(f"uncached  {uncached * 1000:8.2f} ms/request")
+        print(f"cached    {cached * 1000:8.2f} ms/request")
+        print(f"stats     {dashboard_cache.stats()}")
+
+if __name__ == '__main__':
+    main()
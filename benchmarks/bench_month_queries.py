@@ -0,0 +1,87 @@
+"""
+Month filter query time: extract() vs half-open date range, with and without indexes
+
+Usage:
+    python benchmarks/bench_month_queries.py [rows]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from db import db
+from models import Payment
+from utils import month_datetime_range
+
+def populate(rows):
+    random.seed(42)
+    start = datetime(2020, 1, 1)
+    span = int(timedelta(days=5 * 365).total_seconds())
+    batch = []
+    for i in range(rows):
+        batch.append({
+            'guest_id': random.randint(1, 10000),
+            'amount': round(random.uniform(100, 15000), 2),
+            'date': start + timedelta(seconds=random.randrange(span)),
+            'payment_status': 'paid'
+        })
+        if len(batch) == 50000:
+            db.session.execute(Payment.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Payment.__table__.insert(), batch)
+    db.session.commit()
+
+def timed(query, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        query()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    year, month = 2023, 6
+    start, end = month_datetime_range(year, month)
+
+    def extract_query():
+        return db.session.query(db.func.sum(Payment.amount))\
+            .filter(db.extract('month', Payment.date) == month,
+                    db.extract('year', Payment.date) == year).scalar()
+
+    def range_query():
+        return db.session.query(db.func.sum(Payment.amount))\
+            .filter(Payment.date >= start, Payment.date < end).scalar()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            # Measure without indexes first
+            for index in Payment.__table__.indexes:
+                index.drop(bind=db.engine)
+
+            started = time.perf_counter()
+            populate(rows)
+            print(f"rows: {rows} (populated in {time.perf_counter() - started:.1f}s)")
+
+            print(f"extract filter, no index: {timed(extract_query):9.2f} ms")
+            print(f"range filter,   no index: {timed(range_query):9.2f} ms")
+
+            for index in Payment.__table__.indexes:
+                index.create(bind=db.engine)
+
+            print(f"extract filter, indexed:  {timed(extract_query):9.2f} ms")
+            print(f"range filter,   indexed:  {timed(range_query):9.2f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Micro-benchmark for per-bill PDF render time with and without cached templates
+
+Usage:
+    python benchmarks/bench_pdf_templates.py [iterations]
+"""
+import os
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+from config import Config
+from pdf_templates import get_templates
+from utils import generate_bill_pdf
+
+Bill = namedtuple('Bill', 'billing_month billing_year total_days discount total_amount')
+Guest = namedtuple('Guest', 'id full_name')
+Room = namedtuple('Room', 'id room_number room_type price_per_month')
+
+def bench(iterations, cached):
+    bill = Bill(3, 2025, 30, 0.0, 10000.0)
+    guest = Guest(1, 'Benchmark Guest')
+    room = Room(1, '101', '3 seater', 10000)
+    timings = []
+    for _ in range(iterations):
+        if not cached:
+            # Reproduce the old behaviour: build all styles for every document
+            get_templates.cache_clear()
+        started = time.perf_counter()
+        generate_bill_pdf(bill, guest, room)
+        timings.append(time.perf_counter() - started)
+    return sum(timings) / len(timings) * 1000
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    logging.getLogger('utils').setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        Config.BILLS_PATH = tmp
+        get_templates()  # warm up imports and fonts
+        uncached = bench(iterations, cached=False)
+        cached = bench(iterations, cached=True)
+    print(f"iterations: {iterations}")
+    print(f"per-bill render, templates rebuilt: {uncached:.3f} ms")
+    print(f"per-bill render, templates cached:  {cached:.3f} ms")
+    print(f"saved per bill: {uncached - cached:.3f} ms ({(1 - cached / uncached) * 100:.1f}%)")
+
+if __name__ == '__main__':
+    main()
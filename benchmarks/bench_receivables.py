@@ -0,0 +1,87 @@
+"""
+Receivables for every guest: per-guest Python loops vs grouped SQL, and the cached snapshot
+
+Usage:
+    python benchmarks/bench_receivables.py [guests] [bills per guest] [payments]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy.orm import selectinload
+from db import db
+from models import Guest, Bill
+from synthetic_data import generate
+from accrual import rebuild_accounts, to_paise, UNPAID_STATUSES
+from receivables import compute_receivables, ReceivablesCache
+
+def populate_bills(bills_per_guest):
+    rng = random.Random(7)
+    now = datetime.now()
+    rows = []
+    for guest_id, room_id in db.session.query(Guest.id, Guest.room_id):
+        for _ in range(bills_per_guest):
+            amount = rng.randrange(300000, 1200000)
+            rows.append({
+                'guest_id': guest_id, 'room_id': room_id, 'billing_month': 1, 'billing_year': 2024,
+                'total_days': 30, 'discount': 0.0, 'total_amount': amount / 100, 'amount_paise': amount,
+                'generated_date': now - timedelta(days=rng.randrange(120))
+            })
+        if len(rows) >= 50000:
+            db.session.execute(Bill.__table__.insert(), rows)
+            rows = []
+    if rows:
+        db.session.execute(Bill.__table__.insert(), rows)
+    db.session.commit()
+
+def python_loops():
+    # Walk every guest's bills and payments, the way the bill pages do
+    balances = {}
+    guests = Guest.query.options(selectinload(Guest.bills), selectinload(Guest.payments)).all()
+    for guest in guests:
+        billed = sum(bill.amount_paise for bill in guest.bills)
+        paid = sum(to_paise(payment.amount) for payment in guest.payments
+                   if payment.payment_status not in UNPAID_STATUSES)
+        if billed or paid:
+            balances[guest.id] = billed - paid
+    return balances
+
+def timed(label, func):
+    started = time.perf_counter()
+    result = func()
+    print(f"{label:<32} {(time.perf_counter() - started) * 1000:10.1f} ms")
+    return result
+
+def main():
+    guests = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    bills_per_guest = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    payments = int(sys.argv[3]) if len(sys.argv) > 3 else 300000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            generate(rooms=max(guests // 10, 1), guests=guests, payments=payments, expenses=0, years=1)
+            populate_bills(bills_per_guest)
+            rebuild_accounts()
+            print(f"guests: {guests}  bills: {guests * bills_per_guest}  payments: {payments}")
+
+            loops = timed('python loops per guest', python_loops)
+            db.session.expunge_all()
+            snapshot = timed('grouped SQL', compute_receivables)
+            assert {g['guest_id']: g['balance'] for g in snapshot['guests']} == loops
+
+            cache = ReceivablesCache()
+            timed('cache miss', cache.get)
+            timed('cache hit', cache.get)
+
+if __name__ == '__main__':
+    main()
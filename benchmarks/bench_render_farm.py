@@ -0,0 +1,84 @@
+"""
+Bill PDF rendering: in-process vs a fresh process pool vs the warm render farm
+
+A fresh pool is what billing runs and the render queue used before the farm:
+its processes import ReportLab and build the templates on their first job.
+Reports throughput for a batch and the latency of a single job. Each phase
+renders into an empty bill store, so no bill is reused from an earlier one.
+
+Usage:
+    python benchmarks/bench_render_farm.py [bills] [workers]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from billing import BillSnapshot, GuestSnapshot, RoomSnapshot, render_bill_job
+from render_farm import render_farm
+from metrics import render_metrics
+
+def make_jobs(count):
+    return [(i, BillSnapshot(5, 2024, 30, 0.0, 12000.0), GuestSnapshot(i, f"Guest {i}"),
+             RoomSnapshot(1, '101', '1 seater', 12000)) for i in range(count)]
+
+def report(label, elapsed, count, latencies=None):
+    line = f"{label:<16} {elapsed:8.2f} s  {count / elapsed:8.1f} bills/s"
+    if latencies:
+        line += f"  single job p50 {statistics.median(latencies) * 1000:7.1f} ms  max {max(latencies) * 1000:7.1f} ms"
+    print(line)
+
+def fresh_pool(jobs, workers):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(render_bill_job, jobs, chunksize=max(1, len(jobs) // workers)))
+
+def single_fresh(job):
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        executor.submit(render_bill_job, job).result()
+    return time.perf_counter() - started
+
+def single_farm(job):
+    started = time.perf_counter()
+    render_farm.submit('bill', render_bill_job, job).result()
+    return time.perf_counter() - started
+
+def main():
+    bills = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 2
+    jobs = make_jobs(bills + 10)
+    jobs, singles = jobs[:bills], jobs[bills:]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"bills: {bills}  workers: {workers}")
+
+        # Fresh pool first, while this process has not loaded ReportLab yet
+        Config.BILLS_PATH = tempfile.mkdtemp(dir=tmp)
+        started = time.perf_counter()
+        fresh_pool(jobs, workers)
+        report('fresh pool', time.perf_counter() - started, bills, [single_fresh(job) for job in singles])
+
+        Config.BILLS_PATH = tempfile.mkdtemp(dir=tmp)
+        started = time.perf_counter()
+        list(map(render_bill_job, jobs))
+        report('in process', time.perf_counter() - started, bills)
+
+        Config.BILLS_PATH = tempfile.mkdtemp(dir=tmp)
+        started = time.perf_counter()
+        render_farm.start(workers)
+        print(f"farm startup     {time.perf_counter() - started:8.2f} s")
+        started = time.perf_counter()
+        render_farm.map('bill', render_bill_job, jobs)
+        report('render farm', time.perf_counter() - started, bills, [single_farm(job) for job in singles])
+        print('\n'.join(line for line in render_metrics().splitlines()
+                        if line.startswith(('render_farm_job_latency_seconds_sum', 'render_farm_job_latency_seconds_count',
+                                            'render_farm_job_wait_seconds_sum', 'render_farm_queue_depth'))))
+        render_farm.stop()
+
+if __name__ == '__main__':
+    main()
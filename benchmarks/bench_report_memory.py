@@ -0,0 +1,48 @@
+"""
+Peak memory of monthly report PDF generation as the row count grows
+
+Usage:
+    python benchmarks/bench_report_memory.py [rows ...]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+from config import Config
+from utils import generate_monthly_report_pdf
+
+def income_rows(count):
+    start = datetime(2025, 3, 1)
+    for i in range(count):
+        yield {'date': start + timedelta(seconds=i), 'guest_name': f'Guest {i}',
+               'amount': 100.0, 'status': 'paid'}
+
+def expense_rows(count):
+    start = datetime(2025, 3, 1)
+    for i in range(count):
+        yield {'date': start + timedelta(seconds=i), 'category': 'food',
+               'description': f'Expense {i}', 'amount': 10.0}
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 5000, 20000]
+    logging.getLogger('utils').setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        Config.BASE_DIR = tmp
+        for rows in sizes:
+            totals = {'total_income': rows * 100.0, 'total_expenses': rows * 10.0}
+            tracemalloc.start()
+            started = time.perf_counter()
+            generate_monthly_report_pdf(2025, 3, income_rows(rows), expense_rows(rows), totals)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"rows: {rows:>7}  time: {elapsed:7.2f}s  peak memory: {peak / 1024 / 1024:7.1f} MiB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Concurrent check-ins: read-check-write allocation vs the conditional UPDATE in allocation.allocate_bed
+
+Many threads check guests into a handful of rooms at once. Overbooked rooms
+(more current guests than beds) are counted for each strategy; the script
+exits non-zero if the atomic strategy overbooks any room.
+
+Usage:
+    python benchmarks/bench_room_allocation.py [threads] [attempts per thread] [rooms]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import event
+from config import Config
+from db import db, apply_sqlite_pragmas
+from models import Guest, Room
+from allocation import allocate_bed, available_rooms
+
+def naive_allocate(room_id):
+    # The pattern the guests route used before: check in Python, then write
+    room = db.session.get(Room, room_id)
+    if room is None or room.beds_occupied >= room.capacity:
+        return False
+    time.sleep(0)  # let other threads interleave between the read and the write
+    room.beds_occupied += 1
+    room.occupancy = room.beds_occupied >= room.capacity
+    return True
+
+def check_in(allocate, room_type, n):
+    rooms = available_rooms(room_type)
+    if not rooms:
+        return False
+    room_id = rooms[n % len(rooms)].id
+    if not allocate(room_id):
+        db.session.rollback()
+        return False
+    db.session.add(Guest(
+        full_name=f"Guest {n}", citizen_number=f"C{n}", email=f"g{n}@example.com",
+        emergency_contact='9800000000', address='Kathmandu', date_of_birth=date(2000, 1, 1),
+        food_preference='veg', check_in_date=date.today(), room_id=room_id
+    ))
+    db.session.commit()
+    return True
+
+def run(label, allocate, threads, attempts, room_count):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_size': threads, 'max_overflow': 0}
+        db.init_app(app)
+        with app.app_context():
+            event.listen(db.engine, 'connect', lambda conn, record: apply_sqlite_pragmas(conn, Config.SQLITE_PRAGMAS))
+            db.create_all()
+            for i in range(room_count):
+                db.session.add(Room(f"R{i}", '4 seater' if i % 2 else '3 seater'))
+            db.session.commit()
+            total_beds = db.session.query(db.func.sum(Room.capacity)).scalar()
+
+        counter = iter(range(threads * attempts))
+        lock = threading.Lock()
+        results = {'allocated': 0, 'rejected': 0, 'errors': 0}
+
+        def worker():
+            with app.app_context():
+                for _ in range(attempts):
+                    with lock:
+                        n = next(counter)
+                    try:
+                        ok = check_in(allocate, '4 seater' if n % 2 else '3 seater', n)
+                    except Exception:
+                        db.session.rollback()
+                        ok = None
+                    with lock:
+                        key = 'allocated' if ok else 'rejected' if ok is False else 'errors'
+                        results[key] += 1
+
+        started = time.perf_counter()
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        with app.app_context():
+            guests_per_room = dict(db.session.query(Guest.room_id, db.func.count(Guest.id)).group_by(Guest.room_id))
+            overbooked = 0
+            mismatched = 0
+            for room in Room.query.all():
+                guests = guests_per_room.get(room.id, 0)
+                overbooked += guests > room.capacity
+                mismatched += guests != room.beds_occupied
+            db.engine.dispose()
+
+    print(f"{label:>8}: {results['allocated']:5d} allocated of {total_beds} beds, {results['rejected']:5d} rejected, "
+          f"{results['errors']} errors, {overbooked} overbooked rooms, {mismatched} bed count mismatches "
+          f"({threads * attempts / elapsed:.0f} attempts/s)")
+    return overbooked + mismatched
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    attempts = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    room_count = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    print(f"threads: {threads}  attempts per thread: {attempts}  rooms: {room_count}")
+    run('naive', naive_allocate, threads, attempts, room_count)
+    if run('atomic', allocate_bed, threads, attempts, room_count):
+        sys.exit("atomic allocation overbooked a room")
+
+if __name__ == '__main__':
+    main()
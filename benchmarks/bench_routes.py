@@ -0,0 +1,198 @@
+"""
+Load test of the main Flask routes through the test client
+
+Drives /, /guests, /transactions, /reports and /bill/<id> at a configurable
+concurrency and prints p50/p95/p99 latency and throughput per route as JSON,
+so results can be saved and compared between commits. If any request fails
+with a 5xx, no timings are reported and the script exits non-zero, since
+they would measure error pages.
+
+Usage:
+    python benchmarks/bench_routes.py --seed-data --rooms 1000 --guests 10000 \\
+        --payments 200000 --expenses 100000 --concurrency 8 --requests 200 --output before.json
+    python benchmarks/bench_routes.py --database bench.db --concurrency 8 --requests 200
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ROUTES = ('index', 'guests', 'transactions', 'reports', 'bill')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--database', help='SQLite file to benchmark (default: a temporary database)')
+    parser.add_argument('--seed-data', action='store_true', help='Populate the database with synthetic data first')
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--guests', type=int, default=10000)
+    parser.add_argument('--payments', type=int, default=200000)
+    parser.add_argument('--expenses', type=int, default=100000)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42, help='Seed for the data and the request mix')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent client threads')
+    parser.add_argument('--requests', type=int, default=100, help='Requests per route')
+    parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per route')
+    parser.add_argument('--routes', default=','.join(ROUTES), help='Comma-separated subset of ' + ', '.join(ROUTES))
+    parser.add_argument('--output', help='Also write the JSON result to this file')
+    parser.add_argument('--verbose', action='store_true', help='Keep application logging')
+    return parser.parse_args()
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+def build_urls(route, count, rng, guest_ids, years):
+    today = date.today()
+    urls = []
+    for _ in range(count):
+        if route == 'index':
+            urls.append('/')
+        elif route == 'guests':
+            urls.append('/guests')
+        elif route == 'transactions':
+            urls.append('/transactions')
+        elif route == 'reports':
+            # Mostly the current month, with a tail of older months
+            months_back = 0 if rng.random() < 0.7 else rng.randrange(12 * years)
+            year, month = divmod(today.year * 12 + today.month - 1 - months_back, 12)
+            urls.append(f'/reports?year={year}&month={month + 1}')
+        elif route == 'bill':
+            urls.append(f'/bill/{rng.choice(guest_ids)}' if guest_ids else '/bill/1')
+    return urls
+
+def run_route(app, urls, concurrency):
+    local = threading.local()
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def fetch(url):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        started = time.perf_counter()
+        response = client.get(url)
+        response.close()
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(fetch, urls))
+    wall = time.perf_counter() - started
+    return latencies, statuses, wall
+
+def summarize(latencies, statuses, wall):
+    values = sorted(latencies)
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        'requests': len(values),
+        'errors': sum(count for status, count in statuses.items() if status >= 500),
+        'status_counts': {str(status): count for status, count in sorted(statuses.items())},
+        'mean_ms': ms(sum(values) / len(values)) if values else None,
+        'p50_ms': ms(percentile(values, 50)),
+        'p95_ms': ms(percentile(values, 95)),
+        'p99_ms': ms(percentile(values, 99)),
+        'max_ms': ms(values[-1]) if values else None,
+        'throughput_rps': round(len(values) / wall, 2) if wall > 0 else None
+    }
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    args = parse_args()
+    routes = [route.strip() for route in args.routes.split(',') if route.strip()]
+    unknown = set(routes) - set(ROUTES)
+    if unknown:
+        sys.exit(f"Unknown routes: {', '.join(sorted(unknown))}")
+
+    tmp = None
+    database = args.database
+    if database is None:
+        tmp = tempfile.TemporaryDirectory()
+        database = os.path.join(tmp.name, 'bench.db')
+    # The app reads its database URL and startup flags at import time
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.abspath(database)}"
+    os.environ['AUTO_CREATE_SCHEMA'] = '1'
+
+    from app import app
+    from db import db
+    from models import Guest, Room, Payment, Expense
+    from synthetic_data import generate
+
+    # Count unhandled errors as 500 responses instead of re-raising them in debug mode
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+
+    with app.app_context():
+        if args.seed_data:
+            generate(rooms=args.rooms, guests=args.guests, payments=args.payments, expenses=args.expenses,
+                     years=args.years, seed=args.seed)
+        dataset = {
+            'rooms': Room.query.count(),
+            'guests': Guest.query.count(),
+            'payments': Payment.query.count(),
+            'expenses': Expense.query.count()
+        }
+        guest_ids = [i for (i,) in db.session.query(Guest.id)]
+
+    if not args.verbose:
+        logging.disable(logging.ERROR)
+
+    rng = random.Random(args.seed)
+    results = {}
+    for route in routes:
+        run_route(app, build_urls(route, args.warmup, rng, guest_ids, args.years), args.concurrency)
+        urls = build_urls(route, args.requests, rng, guest_ids, args.years)
+        results[route] = summarize(*run_route(app, urls, args.concurrency))
+
+    logging.disable(logging.NOTSET)
+
+    failing = {route: result['status_counts'] for route, result in results.items() if result['errors']}
+    if failing:
+        if tmp is not None:
+            tmp.cleanup()
+        sys.exit('Routes failed, no timings reported: '
+                 + '; '.join(f"{route} {counts}" for route, counts in failing.items()))
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'concurrency': args.concurrency,
+        'requests_per_route': args.requests,
+        'seed': args.seed,
+        'dataset': dataset,
+        'routes': results
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    if tmp is not None:
+        tmp.cleanup()
+
+if __name__ == '__main__':
+    main()
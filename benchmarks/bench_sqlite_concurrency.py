@@ -0,0 +1,75 @@
+"""
+Read/write throughput with concurrent writer threads: default SQLite vs tuned profile
+
+Usage:
+    python benchmarks/bench_sqlite_concurrency.py [writers] [readers] [seconds]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from config import Config
+from db import apply_sqlite_pragmas
+
+def run(path, writers, readers, seconds, pragmas):
+    engine = create_engine(f"sqlite:///{path}", pool_size=writers + readers, max_overflow=0)
+    if pragmas:
+        event.listen(engine, 'connect', lambda conn, record: apply_sqlite_pragmas(conn, pragmas))
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE payment (id INTEGER PRIMARY KEY, guest_id INTEGER, amount FLOAT, date TEXT)"))
+
+    counts = {'writes': 0, 'reads': 0, 'locked': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def writer(n):
+        while time.perf_counter() < deadline:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text("INSERT INTO payment (guest_id, amount, date) VALUES (:g, :a, datetime('now'))"),
+                                 {'g': n, 'a': 100.0})
+                with lock:
+                    counts['writes'] += 1
+            except OperationalError:
+                with lock:
+                    counts['locked'] += 1
+
+    def reader():
+        while time.perf_counter() < deadline:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT count(*), sum(amount) FROM payment")).one()
+                with lock:
+                    counts['reads'] += 1
+            except OperationalError:
+                with lock:
+                    counts['locked'] += 1
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return counts
+
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+    print(f"writers: {writers}  readers: {readers}  duration: {seconds}s")
+    for label, pragmas in (('default', None), ('tuned', Config.SQLITE_PRAGMAS)):
+        with tempfile.TemporaryDirectory() as tmp:
+            counts = run(os.path.join(tmp, 'bench.db'), writers, readers, seconds, pragmas)
+        print(f"{label:>8}: {counts['writes'] / seconds:9.1f} writes/s  "
+              f"{counts['reads'] / seconds:9.1f} reads/s  {counts['locked']} locked errors")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Application startup time: cold import to first response
+
+Each run is a fresh interpreter that imports the app, then serves the
+dashboard through the test client. Runs with the default startup are
+compared against ones that also create or migrate the schema at startup
+(``AUTO_CREATE_SCHEMA``), and the report shows whether ReportLab was
+imported before the first PDF was rendered.
+
+Usage:
+    python benchmarks/bench_startup.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+status = app.test_client().get('/').status_code
+responded = time.perf_counter()
+print(json.dumps({'import': imported - started, 'first_response': responded - started, 'status': status,
+                  'reportlab': any(name.startswith('reportlab') for name in sys.modules)}))
+"""
+
+def run_child(env):
+    output = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def measure(label, env, runs):
+    results = [run_child(env) for _ in range(runs)]
+    statuses = sorted({result['status'] for result in results})
+    print(f"{label:<22} import {statistics.median(r['import'] for r in results) * 1000:8.1f} ms  "
+          f"first response {statistics.median(r['first_response'] for r in results) * 1000:8.1f} ms  "
+          f"reportlab loaded {any(r['reportlab'] for r in results)}  status {statuses}")
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                   PYTHONPATH=ROOT)
+        env.pop('RUN_BACKGROUND_JOBS', None)
+        # Create the schema once, as `flask init-db` would
+        run_child(dict(env, AUTO_CREATE_SCHEMA='1'))
+        print(f"runs: {runs} (median)")
+        measure('default', dict(env, AUTO_CREATE_SCHEMA=''), runs)
+        measure('AUTO_CREATE_SCHEMA=1', dict(env, AUTO_CREATE_SCHEMA='1'), runs)
+
+if __name__ == '__main__':
+    main()
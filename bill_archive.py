@@ -0,0 +1,121 @@
+import csv
+import io
+import os
+import zipfile
+from datetime import datetime
+import logging
+from werkzeug.utils import secure_filename
+from db import db
+from models import Guest, Room, Bill
+from documents import document_path, documents_by_path
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bytes read from each PDF at a time
+READ_CHUNK_SIZE = 64 * 1024
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable stream that hands written bytes back in chunks"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def bill_download_name(guest_name, bill_id):
+    """
+    File name a bill PDF is offered under; stored files are named by content hash
+
+    The guest's name is reduced to a safe slug, so it cannot add folders or
+    traverse out of the folder an archive is extracted to.
+    """
+    return f"bill_{secure_filename(guest_name) or 'guest'}_{bill_id}.pdf"
+
+def archive_entries(year, month, guest_ids=None):
+    """
+    Get the bills of a billing month that have an indexed PDF
+
+    Identical bills share one file, so documents are matched by path and one
+    document can appear for several bills.
+
+    Args:
+        year: int, billing year
+        month: int, billing month
+        guest_ids: optional list of guest ids to limit the archive to
+
+    Returns:
+        list: (Document, bill id, guest id, guest name, room number, total amount) tuples
+    """
+    query = db.session.query(Bill.pdf_path, Bill.id, Guest.id, Guest.full_name, Room.room_number, Bill.total_amount)\
+        .join(Guest, Bill.guest_id == Guest.id)\
+        .join(Room, Bill.room_id == Room.id)\
+        .filter(Bill.pdf_path.isnot(None), Bill.billing_year == year, Bill.billing_month == month)
+    if guest_ids:
+        query = query.filter(Bill.guest_id.in_(guest_ids))
+    rows = query.order_by(Bill.id).all()
+    documents = documents_by_path(row[0] for row in rows)
+    return [(documents[row[0]],) + tuple(row[1:]) for row in rows if row[0] in documents]
+
+def stream_bill_archive(entries, compresslevel=6):
+    """
+    Stream a ZIP of bill PDFs as it is built
+
+    Each PDF is read and compressed a chunk at a time, and the compressed
+    bytes are yielded as soon as they are written, so memory use does not
+    grow with the number or size of the files and nothing is written to
+    disk. The ZIP uses data descriptors since the output cannot seek back.
+    A manifest.csv with each bill's details and checksum closes the
+    archive. Files missing from disk are left out and listed in the log.
+
+    Args:
+        entries: rows from ``archive_entries``
+        compresslevel: int, deflate level for the PDFs
+
+    Yields:
+        bytes: consecutive pieces of the archive
+    """
+    sink = _ChunkSink()
+    manifest = io.StringIO()
+    writer = csv.writer(manifest)
+    writer.writerow(['bill_id', 'guest_id', 'guest_name', 'room_number', 'total_amount', 'file', 'sha256'])
+    names = set()
+    missing = []
+
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as archive:
+        for document, bill_id, guest_id, guest_name, room_number, total_amount in entries:
+            path = document_path(document)
+            name = bill_download_name(guest_name, bill_id)
+            try:
+                source = open(path, 'rb')
+            except FileNotFoundError:
+                missing.append(bill_id)
+                continue
+            names.add(name)
+            info = zipfile.ZipInfo(name, datetime.fromtimestamp(document.mtime).timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with source, archive.open(info, mode='w', force_zip64=True) as target:
+                for chunk in iter(lambda: source.read(READ_CHUNK_SIZE), b''):
+                    target.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            writer.writerow([bill_id, guest_id, guest_name, room_number, total_amount, name, document.checksum])
+
+        archive.writestr('manifest.csv', manifest.getvalue())
+    yield sink.drain()
+
+    if missing:
+        logger.warning(f"Bill archive skipped {len(missing)} bills whose PDFs are missing: {missing}")
+    logger.info(f"Bill archive streamed with {len(names)} PDFs")
@@ -0,0 +1,131 @@
+import os
+import json
+import hashlib
+import tempfile
+from collections import namedtuple
+import logging
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bump when the bill layout changes, so bills rendered with the old layout are not reused
+BILL_TEMPLATE_VERSION = 1
+
+# Folder under the bills directory mapping input hashes to rendered files
+INDEX_FOLDER = '.index'
+
+# Outcome of rendering a bill: 'rendered', 'deduplicated' (rendered, but an
+# identical file already existed) or 'reused' (inputs seen before, not rendered)
+BillRender = namedtuple('BillRender', 'path status seconds saved_seconds saved_bytes')
+
+def input_hash(rows):
+    """
+    Hash everything printed on a bill
+
+    Args:
+        rows: list of [label, value] rows shown on the bill
+
+    Returns:
+        str: SHA-256 hex digest of the rows and the template version
+    """
+    payload = json.dumps([BILL_TEMPLATE_VERSION, rows], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _index_path(key):
+    return os.path.join(Config.BILLS_PATH, INDEX_FOLDER, key[:2], f"{key}.json")
+
+def _write_atomic(path, data):
+    # Write to a temporary file and rename it, so readers never see a partial file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def lookup(key):
+    """
+    Find the file rendered earlier for a bill's inputs
+
+    Returns:
+        dict: path, size and seconds of the earlier render, or None if there
+        is none or its file has been removed
+    """
+    try:
+        with open(_index_path(key), encoding='utf-8') as f:
+            entry = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return entry if os.path.exists(entry['path']) else None
+
+def store(data, year, month, key, seconds):
+    """
+    Save a rendered bill under its content hash and remember its inputs
+
+    Bills are kept in the folder of their billing month as
+    ``bill_<sha256>.pdf``, so identical bills share one file.
+
+    Args:
+        data: bytes of the PDF
+        year: int, billing year
+        month: int, billing month
+        key: str, input hash of the bill
+        seconds: float, time the render took
+
+    Returns:
+        tuple: (path, whether an identical file already existed)
+    """
+    checksum = hashlib.sha256(data).hexdigest()
+    path = os.path.join(Config.get_bills_folder(year, month), f"bill_{checksum}.pdf")
+    existed = os.path.exists(path)
+    if not existed:
+        _write_atomic(path, data)
+    entry = {'path': path, 'checksum': checksum, 'size': len(data), 'seconds': seconds}
+    _write_atomic(_index_path(key), json.dumps(entry).encode('utf-8'))
+    return path, existed
+
+def prune_index():
+    """
+    Drop index entries whose file no longer exists
+
+    Returns:
+        int: number of entries removed
+    """
+    removed = 0
+    folder = os.path.join(Config.BILLS_PATH, INDEX_FOLDER)
+    if not os.path.isdir(folder):
+        return removed
+    for shard in os.scandir(folder):
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            try:
+                with open(entry.path, encoding='utf-8') as f:
+                    target = json.load(f)['path']
+            except (OSError, ValueError, KeyError):
+                target = None
+            if target is None or not os.path.exists(target):
+                os.remove(entry.path)
+                removed += 1
+        if not any(os.scandir(shard.path)):
+            os.rmdir(shard.path)
+    return removed
+
+def index_entries():
+    """Yield every index entry as a dict"""
+    folder = os.path.join(Config.BILLS_PATH, INDEX_FOLDER)
+    if not os.path.isdir(folder):
+        return
+    for shard in os.scandir(folder):
+        if shard.is_dir():
+            for entry in os.scandir(shard.path):
+                try:
+                    with open(entry.path, encoding='utf-8') as f:
+                        yield json.load(f)
+                except (OSError, ValueError):
+                    continue
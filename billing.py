@@ -0,0 +1,241 @@
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import logging
+from sqlalchemy.exc import IntegrityError
+from db import db
+from models import Guest, Room, Bill, Accrual
+from utils import render_bill_pdf, record_bill_render
+from accrual import accrue
+from receivables import invalidate_receivables
+from documents import register_bill_documents
+from render_farm import render_farm
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Picklable copies of the rows a bill PDF needs, for render processes
+BillSnapshot = namedtuple('BillSnapshot', 'billing_month billing_year total_days discount total_amount generated_date',
+                          defaults=(None,))
+GuestSnapshot = namedtuple('GuestSnapshot', 'id full_name')
+RoomSnapshot = namedtuple('RoomSnapshot', 'id room_number room_type price_per_month')
+
+# Number of bills written per database transaction
+DEFAULT_CHUNK_SIZE = 500
+
+def render_bill_job(job):
+    """
+    Render a single bill PDF inside a worker process
+    
+    Args:
+        job: tuple of (key, BillSnapshot, GuestSnapshot, RoomSnapshot)
+    
+    Returns:
+        tuple: (key, BillRender or None)
+    """
+    key, bill, guest, room = job
+    try:
+        return key, render_bill_pdf(bill, guest, room)
+    except Exception as e:
+        logger.error(f"Error rendering bill PDF for guest {guest.id}: {str(e)}")
+        return key, None
+
+def billing_key(guest_id, year, month):
+    """Idempotency key of a guest's automatic bill for a billing period"""
+    return f"bill:{guest_id}:{year}-{month:02d}"
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _existing_keys(keys):
+    return {key for (key,) in db.session.query(Bill.idempotency_key).filter(Bill.idempotency_key.in_(keys))}
+
+def _remove_pdf(path, keep=()):
+    # Identical bills share one file, with stored bills or with the rows still to be written
+    if path in keep or db.session.query(Bill.id).filter(Bill.pdf_path == path).first() is not None:
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _write_chunk(bill_rows, guest_rows, link_accruals, unbilled):
+    db.session.bulk_insert_mappings(Bill, bill_rows, return_defaults=True)
+    if bill_rows:
+        db.session.execute(link_accruals, [
+            {'b_guest_id': row['guest_id'], 'b_max_id': unbilled[row['guest_id']][0], 'b_bill_id': row['id']}
+            for row in bill_rows
+        ])
+        register_bill_documents(bill_rows)
+    db.session.bulk_update_mappings(Guest, guest_rows)
+    db.session.commit()
+
+def run_billing(current_date=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+    """
+    Generate bills for every guest in one batched run
+    
+    Charges are accrued up to the billing date, then each guest's unbilled
+    accruals are billed. PDFs are rendered in parallel and the bills are
+    written in chunked bulk transactions. Guests already billed for the
+    period are skipped, so the run can be repeated after a crash, and the
+    ``idempotency_key`` keeps two overlapping runs from billing a guest twice.
+    
+    Args:
+        current_date: datetime object of the billing date, defaults to now
+        chunk_size: int, number of bills written per transaction
+        workers: int, number of render processes without a render farm, defaults to CPU count
+    
+    Returns:
+        dict: run summary with billed, skipped, failed, reused, saved_bytes, saved_seconds,
+        elapsed and bills_per_sec
+    """
+    current_date = current_date or datetime.now()
+    billing_date = current_date.date()
+    started = time.perf_counter()
+    
+    # Move every guest's billing cursor up to the billing date
+    accrue(billing_date)
+    
+    # Guests already billed for this period
+    already_billed = {
+        guest_id for (guest_id,) in db.session.query(Bill.guest_id).filter(
+            Bill.billing_month == current_date.month,
+            Bill.billing_year == current_date.year
+        )
+    }
+    
+    # Unbilled charges per guest, with the guest's room
+    rows = db.session.query(
+        Guest.id, Guest.full_name, Room.id, Room.room_number, Room.room_type, Room.price_per_month,
+        db.func.sum(Accrual.days), db.func.sum(Accrual.amount_paise), db.func.max(Accrual.id)
+    ).join(Accrual, Accrual.guest_id == Guest.id)\
+        .join(Room, Guest.room_id == Room.id)\
+        .filter(Accrual.bill_id.is_(None))\
+        .group_by(Guest.id, Guest.full_name, Room.id, Room.room_number, Room.room_type, Room.price_per_month)\
+        .all()
+    
+    jobs = []
+    skipped = 0
+    unbilled = {}
+    for (guest_id, full_name, room_id, room_number, room_type, price_per_month,
+         total_days, amount_paise, max_accrual_id) in rows:
+        if guest_id in already_billed:
+            skipped += 1
+            continue
+        
+        guest = GuestSnapshot(guest_id, full_name)
+        room = RoomSnapshot(room_id, room_number, room_type, price_per_month)
+        bill = BillSnapshot(current_date.month, current_date.year, total_days, 0.0, amount_paise / 100, current_date)
+        unbilled[guest_id] = (max_accrual_id, amount_paise)
+        jobs.append((guest_id, bill, guest, room))
+    
+    logger.info(f"Starting billing run: {len(jobs)} to bill, {skipped} already billed")
+    
+    accruals = Accrual.__table__
+    link_accruals = accruals.update()\
+        .where(accruals.c.guest_id == db.bindparam('b_guest_id'),
+               accruals.c.bill_id.is_(None),
+               accruals.c.id <= db.bindparam('b_max_id'))\
+        .values(bill_id=db.bindparam('b_bill_id'))
+    
+    billed = 0
+    failed = 0
+    reused = 0
+    saved_bytes = 0
+    saved_seconds = 0.0
+    workers = workers or os.cpu_count() or 1
+    
+    executor = ProcessPoolExecutor(max_workers=workers) \
+        if not render_farm.dispatching and workers > 1 and len(jobs) > 1 else None
+    try:
+        for chunk in _chunks(jobs, chunk_size):
+            # Render the chunk's PDFs
+            if render_farm.dispatching:
+                rendered = dict(render_farm.map('bill', render_bill_job, chunk))
+            elif executor:
+                rendered = dict(executor.map(render_bill_job, chunk, chunksize=max(1, len(chunk) // workers)))
+            else:
+                rendered = dict(map(render_bill_job, chunk))
+            
+            # Build the bill rows
+            bill_rows = []
+            guest_rows = []
+            for guest_id, bill, guest, room in chunk:
+                render = rendered.get(guest_id)
+                if render is None:
+                    failed += 1
+                    continue
+                
+                record_bill_render(render)
+                reused += render.status == 'reused'
+                saved_bytes += render.saved_bytes
+                saved_seconds += render.saved_seconds
+                bill_rows.append({
+                    'guest_id': guest_id,
+                    'room_id': room.id,
+                    'billing_month': bill.billing_month,
+                    'billing_year': bill.billing_year,
+                    'total_days': bill.total_days,
+                    'discount': bill.discount,
+                    'total_amount': bill.total_amount,
+                    'amount_paise': unbilled[guest_id][1],
+                    'generated_date': current_date,
+                    'pdf_path': render.path,
+                    'idempotency_key': billing_key(guest_id, bill.billing_year, bill.billing_month)
+                })
+                guest_rows.append({'id': guest_id, 'last_bill_date': billing_date})
+            
+            # Write the chunk
+            try:
+                try:
+                    _write_chunk(bill_rows, guest_rows, link_accruals, unbilled)
+                except IntegrityError:
+                    # Another run billed some of these guests meanwhile
+                    db.session.rollback()
+                    taken = _existing_keys([row['idempotency_key'] for row in bill_rows])
+                    kept = [row for row in bill_rows if row['idempotency_key'] not in taken]
+                    kept_paths = {row['pdf_path'] for row in kept}
+                    for row in bill_rows:
+                        if row['idempotency_key'] in taken:
+                            _remove_pdf(row['pdf_path'], kept_paths)
+                    skipped += len(taken)
+                    bill_rows = kept
+                    guest_rows = [row for row in guest_rows
+                                  if billing_key(row['id'], current_date.year, current_date.month) not in taken]
+                    _write_chunk(bill_rows, guest_rows, link_accruals, unbilled)
+                billed += len(bill_rows)
+            
+            except Exception as e:
+                logger.error(f"Error writing billing chunk: {str(e)}")
+                db.session.rollback()
+                failed += len(bill_rows)
+    finally:
+        if executor:
+            executor.shutdown()
+    
+    # Bills were bulk inserted, bypassing the session events
+    if billed:
+        invalidate_receivables()
+    
+    elapsed = time.perf_counter() - started
+    bills_per_sec = billed / elapsed if elapsed > 0 else 0.0
+    logger.info(
+        f"Billing run completed: {billed} billed, {skipped} skipped, {failed} failed "
+        f"in {elapsed:.2f}s ({bills_per_sec:.1f} bills/sec); {reused} PDFs reused, "
+        f"saving {saved_bytes} bytes and {saved_seconds:.2f}s of rendering"
+    )
+    
+    return {
+        'billed': billed,
+        'skipped': skipped,
+        'failed': failed,
+        'reused': reused,
+        'saved_bytes': saved_bytes,
+        'saved_seconds': saved_seconds,
+        'elapsed': elapsed,
+        'bills_per_sec': bills_per_sec
+    }
@@ -0,0 +1,320 @@
+import csv
+import json
+import os
+import time
+from datetime import datetime, date
+import logging
+from db import db
+from models import Guest, Room, Bill, Payment, Expense, ROOM_PRICES, ROOM_CAPACITIES
+from allocation import sync_room_occupancy
+from ledger import rebuild_ledger
+from accrual import rebuild_accounts
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rows inserted per transaction
+DEFAULT_BATCH_SIZE = 5000
+
+FOOD_PREFERENCES = ('veg', 'non-veg')
+PAYMENT_STATUSES = ('informed & pending', 'paid', 'advance')
+
+TABLES = {
+    'rooms': Room,
+    'guests': Guest,
+    'payments': Payment,
+    'expenses': Expense
+}
+
+class RowError(ValueError):
+    """Raised when an import row fails validation"""
+
+def _text(row, field, required=True):
+    value = row.get(field)
+    if value is None or str(value).strip() == '':
+        if required:
+            raise RowError(f"missing {field}")
+        return None
+    return str(value).strip()
+
+def _int(row, field, required=True):
+    value = _text(row, field, required)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise RowError(f"invalid integer for {field}: {value!r}")
+
+def _float(row, field, required=True):
+    value = _text(row, field, required)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise RowError(f"invalid number for {field}: {value!r}")
+
+def _date(row, field, required=True):
+    value = _text(row, field, required)
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        raise RowError(f"invalid date for {field}: {value!r}")
+
+def _datetime(row, field, required=True):
+    value = _text(row, field, required)
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise RowError(f"invalid datetime for {field}: {value!r}")
+
+def _choice(row, field, choices):
+    value = _text(row, field)
+    if value not in choices:
+        raise RowError(f"invalid {field}: {value!r}")
+    return value
+
+class _Importer:
+    """Validates rows for one table against the existing data"""
+
+    def __init__(self, table):
+        self.table = table
+        self.model = TABLES[table]
+        self.occupied_room_ids = set()
+        if table == 'rooms':
+            self.room_numbers = {n for (n,) in db.session.query(Room.room_number)}
+        if table == 'guests':
+            self.rooms_by_number = dict(db.session.query(Room.room_number, Room.id))
+            self.free_beds = dict(db.session.query(Room.id, Room.capacity - Room.beds_occupied))
+            self.citizen_numbers = {n for (n,) in db.session.query(Guest.citizen_number)}
+            self.emails = {e for (e,) in db.session.query(Guest.email)}
+        if table == 'payments':
+            self.guest_ids = {i for (i,) in db.session.query(Guest.id)}
+            self.bill_guests = dict(db.session.query(Bill.id, Bill.guest_id))
+
+    def validate(self, row):
+        return getattr(self, f"_validate_{self.table}")(row)
+
+    def _validate_rooms(self, row):
+        room_number = _text(row, 'room_number')
+        room_type = _choice(row, 'room_type', ROOM_PRICES)
+        if room_number in self.room_numbers:
+            raise RowError(f"duplicate room_number {room_number!r}")
+        self.room_numbers.add(room_number)
+        # Beds are taken by importing guests, not by the room row
+        return {
+            'room_number': room_number,
+            'room_type': room_type,
+            'price_per_month': ROOM_PRICES[room_type],
+            'capacity': ROOM_CAPACITIES[room_type],
+            'beds_occupied': 0,
+            'occupancy': False
+        }
+
+    def _validate_guests(self, row):
+        room_id = _int(row, 'room_id', required=False)
+        if room_id is None:
+            room_number = _text(row, 'room_number')
+            room_id = self.rooms_by_number.get(room_number)
+            if room_id is None:
+                raise RowError(f"unknown room_number {room_number!r}")
+        elif room_id not in self.free_beds:
+            raise RowError(f"unknown room_id {room_id}")
+        check_out_date = _date(row, 'check_out_date', required=False)
+        if check_out_date is None and self.free_beds[room_id] <= 0:
+            raise RowError(f"room {room_id} has no free beds")
+
+        citizen_number = _text(row, 'citizen_number')
+        email = _text(row, 'email')
+        if citizen_number in self.citizen_numbers:
+            raise RowError(f"duplicate citizen_number {citizen_number!r}")
+        if email in self.emails:
+            raise RowError(f"duplicate email {email!r}")
+        self.citizen_numbers.add(citizen_number)
+        self.emails.add(email)
+        if check_out_date is None:
+            self.free_beds[room_id] -= 1
+            self.occupied_room_ids.add(room_id)
+
+        return {
+            'full_name': _text(row, 'full_name'),
+            'citizen_number': citizen_number,
+            'email': email,
+            'emergency_contact': _text(row, 'emergency_contact'),
+            'address': _text(row, 'address'),
+            'date_of_birth': _date(row, 'date_of_birth'),
+            'food_preference': _choice(row, 'food_preference', FOOD_PREFERENCES),
+            'check_in_date': _date(row, 'check_in_date'),
+            'check_out_date': check_out_date,
+            'last_bill_date': _date(row, 'last_bill_date', required=False),
+            'room_id': room_id
+        }
+
+    def _validate_payments(self, row):
+        guest_id = _int(row, 'guest_id')
+        if guest_id not in self.guest_ids:
+            raise RowError(f"unknown guest_id {guest_id}")
+        bill_id = _int(row, 'bill_id', required=False)
+        if bill_id is not None:
+            if bill_id not in self.bill_guests:
+                raise RowError(f"unknown bill_id {bill_id}")
+            if self.bill_guests[bill_id] != guest_id:
+                raise RowError(f"bill_id {bill_id} belongs to another guest")
+        return {
+            'guest_id': guest_id,
+            'bill_id': bill_id,
+            'amount': _float(row, 'amount'),
+            'date': _datetime(row, 'date', required=False) or datetime.utcnow(),
+            'payment_status': _choice(row, 'payment_status', PAYMENT_STATUSES)
+        }
+
+    def _validate_expenses(self, row):
+        return {
+            'category': _text(row, 'category'),
+            'description': _text(row, 'description', required=False),
+            'amount': _float(row, 'amount'),
+            'date': _datetime(row, 'date', required=False) or datetime.utcnow()
+        }
+
+def _read_rows(path):
+    """Stream rows from a CSV or JSONL file as dicts"""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+def _flush(importer, batch):
+    db.session.execute(importer.model.__table__.insert(), batch)
+    if importer.occupied_room_ids:
+        # Commits the batch together with the new bed counts
+        sync_room_occupancy(importer.occupied_room_ids)
+        importer.occupied_room_ids = set()
+    else:
+        db.session.commit()
+
+def import_rows(table, path, batch_size=DEFAULT_BATCH_SIZE, max_errors=100):
+    """
+    Stream a CSV or JSONL file into a table in batched transactions
+
+    Invalid rows are skipped and reported; valid rows are inserted through
+    the Core executemany path, ``batch_size`` rows per transaction.
+
+    Args:
+        table: str, one of 'rooms', 'guests', 'payments', 'expenses'
+        path: str, path to a .csv or .jsonl file
+        batch_size: int, rows inserted per transaction
+        max_errors: int, number of row errors kept for the report
+
+    Returns:
+        dict: inserted, rejected, errors (line number and message), elapsed and rows_per_sec
+    """
+    if table not in TABLES:
+        raise ValueError(f"Unknown table {table!r}, expected one of {', '.join(TABLES)}")
+
+    started = time.perf_counter()
+    importer = _Importer(table)
+    inserted = 0
+    rejected = 0
+    errors = []
+    batch = []
+
+    for line_number, row in enumerate(_read_rows(path), start=1):
+        try:
+            batch.append(importer.validate(row))
+        except RowError as e:
+            rejected += 1
+            if len(errors) < max_errors:
+                errors.append((line_number, str(e)))
+            continue
+
+        if len(batch) >= batch_size:
+            try:
+                _flush(importer, batch)
+            except Exception:
+                db.session.rollback()
+                raise
+            inserted += len(batch)
+            batch = []
+            logger.info(f"Imported {inserted} {table}")
+
+    if batch:
+        try:
+            _flush(importer, batch)
+        except Exception:
+            db.session.rollback()
+            raise
+        inserted += len(batch)
+
+    # Bulk inserts bypass the session events that maintain the daily ledger and balances
+    if table in ('payments', 'expenses') and inserted:
+        rebuild_ledger()
+    if table == 'payments' and inserted:
+        rebuild_accounts()
+
+    elapsed = time.perf_counter() - started
+    rows_per_sec = inserted / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Imported {inserted} {table} ({rejected} rejected) in {elapsed:.2f}s "
+                f"({rows_per_sec:.0f} rows/sec)")
+    return {
+        'inserted': inserted,
+        'rejected': rejected,
+        'errors': errors,
+        'elapsed': elapsed,
+        'rows_per_sec': rows_per_sec
+    }
+
+def _serialize(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def export_rows(table, path, chunk_size=DEFAULT_BATCH_SIZE):
+    """
+    Stream a table to a CSV or JSONL file without loading it into memory
+
+    Args:
+        table: str, one of 'rooms', 'guests', 'payments', 'expenses'
+        path: str, path to a .csv or .jsonl file
+        chunk_size: int, rows fetched from the cursor at a time
+
+    Returns:
+        dict: exported, elapsed and rows_per_sec
+    """
+    if table not in TABLES:
+        raise ValueError(f"Unknown table {table!r}, expected one of {', '.join(TABLES)}")
+
+    started = time.perf_counter()
+    model_table = TABLES[table].__table__
+    columns = [column.name for column in model_table.columns]
+    result = db.session.execute(
+        model_table.select().order_by(model_table.c.id).execution_options(yield_per=chunk_size)
+    )
+
+    exported = 0
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            for row in result.mappings():
+                f.write(json.dumps({key: _serialize(value) for key, value in row.items()}) + '\n')
+                exported += 1
+        else:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in result:
+                writer.writerow([_serialize(value) for value in row])
+                exported += 1
+    os.replace(tmp_path, path)
+
+    elapsed = time.perf_counter() - started
+    rows_per_sec = exported / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Exported {exported} {table} in {elapsed:.2f}s ({rows_per_sec:.0f} rows/sec)")
+    return {'exported': exported, 'elapsed': elapsed, 'rows_per_sec': rows_per_sec}
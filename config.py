@@ -6,29 +6,74 @@ class Config:
     SECRET_KEY = "your_strong_secret_key_replace_in_production"  # Replace with strong key in production
     
     # Database Configuration
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///hostel.db'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///hostel.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Connection pool settings
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 3600)),
+        'pool_pre_ping': True
+    }
+    
+    # SQLite tuning, applied to every new connection (ignored for other databases)
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',  # readers no longer block the writer
+        'synchronous': 'NORMAL',  # safe with WAL, far fewer fsyncs
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 15000)),  # wait instead of "database is locked"
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 268435456)),  # 256 MiB
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -65536)),  # negative means KiB, i.e. 64 MiB
+        'foreign_keys': 'ON',
+        'temp_store': 'MEMORY'
+    }
+    
+    # SQL query monitoring (enabled in debug mode by default)
+    SQL_MONITOR_MAX_QUERIES = 20  # Warn when a request runs more statements than this
+    SQL_MONITOR_MAX_REPEATS = 5  # Warn when one statement shape repeats more than this
+    
+    # Startup: a web process neither touches the schema nor runs background jobs unless asked
+    AUTO_CREATE_SCHEMA = os.environ.get('AUTO_CREATE_SCHEMA', '').lower() in ('1', 'true')  # else `flask init-db`
+    RUN_BACKGROUND_JOBS = os.environ.get('RUN_BACKGROUND_JOBS', '').lower() in ('1', 'true')  # else `flask run-worker`
+    SCHEDULER_LEASE_SECONDS = int(os.environ.get('SCHEDULER_LEASE_SECONDS', 60))  # Leader lease, renewed every third
+    SCHEDULER_MISFIRE_GRACE_SECONDS = int(os.environ.get('SCHEDULER_MISFIRE_GRACE_SECONDS', 21600))  # Late runs still fire
+    JOB_RUN_STALE_SECONDS = int(os.environ.get('JOB_RUN_STALE_SECONDS', 7200))  # A 'running' job run older than this died
+    
     # Application Configuration
     DEBUG = True
+    REPORT_PAGE_SIZE = 100  # Rows per page on the reports screen
+    LIST_PAGE_SIZE = 50  # Rows per page on the guest and transaction listings
+    RECEIVABLES_CACHE_TTL = int(os.environ.get('RECEIVABLES_CACHE_TTL', 300))  # Seconds before receivables are recomputed
+    DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 60))  # Seconds a dashboard fragment is kept
+    DASHBOARD_CACHE_MAX_ENTRIES = int(os.environ.get('DASHBOARD_CACHE_MAX_ENTRIES', 256))
+    DASHBOARD_CACHE_BACKEND = os.environ.get('DASHBOARD_CACHE_BACKEND', '')  # 'module:Class', empty for in-process
     
     # PDF Configuration
     PDF_BILLS_FOLDER = "bills"
+    PDF_RENDER_WORKERS = int(os.environ.get('PDF_RENDER_WORKERS', os.cpu_count() or 2))  # Render farm processes
+    RENDER_FARM_IN_WEB = os.environ.get('RENDER_FARM_IN_WEB', '').lower() in ('1', 'true')  # Also one per web process
+    DOCUMENT_RETENTION_MONTHS = int(os.environ.get('DOCUMENT_RETENTION_MONTHS', 24))  # Months of PDFs kept on disk
+    DOCUMENT_MAX_AGE = int(os.environ.get('DOCUMENT_MAX_AGE', 0))  # Cache-Control max-age for downloads
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true')  # Let Apache/lighttpd send files
+    DOCUMENT_ACCEL_REDIRECT = os.environ.get('DOCUMENT_ACCEL_REDIRECT', '')  # nginx internal location, e.g. /protected
     
     # Get the base directory of the application
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
     
-    # Ensure the bills directory exists
+    # Bills directory, created along with the first monthly folder
     BILLS_PATH = os.path.join(BASE_DIR, PDF_BILLS_FOLDER)
-    if not os.path.exists(BILLS_PATH):
-        os.makedirs(BILLS_PATH)
+    
+    # Get the folder for a billing month's bills
+    @staticmethod
+    def get_bills_folder(year, month):
+        folder_name = f"bills for {datetime(year, month, 1).strftime('%B %Y')}"
+        folder_path = os.path.join(Config.BILLS_PATH, folder_name)
+        os.makedirs(folder_path, exist_ok=True)
+        return folder_path
     
     # Get current month-year folder for bills
     @staticmethod
     def get_current_bills_folder():
         current_date = datetime.now()
-        folder_name = f"bills for {current_date.strftime('%B %Y')}"
-        folder_path = os.path.join(Config.BILLS_PATH, folder_name)
-        if not os.path.exists(folder_path):
-            os.makedirs(folder_path)
-        return folder_path
\ No newline at end of file
+        return Config.get_bills_folder(current_date.year, current_date.month)
\ No newline at end of file
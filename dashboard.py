@@ -0,0 +1,87 @@
+import logging
+from datetime import timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, selectinload
+from db import db
+from models import Guest, Room, Bill, Payment, Expense
+from allocation import bed_occupancy
+from ledger import period_totals, daily_series
+from utils import month_range
+from table_versions import table_versions
+from fragment_cache import FragmentCache
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Writes to these models change what the dashboard shows
+DASHBOARD_MODELS = (Guest, Room, Bill, Payment, Expense)
+
+dashboard_cache = FragmentCache('dashboard')
+
+def dashboard_version():
+    """
+    Get the write versions of every table the dashboard reads
+
+    Cache keys include this, so writes committed by bulk statements or by
+    other processes, which the session hooks do not see, still miss.
+    """
+    versions, _ = table_versions(model.__tablename__ for model in DASHBOARD_MODELS)
+    return '.'.join(map(str, versions))
+
+def dashboard_stats(today):
+    """
+    Compute the dashboard summary numbers and the month's daily series
+
+    Args:
+        today: date, the current day
+
+    Returns:
+        dict: total_guests, occupancy_rate, monthly_income, monthly_expenses,
+        dates, daily_income and daily_expenses
+    """
+    occupied_beds, total_beds = bed_occupancy()
+    month_start, month_end = month_range(today.year, today.month)
+    monthly_income, monthly_expenses = period_totals(month_start, month_end)
+    dates, daily_income, daily_expenses = daily_series(month_start, today + timedelta(days=1))
+    return {
+        'total_guests': Guest.query.count(),
+        'occupancy_rate': round((occupied_beds / total_beds * 100) if total_beds > 0 else 0, 2),
+        'monthly_income': monthly_income,
+        'monthly_expenses': monthly_expenses,
+        'dates': dates,
+        'daily_income': daily_income,
+        'daily_expenses': daily_expenses
+    }
+
+def recent_bills(limit=5):
+    """Get the latest bills with their guest, room and payments loaded"""
+    return Bill.query\
+        .options(joinedload(Bill.guest), joinedload(Bill.room), selectinload(Bill.payments))\
+        .order_by(Bill.generated_date.desc()).limit(limit).all()
+
+def _after_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, DASHBOARD_MODELS):
+            session.info['dashboard_changed'] = True
+            return
+
+def _after_commit(session):
+    if session.info.pop('dashboard_changed', False):
+        dashboard_cache.invalidate()
+
+def _after_rollback(session):
+    session.info.pop('dashboard_changed', None)
+
+def register_dashboard_events(session=None):
+    """
+    Drop the cached dashboard when guest, room, bill, payment or expense changes commit
+
+    Args:
+        session: scoped session to listen on, defaults to ``db.session``
+    """
+    session = session or db.session
+    for name, listener in (('after_flush', _after_flush), ('after_commit', _after_commit),
+                           ('after_rollback', _after_rollback)):
+        if not event.contains(session, name, listener):
+            event.listen(session, name, listener)
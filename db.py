@@ -1,4 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 import logging
 
 # Configure logging
@@ -8,13 +10,108 @@ logger = logging.getLogger(__name__)
 # Initialize SQLAlchemy instance
 db = SQLAlchemy()
 
+def ensure_columns():
+    """
+    Add model columns missing from existing tables
+    
+    ``db.create_all`` never alters existing tables. New columns are added with
+    ``ALTER TABLE ... ADD COLUMN``; a NOT NULL column is only added this way if
+    it declares a ``server_default`` to fill the existing rows.
+    
+    Returns:
+        list: 'table.column' names of the columns that were added
+    """
+    added = []
+    inspector = db.inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} " \
+                  f"{column.type.compile(dialect=db.engine.dialect)}"
+            if column.server_default is not None:
+                ddl += f" NOT NULL DEFAULT '{column.server_default.arg}'" if not column.nullable \
+                    else f" DEFAULT '{column.server_default.arg}'"
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql(ddl)
+            added.append(f"{table.name}.{column.name}")
+            logger.info(f"Added missing column {column.name} to {table.name}")
+    return added
+
+def ensure_indexes():
+    """
+    Create any model indexes missing from the database
+    
+    ``db.create_all`` only creates indexes together with new tables, so
+    databases created before an index was declared never get it. This adds
+    them in place and is safe to run repeatedly.
+    
+    Returns:
+        list: names of the indexes that were created
+    """
+    created = []
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=db.engine)
+                created.append(index.name)
+                logger.info(f"Created missing index {index.name} on {table.name}")
+    return created
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    """
+    Apply SQLite PRAGMA settings to a raw DB-API connection
+    
+    Args:
+        dbapi_connection: sqlite3 connection
+        pragmas: dict of pragma name to value
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+def _engine_options(app):
+    """Drop pool settings that the SQLite in-memory pool does not accept"""
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        for key in ('pool_size', 'max_overflow', 'pool_timeout'):
+            options.pop(key, None)
+    return options
+
 def init_db(app):
-    """Initialize the database with the Flask app"""
+    """Initialize the database with the Flask app; the schema is left to ``create_schema``"""
     try:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = _engine_options(app)
         db.init_app(app)
         with app.app_context():
-            db.create_all()
-            logger.info("Database initialized successfully")
+            pragmas = app.config.get('SQLITE_PRAGMAS')
+            if pragmas and db.engine.dialect.name == 'sqlite':
+                event.listen(db.engine, 'connect',
+                             lambda dbapi_connection, record: apply_sqlite_pragmas(dbapi_connection, pragmas))
+                logger.info(f"SQLite pragmas enabled: {pragmas}")
     except Exception as e:
         logger.error(f"Error initializing database: {str(e)}")
+        raise
+
+def create_schema():
+    """Create missing tables, then add missing columns and indexes to existing ones"""
+    try:
+        db.create_all()
+        ensure_columns()
+        ensure_indexes()
+        logger.info("Database schema created")
+    except Exception as e:
+        logger.error(f"Error creating database schema: {str(e)}")
         raise
\ No newline at end of file
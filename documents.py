@@ -0,0 +1,359 @@
+import os
+import hashlib
+from datetime import date
+from urllib.parse import quote
+import logging
+from flask import Response, send_file
+from sqlalchemy.exc import IntegrityError
+from db import db
+from models import Bill, Document
+from config import Config
+import bill_store
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Read size when hashing a file
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+
+def _stored_path(path):
+    # Paths inside the app directory are kept relative so the tree can move
+    path = os.path.abspath(path)
+    if os.path.commonpath([path, Config.BASE_DIR]) == Config.BASE_DIR:
+        return os.path.relpath(path, Config.BASE_DIR)
+    return path
+
+def document_path(document):
+    """Get the absolute path of a document's file"""
+    return os.path.join(Config.BASE_DIR, document.path)
+
+def file_info(path):
+    """
+    Get the size, SHA-256 checksum and modification time of a file
+
+    Returns:
+        dict: size, checksum and mtime
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHECKSUM_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'checksum': digest.hexdigest(), 'mtime': stat.st_mtime}
+
+def _delete_file(path):
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        logger.warning(f"Could not remove document file {path}: {str(e)}")
+        return False
+
+def _in_use(path, bill_id):
+    # Identical bills share one file, so another bill may still point at it
+    return db.session.query(Bill.id).filter(Bill.pdf_path == path, Bill.id != bill_id).first() is not None
+
+def register_document(path, kind, year, month, bill_id=None):
+    """
+    Record a generated PDF in the document index
+
+    A bill has one current document and so does a month's report, so earlier
+    documents for the same bill or report month are dropped along with their
+    files, unless another bill shares the file. Registering an unchanged file
+    again does not re-hash it. The caller commits.
+
+    Args:
+        path: str, path of the PDF file
+        kind: str, 'bill' or 'report'
+        year: int, billing or report year
+        month: int, billing or report month
+        bill_id: int, bill the PDF belongs to (bills only)
+
+    Returns:
+        Document: the indexed document
+    """
+    stored = _stored_path(path)
+    document = Document.query.filter_by(path=stored).first()
+    stat = os.stat(path)
+    if document is None:
+        document = Document(path=stored, kind=kind, period_year=year, period_month=month, bill_id=bill_id,
+                            **file_info(path))
+        db.session.add(document)
+    elif (document.size, document.mtime) != (stat.st_size, stat.st_mtime):
+        for key, value in file_info(path).items():
+            setattr(document, key, value)
+
+    superseded = Document.query.filter(Document.kind == kind, Document.path != stored)
+    if bill_id is not None:
+        superseded = superseded.filter(Document.bill_id == bill_id)
+    else:
+        superseded = superseded.filter(Document.period_year == year, Document.period_month == month)
+    for old in superseded.all():
+        if not _in_use(document_path(old), bill_id):
+            _delete_file(document_path(old))
+        db.session.delete(old)
+
+    db.session.flush()
+    return document
+
+def register_bill_documents(bill_rows):
+    """
+    Index the PDFs of newly inserted bills in one bulk insert
+
+    Files already in the index (identical bills share one) are left as they are.
+
+    Args:
+        bill_rows: list of bill mappings with id, billing_year, billing_month and pdf_path
+
+    Returns:
+        int: number of documents indexed
+    """
+    rows = {}
+    for row in bill_rows:
+        if row.get('pdf_path') and _stored_path(row['pdf_path']) not in rows:
+            rows[_stored_path(row['pdf_path'])] = row
+    if rows:
+        for offset in range(0, len(rows), 500):
+            for (path,) in db.session.query(Document.path).filter(Document.path.in_(list(rows)[offset:offset + 500])):
+                rows.pop(path, None)
+    rows = [dict(file_info(row['pdf_path']), path=path, kind='bill',
+                 bill_id=row['id'], period_year=row['billing_year'], period_month=row['billing_month'])
+            for path, row in rows.items()]
+    if rows:
+        db.session.execute(Document.__table__.insert(), rows)
+    return len(rows)
+
+def latest_bill_document(bill):
+    """
+    Get the current document of a bill
+
+    Bills rendered before the index existed are indexed on first use. A
+    file shared by identical bills is indexed once, under the first of them,
+    so the document is found by the bill's path.
+
+    Returns:
+        Document: the bill's document, or None if it has no PDF on disk
+    """
+    if bill.pdf_path:
+        document = Document.query.filter_by(path=_stored_path(bill.pdf_path)).first()
+    else:
+        document = Document.query.filter_by(bill_id=bill.id, kind='bill').order_by(Document.id.desc()).first()
+    if document is None and bill.pdf_path and os.path.exists(bill.pdf_path):
+        document = register_document(bill.pdf_path, 'bill', bill.billing_year, bill.billing_month, bill.id)
+        db.session.commit()
+    return document
+
+def report_document(path, year, month, rendered):
+    """
+    Get the document of a month's report PDF
+
+    Reading a cached report only looks the document up. It is registered
+    when the PDF was just rendered, or when a cached file is not indexed yet.
+    Two requests registering the same file race on the unique path, and the
+    loser reads the winner's document.
+
+    Args:
+        path: str, path of the report PDF
+        year: int, report year
+        month: int, report month
+        rendered: bool, whether the PDF was built for this request
+
+    Returns:
+        Document: the report's document
+    """
+    stored = _stored_path(path)
+    document = None if rendered else Document.query.filter_by(path=stored).first()
+    if document is not None:
+        return document
+    try:
+        document = register_document(path, 'report', year, month)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        document = Document.query.filter_by(path=stored).one()
+    return document
+
+def documents_by_path(paths):
+    """
+    Get the indexed documents of a list of files
+
+    Args:
+        paths: iterable of file paths, as stored on bills
+
+    Returns:
+        dict: path -> Document, for the paths that are indexed
+    """
+    stored = {_stored_path(path): path for path in set(paths)}
+    found = {}
+    keys = list(stored)
+    for offset in range(0, len(keys), 500):
+        for document in Document.query.filter(Document.path.in_(keys[offset:offset + 500])):
+            found[stored[document.path]] = document
+    return found
+
+def send_document(document, config, download_name=None):
+    """
+    Build the download response for a document
+
+    The file is streamed by the WSGI server's file wrapper (sendfile where the
+    server supports it), or handed to the front-end server with
+    ``X-Sendfile`` when ``USE_X_SENDFILE`` is set or with
+    ``X-Accel-Redirect`` when ``DOCUMENT_ACCEL_REDIRECT`` names an internal
+    location. Range requests and If-None-Match / If-Modified-Since use the
+    indexed checksum and mtime, so no file is read to answer them.
+
+    Args:
+        document: Document to send
+        config: app config
+        download_name: str, file name offered to the client, defaults to the stored one
+
+    Returns:
+        Response: file response
+
+    Raises:
+        FileNotFoundError: if the file is gone from disk
+    """
+    path = document_path(document)
+    stat = os.stat(path)
+    if (document.size, document.mtime) != (stat.st_size, stat.st_mtime):
+        # Changed on disk since it was indexed
+        for key, value in file_info(path).items():
+            setattr(document, key, value)
+        db.session.commit()
+
+    download_name = download_name or document.filename
+    accel_prefix = config.get('DOCUMENT_ACCEL_REDIRECT')
+    if accel_prefix and not os.path.isabs(document.path):
+        response = Response(mimetype='application/pdf')
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(document.path.replace(os.sep, '/'))
+        response.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(download_name)}"
+        response.set_etag(document.checksum)
+        response.last_modified = document.mtime
+        return response
+
+    return send_file(path, mimetype='application/pdf', as_attachment=True, download_name=download_name,
+                     conditional=True, etag=document.checksum, last_modified=document.mtime,
+                     max_age=config.get('DOCUMENT_MAX_AGE', 0))
+
+def apply_retention(keep_months, today=None):
+    """
+    Delete documents for months older than the retention window and compact the index
+
+    Bills whose PDF is removed have ``pdf_path`` cleared and can be rendered
+    again on demand. Index rows whose file has disappeared are dropped, as
+    are bill store entries pointing at removed files, and empty monthly bill
+    folders are removed.
+
+    Args:
+        keep_months: int, number of months kept including the current one
+        today: date, defaults to today
+
+    Returns:
+        dict: expired, missing, bytes_freed and folders_removed
+    """
+    today = today or date.today()
+    cutoff = today.year * 12 + today.month - 1 - (keep_months - 1)
+    period = Document.period_year * 12 + Document.period_month - 1
+
+    expired = Document.query.filter(period < cutoff).all()
+    bytes_freed = 0
+    for document in expired:
+        if _delete_file(document_path(document)):
+            bytes_freed += document.size
+    expired_bills = [document.bill_id for document in expired if document.bill_id is not None]
+    expired_paths = [document_path(document) for document in expired if document.kind == 'bill']
+
+    expired_ids = {document.id for document in expired}
+    missing = [document for document in Document.query.all()
+               if document.id not in expired_ids and not os.path.exists(document_path(document))]
+    missing_bills = [document.bill_id for document in missing if document.bill_id is not None]
+
+    try:
+        for offset in range(0, len(expired_bills) + len(missing_bills), 500):
+            Bill.query.filter(Bill.id.in_((expired_bills + missing_bills)[offset:offset + 500]))\
+                .update({'pdf_path': None}, synchronize_session=False)
+        # Other bills sharing an expired file
+        for offset in range(0, len(expired_paths), 500):
+            Bill.query.filter(Bill.pdf_path.in_(expired_paths[offset:offset + 500]))\
+                .update({'pdf_path': None}, synchronize_session=False)
+        for document in expired + missing:
+            db.session.delete(document)
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Error applying document retention: {str(e)}")
+        db.session.rollback()
+        raise
+
+    bill_store.prune_index()
+    folders_removed = 0
+    if os.path.isdir(Config.BILLS_PATH):
+        for entry in os.scandir(Config.BILLS_PATH):
+            if entry.is_dir() and not any(os.scandir(entry.path)):
+                os.rmdir(entry.path)
+                folders_removed += 1
+
+    logger.info(f"Document retention: {len(expired)} expired ({bytes_freed} bytes freed), "
+                f"{len(missing)} missing, {folders_removed} empty folders removed")
+    return {'expired': len(expired), 'missing': len(missing), 'bytes_freed': bytes_freed,
+            'folders_removed': folders_removed}
+
+def index_existing_documents(reports_folder=None):
+    """
+    Index bill and report PDFs generated before the document index existed
+
+    This is a one-off scan for migrating an existing install; normal lookups
+    only read the index.
+
+    Returns:
+        int: number of documents added
+    """
+    added = 0
+    for bill in Bill.query.filter(Bill.pdf_path.isnot(None)).all():
+        if os.path.exists(bill.pdf_path) and not Document.query.filter_by(path=_stored_path(bill.pdf_path)).first():
+            register_document(bill.pdf_path, 'bill', bill.billing_year, bill.billing_month, bill.id)
+            added += 1
+
+    reports_folder = reports_folder or os.path.join(Config.BASE_DIR, "reports")
+    if os.path.isdir(reports_folder):
+        for entry in os.scandir(reports_folder):
+            # monthly_report_<year>_<month>[_<version>].pdf
+            parts = entry.name[:-len('.pdf')].split('_') if entry.name.endswith('.pdf') else []
+            if len(parts) < 4 or parts[:2] != ['monthly', 'report'] or not (parts[2] + parts[3]).isdigit():
+                continue
+            if not Document.query.filter_by(path=_stored_path(entry.path)).first():
+                register_document(entry.path, 'report', int(parts[2]), int(parts[3]))
+                added += 1
+
+    db.session.commit()
+    logger.info(f"Indexed {added} existing documents")
+    return added
+
+def bill_storage_report():
+    """
+    Measure what storing identical bills once saves
+
+    Bills that point at the same file count once on disk; every further
+    bill is space saved, and render time saved where the file was reused
+    from an earlier render of the same inputs.
+
+    Returns:
+        dict: bills, files, bytes_on_disk, bytes_saved and seconds_saved
+    """
+    render_seconds = {entry['path']: entry.get('seconds', 0.0) for entry in bill_store.index_entries()}
+    bills = files = bytes_on_disk = bytes_saved = 0
+    seconds_saved = 0.0
+    for path, count in db.session.query(Bill.pdf_path, db.func.count(Bill.id))\
+            .filter(Bill.pdf_path.isnot(None)).group_by(Bill.pdf_path):
+        if not os.path.exists(path):
+            continue
+        size = os.path.getsize(path)
+        bills += count
+        files += 1
+        bytes_on_disk += size
+        bytes_saved += (count - 1) * size
+        seconds_saved += (count - 1) * render_seconds.get(path, 0.0)
+    return {'bills': bills, 'files': files, 'bytes_on_disk': bytes_on_disk, 'bytes_saved': bytes_saved,
+            'seconds_saved': seconds_saved}
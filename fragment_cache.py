@@ -0,0 +1,144 @@
+import importlib
+import threading
+import time
+from collections import OrderedDict
+import logging
+from metrics import CACHE_LOOKUPS, CACHE_SAVED_TIME
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class MemoryBackend:
+    """
+    In-process LRU store with a per-entry expiry
+
+    Any object with the same ``get``, ``set`` and ``clear`` methods can be
+    used as a backend instead, e.g. one backed by a shared cache server.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Get a live value, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if time.monotonic() >= expires:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        """Store a value for ``ttl`` seconds, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+def load_backend(spec, max_entries=256):
+    """
+    Create a cache backend from a 'module:Class' spec
+
+    Args:
+        spec: str, import path of the backend class, empty for ``MemoryBackend``
+        max_entries: int, size bound passed to ``MemoryBackend``
+
+    Returns:
+        object: backend instance
+    """
+    if not spec:
+        return MemoryBackend(max_entries)
+    module_name, _, class_name = spec.partition(':')
+    backend = getattr(importlib.import_module(module_name), class_name)()
+    logger.info(f"Using cache backend {spec}")
+    return backend
+
+class FragmentCache:
+    """
+    Named cache for computed values and rendered fragments
+
+    Keys are tuples whose first item names the fragment. Misses time the
+    build, and later hits on the same fragment count that time as saved.
+    Hit ratio and saved time are exposed through ``stats`` and the
+    ``cache_lookups_total`` and ``cache_saved_seconds_total`` metrics.
+    """
+
+    def __init__(self, name, ttl=60, backend=None):
+        self.name = name
+        self.ttl = ttl
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._build_seconds = {}
+        self._lock = threading.Lock()
+
+    def _key(self, key):
+        return f"{self.name}:" + ':'.join(str(part) for part in key)
+
+    def get_or_set(self, key, build):
+        """
+        Get a cached value, building and storing it on a miss
+
+        Args:
+            key: tuple, fragment name followed by whatever the value depends on
+            build: callable returning the value
+
+        Returns:
+            object: the cached or freshly built value
+        """
+        fragment = key[0]
+        value = self.backend.get(self._key(key))
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+                saved = self._build_seconds.get(fragment, 0.0)
+                self.saved_seconds += saved
+            CACHE_LOOKUPS.inc(cache=self.name, result='hit')
+            CACHE_SAVED_TIME.inc(saved, cache=self.name)
+            return value
+
+        started = time.perf_counter()
+        value = build()
+        elapsed = time.perf_counter() - started
+        self.backend.set(self._key(key), value, self.ttl)
+        with self._lock:
+            self.misses += 1
+            self._build_seconds[fragment] = elapsed
+        CACHE_LOOKUPS.inc(cache=self.name, result='miss')
+        logger.info(f"{self.name} cache miss: {fragment} built in {elapsed * 1000:.1f}ms "
+                    f"(hit ratio {self.hit_ratio:.2f}, saved {self.saved_seconds:.2f}s)")
+        return value
+
+    def invalidate(self):
+        """Drop every cached value"""
+        self.backend.clear()
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        """Get hit, miss and saved-time counters"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hit_ratio,
+            'saved_seconds': self.saved_seconds
+        }
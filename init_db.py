@@ -1,11 +1,11 @@
-from app import app, db
+from app import app, db, init_schema
 from models import Room
 
 def initialize_database():
     """Initialize the database with some sample data"""
     with app.app_context():
-        # Create all tables
-        db.create_all()
+        # Create or migrate the schema
+        init_schema()
         
         # Add sample rooms if none exist
         if Room.query.count() == 0:
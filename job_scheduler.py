@@ -0,0 +1,279 @@
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+import logging
+from sqlalchemy.exc import IntegrityError
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.triggers.cron import CronTrigger
+from db import db
+from models import SchedulerLease, JobRun
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Name of the lease row the scheduler processes compete for
+LEASE_NAME = 'scheduler'
+
+def _billing_job(run_date):
+    from billing import run_billing
+    return run_billing(datetime.combine(run_date, datetime.min.time()))['billed']
+
+def _retention_job(run_date):
+    from flask import current_app
+    from documents import apply_retention
+    return apply_retention(current_app.config['DOCUMENT_RETENTION_MONTHS'], today=run_date)['expired']
+
+# Scheduled jobs: name -> (function taking the run date and returning an item count, cron trigger fields)
+SCHEDULED_JOBS = {
+    'auto_generate_bills': (_billing_job, {'day': 27}),
+    'document_retention': (_retention_job, {'day': 1, 'hour': 3})
+}
+
+def process_id():
+    """Identify this process to the other scheduler candidates"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def run_key(run_date):
+    """Run key of a monthly job for a date, e.g. '2024-05'"""
+    return f"{run_date.year}-{run_date.month:02d}"
+
+def claim_run(job_name, key, owner, stale_after):
+    """
+    Claim one run of a job, recording it in the ``job_run`` table
+
+    The (job_name, run_key) pair is unique, so of several processes trying to
+    run the same period only the first insert wins. A run that failed, or
+    that has been 'running' for longer than ``stale_after`` (its process
+    died), can be claimed again; a successful run never is.
+
+    Args:
+        job_name: str, scheduled job name
+        key: str, run key of the period
+        owner: str, process claiming the run
+        stale_after: int, seconds after which a running claim is abandoned
+
+    Returns:
+        JobRun: the claimed run, or None if it is done or running elsewhere
+    """
+    now = datetime.utcnow()
+    try:
+        run = JobRun(job_name=job_name, run_key=key, owner=owner, status='running', started_date=now)
+        db.session.add(run)
+        db.session.commit()
+        return run
+    except IntegrityError:
+        db.session.rollback()
+
+    # Conditional update so two processes never retry the same run
+    retried = JobRun.query.filter(
+        JobRun.job_name == job_name, JobRun.run_key == key,
+        db.or_(JobRun.status == 'failed',
+               db.and_(JobRun.status == 'running', JobRun.started_date < now - timedelta(seconds=stale_after)))
+    ).update({
+        'status': 'running',
+        'owner': owner,
+        'attempts': JobRun.attempts + 1,
+        'started_date': now,
+        'finished_date': None,
+        'error': None
+    }, synchronize_session=False)
+    db.session.commit()
+    if not retried:
+        return None
+    return JobRun.query.filter_by(job_name=job_name, run_key=key).first()
+
+def execute_job(job_name, run_date=None, owner=None, stale_after=7200):
+    """
+    Run a scheduled job once for its period and record the outcome
+
+    Running a period that already succeeded is a no-op, so a job fired twice
+    (by two workers, a restart or a manual re-run) does its work once.
+    Call inside an app context.
+
+    Args:
+        job_name: str, key of ``SCHEDULED_JOBS``
+        run_date: date the run is for, defaults to today
+        owner: str, process running the job, defaults to this one
+        stale_after: int, seconds after which a running claim is abandoned
+
+    Returns:
+        JobRun: the recorded run, or None if it was skipped
+    """
+    job, _ = SCHEDULED_JOBS[job_name]
+    run_date = run_date or datetime.now().date()
+    key = run_key(run_date)
+    run = claim_run(job_name, key, owner or process_id(), stale_after)
+    if run is None:
+        logger.info(f"Skipping {job_name} for {key}: already done or running elsewhere")
+        return None
+
+    started = time.perf_counter()
+    try:
+        run.items = job(run_date) or 0
+        run.status = 'success'
+    except Exception as e:
+        logger.error(f"Error running scheduled job {job_name} for {key}: {str(e)}")
+        db.session.rollback()
+        run.status = 'failed'
+        run.error = str(e)
+    run.duration = time.perf_counter() - started
+    run.finished_date = datetime.utcnow()
+    db.session.commit()
+    logger.info(f"Scheduled job {job_name} for {key} {run.status}: {run.items} items in {run.duration:.2f}s")
+    return run
+
+# App the persisted jobs run against; APScheduler stores jobs by function reference, not closure
+_app = None
+
+def run_scheduled_job(job_name):
+    """Entry point stored in the job store for each scheduled job"""
+    with _app.app_context():
+        execute_job(job_name, stale_after=_app.config['JOB_RUN_STALE_SECONDS'])
+
+def acquire_lease(owner, ttl, name=LEASE_NAME):
+    """
+    Take or renew the scheduler lease
+
+    The lease is held by one process at a time and expires ``ttl`` seconds
+    after its last renewal, at which point any other candidate can take it.
+
+    Args:
+        owner: str, process asking for the lease
+        ttl: int, seconds the lease lasts without renewal
+        name: str, lease name
+
+    Returns:
+        bool: whether this process holds the lease
+    """
+    now = datetime.utcnow()
+    expires = now + timedelta(seconds=ttl)
+    leases = SchedulerLease.__table__
+    try:
+        with db.engine.begin() as connection:
+            taken = connection.execute(
+                leases.update()
+                .where(leases.c.name == name, db.or_(leases.c.owner == owner, leases.c.expires_date < now))
+                .values(owner=owner, expires_date=expires)
+            ).rowcount
+            if taken:
+                return True
+            exists = connection.execute(db.select(leases.c.name).where(leases.c.name == name)).first()
+            if exists is None:
+                connection.execute(leases.insert().values(name=name, owner=owner, acquired_date=now,
+                                                          expires_date=expires))
+                return True
+            return False
+    except IntegrityError:
+        # Another candidate created the lease first
+        return False
+
+def release_lease(owner, name=LEASE_NAME):
+    """Give up the scheduler lease if this process holds it"""
+    leases = SchedulerLease.__table__
+    with db.engine.begin() as connection:
+        connection.execute(leases.delete().where(leases.c.name == name, leases.c.owner == owner))
+
+class LeaderScheduler:
+    """
+    Cron scheduler that runs in exactly one process of a deployment
+
+    Every process started with background jobs is a candidate and renews or
+    tries to take the ``scheduler_lease`` row every third of the lease time.
+    Only the lease holder runs the APScheduler instance, whose jobs are kept
+    in the database, so a run missed while no leader was up still fires when
+    the next one starts (within the misfire grace time). Each run is claimed
+    in ``job_run`` as well, which covers the short overlap when leadership
+    moves between processes.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.owner = process_id()
+        self.lease_ttl = 60
+        self.misfire_grace_time = 6 * 3600
+        self._scheduler = None
+        self._stopping = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Bind the scheduler to a Flask app"""
+        global _app
+        _app = app
+        self.app = app
+        self.lease_ttl = app.config.get('SCHEDULER_LEASE_SECONDS', self.lease_ttl)
+        self.misfire_grace_time = app.config.get('SCHEDULER_MISFIRE_GRACE_SECONDS', self.misfire_grace_time)
+
+    @property
+    def running(self):
+        """Whether this process is currently the leader running the jobs"""
+        return self._scheduler is not None
+
+    def start(self):
+        """Start competing for the lease in a background thread"""
+        if self._thread is not None:
+            return
+        self.owner = process_id()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='scheduler-lease', daemon=True)
+        self._thread.start()
+        logger.info(f"Scheduler candidate {self.owner} started")
+
+    def shutdown(self):
+        """Stop the jobs and hand the lease to the next candidate"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get_jobs(self):
+        """Get the scheduled jobs, if this process is the leader"""
+        return self._scheduler.get_jobs() if self._scheduler is not None else []
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                try:
+                    leader = acquire_lease(self.owner, self.lease_ttl)
+                except Exception as e:
+                    logger.error(f"Error renewing scheduler lease: {str(e)}")
+                    leader = False
+                if leader and self._scheduler is None:
+                    self._become_leader()
+                elif not leader and self._scheduler is not None:
+                    logger.warning(f"Scheduler lease lost by {self.owner}")
+                    self._stop_scheduler()
+                if self._stopping.wait(self.lease_ttl / 3):
+                    break
+            self._stop_scheduler()
+            try:
+                release_lease(self.owner)
+            except Exception as e:
+                logger.error(f"Error releasing scheduler lease: {str(e)}")
+
+    def _become_leader(self):
+        scheduler = BackgroundScheduler(
+            jobstores={'default': SQLAlchemyJobStore(engine=db.engine)},
+            job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': self.misfire_grace_time}
+        )
+        scheduler.start(paused=True)
+        for name, (_, trigger) in SCHEDULED_JOBS.items():
+            job = scheduler.get_job(name)
+            # Keep a persisted job's next run time so a run missed while no leader was up still fires
+            if job is None:
+                scheduler.add_job(run_scheduled_job, 'cron', args=[name], id=name, name=name, **trigger)
+            elif str(job.trigger) != str(CronTrigger(**trigger)):
+                job.reschedule('cron', **trigger)
+        scheduler.resume()
+        self._scheduler = scheduler
+        logger.info(f"Scheduler lease taken by {self.owner}; running {len(SCHEDULED_JOBS)} jobs")
+
+    def _stop_scheduler(self):
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
@@ -0,0 +1,206 @@
+from collections import defaultdict
+from datetime import date, timedelta
+import logging
+from sqlalchemy import event
+from db import db
+from models import Guest, Room, Payment, Expense, DailyLedger
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def _ledger_entry(obj, room_types):
+    """Get the ledger key and amount for a Payment or Expense instance"""
+    if isinstance(obj, Payment):
+        return (obj.date.date(), 'income', room_types.get(int(obj.guest_id), '')), obj.amount
+    if isinstance(obj, Expense):
+        return (obj.date.date(), 'expense', obj.category), obj.amount
+    return None, None
+
+def _room_types(connection, objects):
+    # Income is filed under the paying guest's room type
+    guest_ids = {int(obj.guest_id) for obj in objects if isinstance(obj, Payment)}
+    if not guest_ids:
+        return {}
+    return dict(connection.execute(
+        db.select(Guest.id, Room.room_type).join(Room, Guest.room_id == Room.id).where(Guest.id.in_(guest_ids))
+    ).all())
+
+def _stored_entries(connection, objects):
+    # Ledger entries as the database holds them, before the flush rewrites the rows.
+    # Read from the table because expired attributes keep no history of their old value.
+    ids = defaultdict(list)
+    for obj in objects:
+        ids[type(obj)].append(db.inspect(obj).identity[0])
+    entries = []
+    if ids[Payment]:
+        entries += [((day.date(), 'income', room_type or ''), amount) for day, room_type, amount in connection.execute(
+            db.select(Payment.date, Room.room_type, Payment.amount)
+            .join(Guest, Payment.guest_id == Guest.id)
+            .outerjoin(Room, Guest.room_id == Room.id)
+            .where(Payment.id.in_(ids[Payment]))
+        )]
+    if ids[Expense]:
+        entries += [((day.date(), 'expense', category), amount) for day, category, amount in connection.execute(
+            db.select(Expense.date, Expense.category, Expense.amount).where(Expense.id.in_(ids[Expense]))
+        )]
+    return entries
+
+def _updated(session):
+    return [obj for obj in session.dirty if isinstance(obj, (Payment, Expense)) and session.is_modified(obj)]
+
+def _apply_deltas(connection, deltas):
+    table = DailyLedger.__table__
+    for (day, kind, category), (amount, count) in deltas.items():
+        key = (table.c.day == day) & (table.c.kind == kind) & (table.c.category == category)
+        updated = connection.execute(
+            table.update().where(key).values(
+                total=table.c.total + amount,
+                count=table.c.count + count
+            )
+        )
+        if updated.rowcount == 0:
+            connection.execute(table.insert().values(
+                day=day, kind=kind, category=category, total=amount, count=count
+            ))
+
+def _before_flush(session, flush_context, instances):
+    changed = _updated(session) + [obj for obj in session.deleted if isinstance(obj, (Payment, Expense))]
+    if changed:
+        with session.no_autoflush:
+            flush_context.attributes['ledger_previous'] = _stored_entries(session.connection(), changed)
+
+def _after_flush(session, flush_context):
+    deltas = defaultdict(lambda: [0.0, 0])
+    # Updated rows move from their old entry to their new one, deleted rows only leave theirs
+    for key, amount in flush_context.attributes.pop('ledger_previous', []):
+        deltas[key][0] -= amount
+        deltas[key][1] -= 1
+    current = list(session.new) + _updated(session)
+    room_types = _room_types(session.connection(), current)
+    for obj in current:
+        key, amount = _ledger_entry(obj, room_types)
+        if key:
+            deltas[key][0] += amount
+            deltas[key][1] += 1
+    deltas = {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+    if deltas:
+        _apply_deltas(session.connection(), deltas)
+
+def register_ledger_events(session=None):
+    """
+    Keep the daily ledger in step with Payment and Expense inserts, updates and deletes
+
+    The ledger rows are updated inside the same transaction as the flush that
+    writes the payment or expense. Bulk insert paths bypass session events, so
+    run ``rebuild_ledger`` after using them.
+
+    Args:
+        session: scoped session to listen on, defaults to ``db.session``
+    """
+    session = session or db.session
+    for name, listener in (('before_flush', _before_flush), ('after_flush', _after_flush)):
+        if not event.contains(session, name, listener):
+            event.listen(session, name, listener)
+
+def _as_date(value):
+    # SQLite's date() returns an ISO string rather than a date object
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+def rebuild_ledger():
+    """
+    Rebuild the daily ledger from the full Payment and Expense history
+
+    Returns:
+        int: number of ledger rows written
+    """
+    income_day = db.func.date(Payment.date)
+    expense_day = db.func.date(Expense.date)
+    income = db.session.query(
+        income_day, Room.room_type, db.func.sum(Payment.amount), db.func.count(Payment.id)
+    ).join(Guest, Payment.guest_id == Guest.id)\
+        .join(Room, Guest.room_id == Room.id)\
+        .group_by(income_day, Room.room_type).all()
+    expenses = db.session.query(
+        expense_day, Expense.category, db.func.sum(Expense.amount), db.func.count(Expense.id)
+    ).group_by(expense_day, Expense.category).all()
+
+    rows = [{'day': _as_date(day), 'kind': 'income', 'category': room_type, 'total': total, 'count': count}
+            for day, room_type, total, count in income]
+    rows += [{'day': _as_date(day), 'kind': 'expense', 'category': category, 'total': total, 'count': count}
+             for day, category, total, count in expenses]
+
+    try:
+        DailyLedger.query.delete()
+        db.session.bulk_insert_mappings(DailyLedger, rows)
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Error rebuilding daily ledger: {str(e)}")
+        db.session.rollback()
+        raise
+
+    logger.info(f"Daily ledger rebuilt with {len(rows)} rows")
+    return len(rows)
+
+def period_totals(start, end):
+    """
+    Get income and expense totals for a half-open date range
+
+    Args:
+        start: date, first day included
+        end: date, first day excluded
+
+    Returns:
+        tuple: (total_income, total_expenses)
+    """
+    rows = db.session.query(DailyLedger.kind, db.func.sum(DailyLedger.total))\
+        .filter(DailyLedger.day >= start, DailyLedger.day < end)\
+        .group_by(DailyLedger.kind).all()
+    totals = dict(rows)
+    return totals.get('income', 0) or 0, totals.get('expense', 0) or 0
+
+def daily_series(start, end):
+    """
+    Get zero-filled daily income and expense series for a half-open date range
+
+    Args:
+        start: date, first day included
+        end: date, first day excluded
+
+    Returns:
+        tuple: (dates as 'YYYY-MM-DD' strings, daily income list, daily expense list)
+    """
+    rows = db.session.query(DailyLedger.day, DailyLedger.kind, db.func.sum(DailyLedger.total))\
+        .filter(DailyLedger.day >= start, DailyLedger.day < end)\
+        .group_by(DailyLedger.day, DailyLedger.kind).all()
+    by_day = {(day, kind): total for day, kind, total in rows}
+
+    dates, income, expenses = [], [], []
+    day = start
+    while day < end:
+        dates.append(day.strftime('%Y-%m-%d'))
+        income.append(by_day.get((day, 'income'), 0))
+        expenses.append(by_day.get((day, 'expense'), 0))
+        day += timedelta(days=1)
+    return dates, income, expenses
+
+def category_totals(start, end):
+    """
+    Get expense totals per category for a half-open date range
+
+    Returns:
+        list: dicts with name, amount and percentage of the period's expenses
+    """
+    rows = db.session.query(DailyLedger.category, db.func.sum(DailyLedger.total))\
+        .filter(DailyLedger.kind == 'expense', DailyLedger.day >= start, DailyLedger.day < end)\
+        .group_by(DailyLedger.category)\
+        .order_by(db.func.sum(DailyLedger.total).desc())\
+        .all()
+    total = sum(amount for _, amount in rows)
+    return [{
+        'name': category,
+        'amount': amount,
+        'percentage': (amount / total * 100) if total else 0
+    } for category, amount in rows]
@@ -0,0 +1,229 @@
+import time
+import threading
+from functools import wraps
+import logging
+from flask import g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+from db import db
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+class Histogram:
+    """Cumulative histogram with one series per label set"""
+
+    def __init__(self, name, help_text, buckets, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, key)]
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(f"{self.name}_bucket{_labels(labels, bound)} {count}")
+                lines.append(f"{self.name}_bucket{_labels(labels, '+Inf')} {series['count']}")
+                lines.append(f"{self.name}_sum{_labels(labels)} {series['sum']}")
+                lines.append(f"{self.name}_count{_labels(labels)} {series['count']}")
+        return lines
+
+class Counter:
+    """Monotonic counter with one series per label set"""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._series.items()):
+                labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, key)]
+                lines.append(f"{self.name}{_labels(labels)} {value}")
+        return lines
+
+class Gauge:
+    """Value that can go up and down, with one series per label set"""
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            self._series[key] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._series.items()):
+                labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, key)]
+                lines.append(f"{self.name}{_labels(labels)} {value}")
+        return lines
+
+def _labels(labels, le=None):
+    if le is not None:
+        labels = labels + [f'le="{le}"']
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Request latency by route',
+                            LATENCY_BUCKETS, ('route', 'method', 'status'))
+REQUEST_SQL_QUERIES = Histogram('http_request_sql_queries', 'SQL statements per request',
+                                COUNT_BUCKETS, ('route',))
+REQUEST_SQL_TIME = Histogram('http_request_sql_duration_seconds', 'Time spent in SQL per request',
+                             LATENCY_BUCKETS, ('route',))
+REQUEST_RENDER_TIME = Histogram('http_request_template_duration_seconds',
+                                'Time spent in render_template per request', LATENCY_BUCKETS, ('route',))
+REQUEST_PDF_TIME = Histogram('http_request_pdf_duration_seconds', 'Time spent generating PDFs per request',
+                             LATENCY_BUCKETS, ('route',))
+PDF_RENDER_TIME = Histogram('pdf_render_duration_seconds', 'PDF generation time by document kind',
+                            LATENCY_BUCKETS, ('kind',))
+
+RENDER_FARM_JOB_WAIT = Histogram('render_farm_job_wait_seconds', 'Time render farm jobs wait for a worker',
+                                 LATENCY_BUCKETS, ('kind',))
+RENDER_FARM_JOB_RENDER = Histogram('render_farm_job_render_seconds', 'Time render farm jobs spend rendering',
+                                   LATENCY_BUCKETS, ('kind',))
+RENDER_FARM_JOB_LATENCY = Histogram('render_farm_job_latency_seconds',
+                                    'Render farm job latency from submission to result', LATENCY_BUCKETS, ('kind',))
+
+HISTOGRAMS = [REQUEST_LATENCY, REQUEST_SQL_QUERIES, REQUEST_SQL_TIME, REQUEST_RENDER_TIME,
+              REQUEST_PDF_TIME, PDF_RENDER_TIME, RENDER_FARM_JOB_WAIT, RENDER_FARM_JOB_RENDER, RENDER_FARM_JOB_LATENCY]
+
+CACHE_LOOKUPS = Counter('cache_lookups_total', 'Cache lookups by cache and result', ('cache', 'result'))
+CACHE_SAVED_TIME = Counter('cache_saved_seconds_total', 'Build time avoided by cache hits', ('cache',))
+
+BILL_RENDERS = Counter('bill_pdf_renders_total', 'Bill PDFs by result: rendered, deduplicated or reused', ('result',))
+BILL_RENDER_SAVED_BYTES = Counter('bill_pdf_saved_bytes_total', 'Disk space not used thanks to identical bill PDFs', ())
+BILL_RENDER_SAVED_TIME = Counter('bill_pdf_saved_seconds_total', 'Render time skipped for previously rendered bills', ())
+
+COUNTERS = [CACHE_LOOKUPS, CACHE_SAVED_TIME, BILL_RENDERS, BILL_RENDER_SAVED_BYTES, BILL_RENDER_SAVED_TIME]
+
+RENDER_FARM_QUEUE_DEPTH = Gauge('render_farm_queue_depth', 'Render farm jobs submitted and not yet finished')
+RENDER_FARM_WORKERS = Gauge('render_farm_workers', 'Render processes in the render farm')
+
+GAUGES = [RENDER_FARM_QUEUE_DEPTH, RENDER_FARM_WORKERS]
+
+def _in_request():
+    return has_request_context() and 'metrics_started' in g
+
+def timed_pdf(kind):
+    """
+    Decorator recording the time spent in a PDF generator
+
+    Observations land in the process that ran the generator, so renders done
+    in worker processes only show up in those processes.
+
+    Args:
+        kind: str, document kind label, e.g. 'bill' or 'report'
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                PDF_RENDER_TIME.observe(elapsed, kind=kind)
+                if _in_request():
+                    g.metrics_pdf_time += elapsed
+        return wrapper
+    return decorator
+
+def render_metrics():
+    """Render all histograms, counters and gauges in the Prometheus text exposition format"""
+    lines = []
+    for metric in HISTOGRAMS + COUNTERS + GAUGES:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+class RequestMetrics:
+    """Per-request latency, SQL, template and PDF timing for a Flask app"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_cursor_execute)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_sql_count = 0
+        g.metrics_sql_time = 0.0
+        g.metrics_render_time = 0.0
+        g.metrics_pdf_time = 0.0
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if _in_request():
+            conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('metrics_query_start')
+        if _in_request() and starts:
+            g.metrics_sql_time += time.perf_counter() - starts.pop()
+            g.metrics_sql_count += 1
+
+    def _before_render(self, sender, template, context, **extra):
+        if _in_request():
+            g.metrics_render_started = time.perf_counter()
+
+    def _after_render(self, sender, template, context, **extra):
+        started = g.pop('metrics_render_started', None) if _in_request() else None
+        if started is not None:
+            g.metrics_render_time += time.perf_counter() - started
+
+    def _finish_request(self, response):
+        if not _in_request():
+            return response
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_LATENCY.observe(time.perf_counter() - g.metrics_started,
+                                route=route, method=request.method, status=response.status_code)
+        REQUEST_SQL_QUERIES.observe(g.metrics_sql_count, route=route)
+        REQUEST_SQL_TIME.observe(g.metrics_sql_time, route=route)
+        REQUEST_RENDER_TIME.observe(g.metrics_render_time, route=route)
+        REQUEST_PDF_TIME.observe(g.metrics_pdf_time, route=route)
+        return response
@@ -1,6 +1,21 @@
+import os
 from datetime import datetime
 from db import db
 
+# Monthly price for each room type
+ROOM_PRICES = {
+    '1 seater': 12000,
+    '3 seater': 10000,
+    '4 seater': 9000
+}
+
+# Beds in each room type
+ROOM_CAPACITIES = {
+    '1 seater': 1,
+    '3 seater': 3,
+    '4 seater': 4
+}
+
 class Guest(db.Model):
     """Guest Model for storing guest related details"""
     id = db.Column(db.Integer, primary_key=True)
@@ -28,11 +43,17 @@ class Guest(db.Model):
 
 class Room(db.Model):
     """Room Model for storing room related details"""
+    __table_args__ = (
+        db.Index('ix_room_availability', 'occupancy', 'room_type', 'room_number'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     room_number = db.Column(db.String(10), unique=True, nullable=False)
     room_type = db.Column(db.String(20), nullable=False)  # '1 seater', '3 seater', '4 seater'
     price_per_month = db.Column(db.Float, nullable=False)
-    occupancy = db.Column(db.Boolean, default=False)
+    capacity = db.Column(db.Integer, nullable=False, default=1, server_default='0')  # 0 until backfilled
+    beds_occupied = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    occupancy = db.Column(db.Boolean, default=False)  # True when every bed is taken
     
     # Relationships
     bills = db.relationship('Bill', backref='room', lazy=True)
@@ -41,21 +62,26 @@ class Room(db.Model):
         self.room_number = room_number
         self.room_type = room_type
         self.occupancy = occupancy
-        # Set price based on room type
-        if room_type == '1 seater':
-            self.price_per_month = 12000
-        elif room_type == '3 seater':
-            self.price_per_month = 10000
-        elif room_type == '4 seater':
-            self.price_per_month = 9000
-        else:
+        # Set price and beds based on room type
+        if room_type not in ROOM_PRICES:
             raise ValueError('Invalid room type')
+        self.price_per_month = ROOM_PRICES[room_type]
+        self.capacity = ROOM_CAPACITIES[room_type]
+        self.beds_occupied = self.capacity if occupancy else 0
+    
+    @property
+    def free_beds(self):
+        return self.capacity - self.beds_occupied
     
     def __repr__(self):
         return f'<Room {self.room_number}>'
 
 class Bill(db.Model):
     """Bill Model for storing billing information"""
+    __table_args__ = (
+        db.Index('ix_bill_guest_period', 'guest_id', 'billing_year', 'billing_month'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     guest_id = db.Column(db.Integer, db.ForeignKey('guest.id'), nullable=False)
     room_id = db.Column(db.Integer, db.ForeignKey('room.id'), nullable=False)
@@ -64,8 +90,10 @@ class Bill(db.Model):
     total_days = db.Column(db.Integer, nullable=False)
     discount = db.Column(db.Float, default=0.0)
     total_amount = db.Column(db.Float, nullable=False)
+    amount_paise = db.Column(db.BigInteger, nullable=True)  # exact total_amount in paise
     generated_date = db.Column(db.DateTime, default=datetime.utcnow)
     pdf_path = db.Column(db.String(255), nullable=True)
+    idempotency_key = db.Column(db.String(64), nullable=True, unique=True, index=True)  # set by billing runs
     
     # Relationships
     payments = db.relationship('Payment', backref='bill', lazy=True)
@@ -75,11 +103,15 @@ class Bill(db.Model):
 
 class Payment(db.Model):
     """Payment Model for storing payment history"""
+    __table_args__ = (
+        db.Index('ix_payment_guest_date', 'guest_id', 'date'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     guest_id = db.Column(db.Integer, db.ForeignKey('guest.id'), nullable=False)
     bill_id = db.Column(db.Integer, db.ForeignKey('bill.id'), nullable=True)
     amount = db.Column(db.Float, nullable=False)
-    date = db.Column(db.DateTime, default=datetime.utcnow)
+    date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     payment_status = db.Column(db.String(20), nullable=False)  # 'informed & pending', 'paid', 'advance'
     
     def __repr__(self):
@@ -87,11 +119,141 @@ class Payment(db.Model):
 
 class Expense(db.Model):
     """Expense Model for storing expense related details"""
+    __table_args__ = (
+        db.Index('ix_expense_category_date', 'category', 'date'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     category = db.Column(db.String(50), nullable=False)  # food, vegetables, snacks, milk, electricity, salary, water, meat, essentials
     description = db.Column(db.Text, nullable=True)  # Additional remarks
     amount = db.Column(db.Float, nullable=False)
-    date = db.Column(db.DateTime, default=datetime.utcnow)
+    date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<Expense {self.category} - {self.amount}>'
+
+class RenderJob(db.Model):
+    """Render Job Model for queued bill PDF rendering"""
+    id = db.Column(db.Integer, primary_key=True)
+    bill_id = db.Column(db.Integer, db.ForeignKey('bill.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'running', 'done', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_date = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    bill = db.relationship('Bill', backref=db.backref('render_jobs', lazy=True), lazy=True)
+    
+    def __repr__(self):
+        return f'<RenderJob {self.id} for Bill {self.bill_id} - {self.status}>'
+
+class DailyLedger(db.Model):
+    """Daily Ledger Model for pre-aggregated daily income and expense totals"""
+    __table_args__ = (db.UniqueConstraint('day', 'kind', 'category', name='uq_daily_ledger_day_kind_category'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    kind = db.Column(db.String(10), nullable=False)  # 'income' or 'expense'
+    category = db.Column(db.String(50), nullable=False, default='')  # expense category, or room type for income
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DailyLedger {self.day} {self.kind} {self.category} - {self.total}>'
+
+class BillingAccount(db.Model):
+    """Billing Account Model holding a guest's billing cursor and running balance"""
+    guest_id = db.Column(db.Integer, db.ForeignKey('guest.id'), primary_key=True)
+    accrued_through = db.Column(db.Date, nullable=True)  # first day not yet charged, None until first accrual
+    charged_paise = db.Column(db.BigInteger, nullable=False, default=0)
+    paid_paise = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_date = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @property
+    def balance_paise(self):
+        return self.charged_paise - self.paid_paise
+    
+    def __repr__(self):
+        return f'<BillingAccount {self.guest_id} - {self.balance_paise}>'
+
+class Accrual(db.Model):
+    """Accrual Model recording the room charge for a span of days"""
+    __table_args__ = (
+        db.Index('ix_accrual_guest_bill', 'guest_id', 'bill_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    guest_id = db.Column(db.Integer, db.ForeignKey('guest.id'), nullable=False)
+    room_id = db.Column(db.Integer, db.ForeignKey('room.id'), nullable=False)
+    bill_id = db.Column(db.Integer, db.ForeignKey('bill.id'), nullable=True)  # None until billed
+    period_start = db.Column(db.Date, nullable=False)  # first day charged
+    period_end = db.Column(db.Date, nullable=False)  # first day not charged
+    days = db.Column(db.Integer, nullable=False)
+    amount_paise = db.Column(db.BigInteger, nullable=False)
+    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Accrual {self.guest_id} {self.period_start}..{self.period_end} - {self.amount_paise}>'
+
+class TableVersion(db.Model):
+    """Table Version Model counting committed writes to a table"""
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_date = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<TableVersion {self.table_name} v{self.version}>'
+
+class Document(db.Model):
+    """Document Model indexing a generated PDF on disk"""
+    __table_args__ = (
+        db.Index('ix_document_kind_period', 'kind', 'period_year', 'period_month'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'bill' or 'report'
+    path = db.Column(db.String(500), unique=True, nullable=False)  # relative to the app directory when inside it
+    bill_id = db.Column(db.Integer, db.ForeignKey('bill.id'), nullable=True, index=True)
+    period_year = db.Column(db.Integer, nullable=False)
+    period_month = db.Column(db.Integer, nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    checksum = db.Column(db.String(64), nullable=False)  # SHA-256 of the file contents
+    mtime = db.Column(db.Float, nullable=False)  # file modification time, seconds since the epoch
+    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @property
+    def filename(self):
+        return os.path.basename(self.path)
+    
+    def __repr__(self):
+        return f'<Document {self.id} {self.kind} {self.path}>'
+
+class SchedulerLease(db.Model):
+    """Scheduler Lease Model naming the process allowed to run scheduled jobs"""
+    name = db.Column(db.String(50), primary_key=True)
+    owner = db.Column(db.String(100), nullable=False)  # host:pid of the leader
+    acquired_date = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_date = db.Column(db.DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f'<SchedulerLease {self.name} held by {self.owner}>'
+
+class JobRun(db.Model):
+    """Job Run Model recording each run of a scheduled job"""
+    __table_args__ = (db.UniqueConstraint('job_name', 'run_key', name='uq_job_run_job_key'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_name = db.Column(db.String(50), nullable=False)
+    run_key = db.Column(db.String(50), nullable=False)  # period the run covers, e.g. '2024-05'
+    owner = db.Column(db.String(100), nullable=False)  # host:pid that ran it
+    status = db.Column(db.String(20), nullable=False, default='running')  # 'running', 'success', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=1)
+    items = db.Column(db.Integer, nullable=False, default=0)  # bills generated, documents removed, ...
+    error = db.Column(db.Text, nullable=True)
+    started_date = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_date = db.Column(db.DateTime, nullable=True)
+    duration = db.Column(db.Float, nullable=True)  # seconds
     
     def __repr__(self):
-        return f'<Expense {self.category} - {self.amount}>'
\ No newline at end of file
+        return f'<JobRun {self.job_name} {self.run_key} - {self.status}>'
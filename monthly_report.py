@@ -0,0 +1,114 @@
+import hashlib
+import logging
+from db import db
+from models import Guest, Payment, Expense
+from utils import month_datetime_range
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rows fetched from the database cursor per round trip
+STREAM_CHUNK_SIZE = 1000
+
+def _payment_filter(year, month):
+    start, end = month_datetime_range(year, month)
+    return (Payment.date >= start, Payment.date < end)
+
+def _expense_filter(year, month):
+    start, end = month_datetime_range(year, month)
+    return (Expense.date >= start, Expense.date < end)
+
+def _income_query(year, month):
+    return db.session.query(Payment.date, Guest.full_name, Payment.amount, Payment.payment_status)\
+        .join(Guest, Payment.guest_id == Guest.id)\
+        .filter(*_payment_filter(year, month))\
+        .order_by(Payment.date, Payment.id)
+
+def _expense_query(year, month):
+    return db.session.query(Expense.date, Expense.category, Expense.description, Expense.amount)\
+        .filter(*_expense_filter(year, month))\
+        .order_by(Expense.date, Expense.id)
+
+def _income_record(row):
+    return {'date': row[0], 'guest_name': row[1], 'amount': row[2], 'status': row[3]}
+
+def _expense_record(row):
+    return {'date': row[0], 'category': row[1], 'description': row[2], 'amount': row[3]}
+
+def iter_income_rows(year, month, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Stream a month's payments with the guest name joined in
+
+    Args:
+        year: int, year of report
+        month: int, month of report
+        chunk_size: int, rows fetched from the cursor at a time
+
+    Yields:
+        dict: income record with date, guest_name, amount and status
+    """
+    for row in _income_query(year, month).execution_options(yield_per=chunk_size):
+        yield _income_record(row)
+
+def iter_expense_rows(year, month, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Stream a month's expenses
+
+    Args:
+        year: int, year of report
+        month: int, month of report
+        chunk_size: int, rows fetched from the cursor at a time
+
+    Yields:
+        dict: expense record with date, category, description and amount
+    """
+    for row in _expense_query(year, month).execution_options(yield_per=chunk_size):
+        yield _expense_record(row)
+
+def income_page(year, month, page, per_page):
+    """Get one page of a month's income records"""
+    rows = _income_query(year, month).offset((page - 1) * per_page).limit(per_page).all()
+    return [_income_record(row) for row in rows]
+
+def expense_page(year, month, page, per_page):
+    """Get one page of a month's expense records"""
+    rows = _expense_query(year, month).offset((page - 1) * per_page).limit(per_page).all()
+    return [_expense_record(row) for row in rows]
+
+def report_totals(year, month):
+    """
+    Compute a month's totals and data version in SQL
+
+    The version is a digest of the row count, max id and amount sum of the
+    month's payments and expenses, so any insert, delete or amount change in
+    the month produces a new version.
+
+    Args:
+        year: int, year of report
+        month: int, month of report
+
+    Returns:
+        dict: total_income, total_expenses, net_balance, income_count,
+            expense_count and version
+    """
+    income_count, income_max_id, total_income = db.session.query(
+        db.func.count(Payment.id), db.func.max(Payment.id),
+        db.func.coalesce(db.func.sum(Payment.amount), 0)
+    ).filter(*_payment_filter(year, month)).one()
+
+    expense_count, expense_max_id, total_expenses = db.session.query(
+        db.func.count(Expense.id), db.func.max(Expense.id),
+        db.func.coalesce(db.func.sum(Expense.amount), 0)
+    ).filter(*_expense_filter(year, month)).one()
+
+    fingerprint = f"{income_count}:{income_max_id}:{total_income!r}:{expense_count}:{expense_max_id}:{total_expenses!r}"
+
+    return {
+        'total_income': total_income,
+        'total_expenses': total_expenses,
+        'net_balance': total_income - total_expenses,
+        'income_count': income_count,
+        'expense_count': expense_count,
+        'version': hashlib.sha1(fingerprint.encode()).hexdigest()[:16]
+    }
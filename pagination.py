@@ -0,0 +1,127 @@
+import base64
+from datetime import datetime, date, time, timedelta
+import logging
+from db import db
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Upper bound for the page size a client may request
+MAX_PAGE_SIZE = 200
+
+class KeysetPage:
+    """One page of a keyset-paginated listing"""
+
+    def __init__(self, items, next_cursor, per_page):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.per_page = per_page
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+def encode_cursor(key_value, row_id):
+    """Encode the (date, id) of the last row on a page as an opaque cursor"""
+    raw = f"{key_value.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, key_type=datetime):
+    """
+    Decode a cursor produced by ``encode_cursor``
+
+    Args:
+        cursor: str, opaque cursor from the previous page
+        key_type: datetime or date, type of the key column
+
+    Returns:
+        tuple: (key value, id) or None if the cursor is missing or malformed
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        key_value, row_id = raw.rsplit('|', 1)
+        return key_type.fromisoformat(key_value), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        logger.warning(f"Ignoring invalid pagination cursor: {str(e)}")
+        return None
+
+def keyset_paginate(query, key_column, id_column, cursor=None, per_page=50, key_type=datetime,
+                    key_of=None):
+    """
+    Fetch one page of a query ordered by (key_column, id_column) descending
+
+    Rows after the cursor are selected with an index-friendly range condition
+    instead of OFFSET, so every page costs the same regardless of depth.
+
+    Args:
+        query: SQLAlchemy query to paginate
+        key_column: column ordered on, e.g. Payment.date
+        id_column: unique tiebreaker column, e.g. Payment.id
+        cursor: str, cursor of the previous page
+        per_page: int, rows per page (capped at MAX_PAGE_SIZE)
+        key_type: datetime or date, type of the key column
+        key_of: callable returning (key value, id) for a result row,
+            defaults to reading the column names from the row
+
+    Returns:
+        KeysetPage: the page rows and the cursor for the next page
+    """
+    per_page = max(1, min(per_page, MAX_PAGE_SIZE))
+    position = decode_cursor(cursor, key_type)
+    if position:
+        key_value, row_id = position
+        query = query.filter(db.or_(
+            key_column < key_value,
+            db.and_(key_column == key_value, id_column < row_id)
+        ))
+
+    rows = query.order_by(key_column.desc(), id_column.desc()).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        if key_of is None:
+            last = rows[-1]
+            key_value, row_id = getattr(last, key_column.key), getattr(last, id_column.key)
+        else:
+            key_value, row_id = key_of(rows[-1])
+        next_cursor = encode_cursor(key_value, row_id)
+
+    return KeysetPage(rows, next_cursor, per_page)
+
+def date_range_filter(column, start=None, end=None):
+    """
+    Build filters for an inclusive date range on a datetime column
+
+    Args:
+        column: datetime column to filter
+        start: date, first day included (optional)
+        end: date, last day included (optional)
+
+    Returns:
+        list: filter conditions, empty when no bounds are given
+    """
+    conditions = []
+    if start:
+        conditions.append(column >= datetime.combine(start, time.min))
+    if end:
+        conditions.append(column < datetime.combine(end + timedelta(days=1), time.min))
+    return conditions
+
+def parse_date_arg(value):
+    """Parse an optional YYYY-MM-DD query argument"""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
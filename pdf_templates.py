@@ -0,0 +1,112 @@
+from functools import lru_cache
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate, Paragraph, Spacer, TableStyle
+
+class PdfTemplates:
+    """Styles and table styles shared by every PDF, and builders for its fixed fragments"""
+
+    def __init__(self):
+        self.styles = getSampleStyleSheet()
+
+        self.title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=self.styles['Heading1'],
+            fontSize=24,
+            spaceAfter=30
+        )
+        self.heading_style = self.styles['Heading2']
+        self.normal_style = self.styles['Normal']
+
+        # Two-column key/value tables (bill details, report summary)
+        self.detail_table_style = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ])
+        self.detail_col_widths = [2*inch, 4*inch]
+
+        # Listing tables with a grey header row (income and expense details)
+        self.listing_table_style = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey)
+        ])
+        self.income_col_widths = [1.5*inch, 2*inch, 1.5*inch, 1.5*inch]
+        self.expense_col_widths = [1.5*inch, 1.5*inch, 2*inch, 1.5*inch]
+
+    # Fixed fragments. Flowables keep layout state from wrap and split, so each
+    # document gets its own; only the styles above are shared
+
+    def bill_title(self):
+        return Paragraph("Hostel Bill", self.title_style)
+
+    def bill_footer(self):
+        return Paragraph("Thank you for staying with us!", self.normal_style)
+
+    def income_heading(self):
+        return Paragraph("Income Details", self.heading_style)
+
+    def expense_heading(self):
+        return Paragraph("Expense Details", self.heading_style)
+
+    def small_gap(self):
+        return Spacer(1, 12)
+
+    def section_gap(self):
+        return Spacer(1, 20)
+
+    def footer_gap(self):
+        return Spacer(1, 30)
+
+class StreamingDocTemplate(BaseDocTemplate):
+    """
+    Single-frame document laid out from a stream of flowables
+
+    ``build_stream`` hands the flowables to ``handle_flowable`` as they are
+    produced, so only the flowable being laid out (and any remainder split
+    off it) is held in memory, instead of the whole list ``build`` needs.
+    """
+
+    def __init__(self, filename, **kwargs):
+        super().__init__(filename, **kwargs)
+        frame = Frame(self.leftMargin, self.bottomMargin, self.width, self.height, id='normal')
+        self.addPageTemplates([PageTemplate(id='Page', frames=[frame], pagesize=self.pagesize)])
+
+    def build_stream(self, flowables):
+        """
+        Build the document from an iterable of flowables
+
+        Args:
+            flowables: iterable of flowables, consumed lazily
+        """
+        self._startBuild()
+        self.canv._doctemplate = self
+        try:
+            for flowable in flowables:
+                pending = [flowable]
+                while pending:
+                    self.clean_hanging()
+                    # Lays out the first flowable and puts back any part that spills to the next page
+                    self.handle_flowable(pending)
+        finally:
+            del self.canv._doctemplate
+        self._endBuild()
+
+@lru_cache(maxsize=None)
+def get_templates():
+    """
+    Get the PDF templates for this process
+
+    Returns:
+        PdfTemplates: templates built on first use and reused afterwards
+    """
+    return PdfTemplates()
@@ -0,0 +1,64 @@
+from collections import Counter
+import logging
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from db import db
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class QueryMonitor:
+    """
+    Development-mode SQL statement counter for catching N+1 regressions
+
+    Counts the statements executed while handling each request and logs a
+    warning when a request runs more than ``SQL_MONITOR_MAX_QUERIES``
+    statements, or runs the same statement shape more than
+    ``SQL_MONITOR_MAX_REPEATS`` times (the signature of a lazy load in a loop).
+    """
+
+    def __init__(self, app=None):
+        self.max_queries = 20
+        self.max_repeats = 5
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Install the monitor if enabled (defaults to on in debug mode)"""
+        if not app.config.get('SQL_MONITOR_ENABLED', app.debug):
+            return
+        self.max_queries = app.config.get('SQL_MONITOR_MAX_QUERIES', self.max_queries)
+        self.max_repeats = app.config.get('SQL_MONITOR_MAX_REPEATS', self.max_repeats)
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        logger.info(f"SQL query monitor enabled (max {self.max_queries} queries, "
+                    f"max {self.max_repeats} repeats per request)")
+
+    def _start_request(self):
+        g.sql_statements = Counter()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Statements run outside a request (scheduler, render queue) are ignored
+        if has_request_context() and 'sql_statements' in g:
+            g.sql_statements[statement] += 1
+
+    def _finish_request(self, response):
+        statements = g.pop('sql_statements', None)
+        if statements is None:
+            return response
+
+        total = sum(statements.values())
+        if total > self.max_queries:
+            logger.warning(f"{request.method} {request.path} ran {total} SQL statements "
+                           f"(threshold {self.max_queries})")
+        for statement, count in statements.most_common():
+            if count <= self.max_repeats:
+                break
+            shape = ' '.join(statement.split())[:200]
+            logger.warning(f"Possible N+1 in {request.method} {request.path}: "
+                           f"statement ran {count} times: {shape}")
+        return response
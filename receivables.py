@@ -0,0 +1,244 @@
+import threading
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+import logging
+from sqlalchemy import event
+from db import db
+from models import Guest, Room, Bill, Payment, BillingAccount
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Aging buckets by bill age in days: (key, label, oldest age included)
+AGING_BUCKETS = (
+    ('current', '0-30 days', 30),
+    ('days_31_60', '31-60 days', 60),
+    ('over_60', '60+ days', None)
+)
+
+# Snapshots are rebuilt at least this often so writes from other processes show up
+DEFAULT_TTL = 300
+
+def _bill_amount():
+    # Bills written before amounts were kept in paise only have the float total
+    return db.func.coalesce(Bill.amount_paise, db.cast(db.func.round(Bill.total_amount * 100), db.BigInteger))
+
+def _outstanding_bills():
+    """
+    Each bill's unpaid remainder, with received payments applied oldest bill first
+
+    A guest's paid total covers their bills in generated order, so a bill is
+    unpaid by however much the running billed total exceeds the paid total,
+    capped at the bill's own amount.
+    """
+    amount = _bill_amount()
+    bills = db.select(
+        Bill.guest_id, Bill.room_id, Bill.generated_date, amount.label('amount'),
+        db.func.sum(amount).over(partition_by=Bill.guest_id,
+                                 order_by=(Bill.generated_date, Bill.id)).label('cumulative')
+    ).cte('bills')
+
+    paid = db.func.coalesce(BillingAccount.paid_paise, 0)
+    unpaid = bills.c.cumulative - paid
+    return db.select(
+        bills.c.guest_id, bills.c.room_id, bills.c.generated_date, bills.c.amount,
+        db.case((unpaid <= 0, 0), (unpaid >= bills.c.amount, bills.c.amount), else_=unpaid).label('outstanding')
+    ).select_from(bills.outerjoin(BillingAccount, BillingAccount.guest_id == bills.c.guest_id)).cte('outstanding')
+
+def _bucket_columns(outstanding, as_of):
+    columns = []
+    newer_than = None
+    for key, _, oldest in AGING_BUCKETS:
+        cutoff = datetime.combine(as_of - timedelta(days=oldest), dt_time.min) if oldest is not None else None
+        conditions = []
+        if cutoff is not None:
+            conditions.append(outstanding.c.generated_date >= cutoff)
+        if newer_than is not None:
+            conditions.append(outstanding.c.generated_date < newer_than)
+        in_bucket = db.and_(*conditions) if conditions else db.true()
+        columns.append(db.func.coalesce(
+            db.func.sum(db.case((in_bucket, outstanding.c.outstanding), else_=0)), 0
+        ).label(key))
+        newer_than = cutoff
+    return columns
+
+def compute_receivables(as_of=None):
+    """
+    Compute balances and aging for every guest and room
+
+    The bill-level work (applying payments and bucketing by age) runs once in
+    a single grouped query per (guest, room). Guest names, paid totals and
+    room details come from two plain lookups, and the roll-ups are summed in
+    one pass over the grouped rows.
+
+    Args:
+        as_of: date the bill ages are measured from, defaults to today
+
+    Returns:
+        dict: as_of, totals, guests (sorted by balance, largest first) and rooms
+    """
+    as_of = as_of or date.today()
+    started = time.perf_counter()
+    outstanding = _outstanding_bills()
+    buckets = [key for key, _, _ in AGING_BUCKETS]
+
+    grouped = db.session.execute(
+        db.select(outstanding.c.guest_id, outstanding.c.room_id, db.func.sum(outstanding.c.amount),
+                  *_bucket_columns(outstanding, as_of))
+        .group_by(outstanding.c.guest_id, outstanding.c.room_id)
+    ).all()
+    guest_rows = db.session.execute(
+        db.select(Guest.id, Guest.full_name, Room.room_number, db.func.coalesce(BillingAccount.paid_paise, 0))
+        .join(Room, Guest.room_id == Room.id)
+        .outerjoin(BillingAccount, BillingAccount.guest_id == Guest.id)
+    ).all()
+    room_rows = db.session.execute(db.select(Room.id, Room.room_number, Room.room_type)).all()
+
+    guests = {}
+    for guest_id, full_name, room_number, paid in guest_rows:
+        guests[guest_id] = dict({key: 0 for key in buckets}, guest_id=guest_id, full_name=full_name,
+                                room_number=room_number, billed=0, paid=paid, balance=-paid)
+    rooms = {room_id: dict({key: 0 for key in buckets}, room_id=room_id, room_number=room_number,
+                           room_type=room_type, guests=0, outstanding=0)
+             for room_id, room_number, room_type in room_rows}
+
+    for guest_id, room_id, billed, *aging in grouped:
+        guest = guests[guest_id]
+        guest['billed'] += billed
+        guest['balance'] += billed
+        room = rooms[room_id]
+        room_outstanding = sum(aging)
+        if room_outstanding:
+            room['guests'] += 1
+            room['outstanding'] += room_outstanding
+        for key, amount in zip(buckets, aging):
+            guest[key] += amount
+            room[key] += amount
+
+    guests = [guest for guest in guests.values() if guest['billed'] or guest['paid']]
+    guests.sort(key=lambda guest: (-guest['balance'], guest['guest_id']))
+    rooms = [room for room in rooms.values() if room['outstanding']]
+    rooms.sort(key=lambda room: (-room['outstanding'], room['room_number']))
+
+    totals = dict({key: sum(guest[key] for guest in guests) for key in buckets},
+                  billed=sum(guest['billed'] for guest in guests),
+                  paid=sum(guest['paid'] for guest in guests),
+                  balance=sum(guest['balance'] for guest in guests),
+                  credit=sum(-guest['balance'] for guest in guests if guest['balance'] < 0))
+    totals['outstanding'] = sum(totals[key] for key in buckets)
+
+    logger.info(f"Receivables computed for {len(guests)} guests and {len(rooms)} rooms "
+                f"in {time.perf_counter() - started:.2f}s")
+    return {'as_of': as_of, 'totals': totals, 'guests': guests, 'rooms': rooms}
+
+def guest_balance(guest_id):
+    """
+    Get a guest's balance as shown on the receivables page
+
+    Billed minus received payments; charges not yet on a bill are not
+    included (see ``accrual.unbilled_charges``).
+
+    Returns:
+        int: balance in paise, negative when the guest has paid ahead
+    """
+    billed = db.session.query(db.func.coalesce(db.func.sum(_bill_amount()), 0))\
+        .filter(Bill.guest_id == guest_id).scalar()
+    account = db.session.get(BillingAccount, guest_id)
+    return billed - (account.paid_paise if account else 0)
+
+class ReceivablesCache:
+    """
+    In-process cache of the receivables snapshot
+
+    Committed Bill and Payment changes made through the session invalidate
+    the snapshot. Bulk write paths call ``invalidate`` themselves, and the TTL
+    bounds how stale a snapshot can be after writes from other processes.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._version = 0
+        self._snapshot = None
+        self._key = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+        self._compute_lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+
+    def _cached(self, key):
+        if self._snapshot is not None and self._key == key and time.monotonic() < self._expires:
+            return self._snapshot
+        return None
+
+    def get(self, as_of=None):
+        """
+        Get the snapshot for a date, computing it on a miss
+
+        Concurrent misses wait for a single computation instead of each
+        running the queries.
+        """
+        as_of = as_of or date.today()
+        with self._lock:
+            snapshot = self._cached((self._version, as_of))
+            if snapshot is not None:
+                self.hits += 1
+                return snapshot
+
+        with self._compute_lock:
+            with self._lock:
+                key = (self._version, as_of)
+                snapshot = self._cached(key)
+                if snapshot is not None:
+                    self.hits += 1
+                    return snapshot
+                self.misses += 1
+
+            snapshot = compute_receivables(as_of)
+            with self._lock:
+                # Keep the result only if nothing was invalidated while computing
+                if key[0] == self._version:
+                    self._snapshot = snapshot
+                    self._key = key
+                    self._expires = time.monotonic() + self.ttl
+        return snapshot
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'version': self._version}
+
+receivables_cache = ReceivablesCache()
+
+def invalidate_receivables():
+    """Drop the cached receivables snapshot, e.g. after a bulk write"""
+    receivables_cache.invalidate()
+
+def _after_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Bill, Payment)):
+            session.info['receivables_changed'] = True
+            return
+
+def _after_commit(session):
+    if session.info.pop('receivables_changed', False):
+        receivables_cache.invalidate()
+
+def _after_rollback(session):
+    session.info.pop('receivables_changed', None)
+
+def register_receivables_events(session=None):
+    """
+    Invalidate the receivables snapshot when Bill or Payment changes commit
+
+    Args:
+        session: scoped session to listen on, defaults to ``db.session``
+    """
+    session = session or db.session
+    for name, listener in (('after_flush', _after_flush), ('after_commit', _after_commit),
+                           ('after_rollback', _after_rollback)):
+        if not event.contains(session, name, listener):
+            event.listen(session, name, listener)
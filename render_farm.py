@@ -0,0 +1,224 @@
+import os
+import pickle
+import tempfile
+import threading
+import time
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import logging
+from metrics import (RENDER_FARM_QUEUE_DEPTH, RENDER_FARM_WORKERS, RENDER_FARM_JOB_WAIT, RENDER_FARM_JOB_RENDER,
+                     RENDER_FARM_JOB_LATENCY)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rows per pickled chunk when spooling report rows to a render process
+SPOOL_CHUNK_SIZE = 1000
+
+# Set in render processes, which always render in-process
+_in_worker = False
+
+def _warm_worker():
+    """Load ReportLab, its standard fonts and the cached PDF templates once per render process"""
+    global _in_worker
+    _in_worker = True
+    import reportlab.platypus
+    from reportlab.pdfbase import pdfmetrics
+    from pdf_templates import get_templates
+    for font in ('Helvetica', 'Helvetica-Bold', 'Times-Roman'):
+        pdfmetrics.getFont(font)
+    get_templates()
+
+def _ping():
+    return os.getpid()
+
+def _run_job(func, args, submitted):
+    # Runs in a render process; the timestamps let the dispatcher split queue wait from render time
+    started = time.time()
+    result = func(*args)
+    return result, started - submitted, time.time() - started
+
+def _render_bill(bill, guest, room):
+    from utils import render_bill_pdf
+    return render_bill_pdf(bill, guest, room)
+
+def _spool(rows, folder):
+    # Pickle rows to a temporary file a chunk at a time, so neither process holds them all
+    with tempfile.NamedTemporaryFile('wb', dir=folder, suffix='.rows', delete=False) as f:
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == SPOOL_CHUNK_SIZE:
+                pickle.dump(chunk, f, pickle.HIGHEST_PROTOCOL)
+                chunk = []
+        if chunk:
+            pickle.dump(chunk, f, pickle.HIGHEST_PROTOCOL)
+        return f.name
+
+def _unspool(path):
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield from pickle.load(f)
+            except EOFError:
+                return
+
+def _render_report(year, month, income_path, expense_path, totals, chunk_size, filename):
+    from utils import _render_monthly_report_pdf
+    return _render_monthly_report_pdf(year, month, _unspool(income_path), _unspool(expense_path), totals,
+                                      chunk_size, filename)
+
+class RenderFarm:
+    """
+    Pre-forked pool of PDF render processes
+
+    The processes are all started up front, each with ReportLab, its fonts
+    and the PDF templates already loaded, so no job pays the import and
+    setup cost. Jobs go to them over the pool's local queue and come back as
+    file paths (``BillRender`` for bills). ``generate_bill_pdf`` and ``generate_monthly_report_pdf``
+    dispatch here whenever a farm is running in the calling process; the
+    render queue and billing runs submit their batches directly.
+
+    Queue depth and worker count are exported as gauges, and each job's
+    queue wait, render time and total latency as histograms, on ``/metrics``.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+        self._lock = threading.Lock()
+        self._depth = 0
+
+    @property
+    def running(self):
+        return self._executor is not None
+
+    @property
+    def dispatching(self):
+        """Whether PDF generation in this process goes to the farm"""
+        return self._executor is not None and not _in_worker
+
+    @property
+    def depth(self):
+        """Jobs submitted and not yet finished"""
+        return self._depth
+
+    def start(self, workers=None):
+        """
+        Fork the render processes and wait until all of them are warm
+
+        Start the farm before the process starts other threads, since the
+        render processes are forked where the platform supports it.
+
+        Args:
+            workers: int, number of render processes, defaults to the CPU count
+        """
+        if self._executor is not None:
+            return
+        self.workers = workers or self.workers
+        context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+        started = time.perf_counter()
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                             initializer=_warm_worker)
+        # One ping per process forces every process up now instead of on first use
+        pids = {future.result() for future in [self._executor.submit(_ping) for _ in range(self.workers * 2)]}
+        RENDER_FARM_WORKERS.set(self.workers)
+        logger.info(f"Render farm started {len(pids)} warm workers in {time.perf_counter() - started:.2f}s")
+
+    def stop(self):
+        """Wait for running jobs and stop the render processes"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+            RENDER_FARM_WORKERS.set(0)
+
+    def submit(self, kind, func, *args):
+        """
+        Queue a render job
+
+        Args:
+            kind: str, document kind for the metrics, e.g. 'bill' or 'report'
+            func: picklable module-level function run in a render process
+            *args: its picklable arguments
+
+        Returns:
+            Future: resolves to the function's return value
+        """
+        submitted = time.time()
+        try:
+            inner = self._executor.submit(_run_job, func, args, submitted)
+        except BrokenProcessPool:
+            # A render process died; replace the pool and try once more
+            logger.error("Render farm pool is broken, restarting it")
+            self._restart()
+            inner = self._executor.submit(_run_job, func, args, submitted)
+        self._track(1)
+
+        outer = Future()
+        
+        def done(future):
+            self._track(-1)
+            try:
+                result, wait, duration = future.result()
+            except BaseException as e:
+                outer.set_exception(e)
+                return
+            RENDER_FARM_JOB_WAIT.observe(wait, kind=kind)
+            RENDER_FARM_JOB_RENDER.observe(duration, kind=kind)
+            RENDER_FARM_JOB_LATENCY.observe(time.time() - submitted, kind=kind)
+            outer.set_result(result)
+        inner.add_done_callback(done)
+        return outer
+
+    def map(self, kind, func, items):
+        """Render one job per item and return the results in order"""
+        return [future.result() for future in [self.submit(kind, func, item) for item in items]]
+
+    def render_bill(self, bill, guest, room):
+        """Render a bill PDF in the farm and wait for the BillRender"""
+        from billing import BillSnapshot, GuestSnapshot, RoomSnapshot
+        return self.submit('bill', _render_bill,
+                           BillSnapshot(bill.billing_month, bill.billing_year, bill.total_days,
+                                        bill.discount, bill.total_amount, getattr(bill, 'generated_date', None)),
+                           GuestSnapshot(guest.id, guest.full_name),
+                           RoomSnapshot(room.id, room.room_number, room.room_type, room.price_per_month)).result()
+
+    def render_report(self, year, month, income_data, expense_data, totals, chunk_size, filename, spool_folder=None):
+        """
+        Render a monthly report PDF in the farm and wait for its path
+
+        The income and expense rows are streamed to a temporary spool file
+        that the render process reads back, so rows from a database cursor
+        stay streamed end to end.
+        """
+        if totals is None:
+            income_data = list(income_data)
+            expense_data = list(expense_data)
+            totals = {'total_income': sum(record['amount'] for record in income_data),
+                      'total_expenses': sum(record['amount'] for record in expense_data)}
+        income_path = _spool(income_data, spool_folder)
+        try:
+            expense_path = _spool(expense_data, spool_folder)
+            try:
+                return self.submit('report', _render_report, year, month, income_path, expense_path,
+                                   totals, chunk_size, filename).result()
+            finally:
+                os.remove(expense_path)
+        finally:
+            os.remove(income_path)
+
+    def _track(self, change):
+        with self._lock:
+            self._depth += change
+            RENDER_FARM_QUEUE_DEPTH.set(self._depth)
+
+    def _restart(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        executor.shutdown(wait=False)
+        self.start()
+
+# The render farm of this process, started by worker processes (and web processes if configured)
+render_farm = RenderFarm()
@@ -0,0 +1,179 @@
+import threading
+from datetime import datetime
+import logging
+from db import db
+from models import Guest, Room, Bill, RenderJob
+from billing import BillSnapshot, GuestSnapshot, RoomSnapshot, render_bill_job
+from utils import record_bill_render
+from documents import register_document
+from render_farm import render_farm
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class RenderQueue:
+    """
+    Database-backed queue that renders bill PDFs in the background
+
+    Jobs are stored in the ``render_job`` table, so anything still pending when
+    the process stops is picked up again on the next start. A dispatcher thread
+    claims pending jobs and hands them to the render farm.
+    """
+
+    def __init__(self, app=None, workers=2, max_attempts=3, poll_interval=5.0):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.app = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._owns_farm = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Bind the queue to a Flask app"""
+        self.app = app
+        self.workers = app.config.get('PDF_RENDER_WORKERS', self.workers)
+
+    def start(self):
+        """Start the dispatcher thread, and the render farm unless it is already running"""
+        if self._thread is not None:
+            return
+        with self.app.app_context():
+            # Jobs left running by a previous process never finished
+            RenderJob.query.filter_by(status='running').update({'status': 'pending'})
+            db.session.commit()
+        if not render_farm.running:
+            render_farm.start(self.workers)
+            self._owns_farm = True
+        self._thread = threading.Thread(target=self._run, name='render-queue', daemon=True)
+        self._thread.start()
+        logger.info(f"Render queue started with {render_farm.workers} render workers")
+
+    def stop(self):
+        """Stop the dispatcher and wait for in-flight renders"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._owns_farm:
+            render_farm.stop()
+            self._owns_farm = False
+
+    def enqueue(self, bill):
+        """
+        Queue a bill for PDF rendering
+
+        The job is added to the current session and becomes visible to the
+        dispatcher once the caller commits; call ``notify`` after committing.
+
+        Args:
+            bill: Bill model instance
+
+        Returns:
+            RenderJob: the queued job
+        """
+        bill.pdf_path = None
+        job = RenderJob(bill=bill, status='pending')
+        db.session.add(job)
+        return job
+
+    def notify(self):
+        """Wake the dispatcher so newly committed jobs start immediately"""
+        self._wakeup.set()
+
+    def status(self, bill_id):
+        """
+        Get the rendering status of a bill
+
+        Args:
+            bill_id: int, id of the bill
+
+        Returns:
+            dict: status ('pending', 'running', 'done', 'failed') and pdf_path
+        """
+        bill = Bill.query.get(bill_id)
+        if bill is None:
+            return None
+        job = RenderJob.query.filter_by(bill_id=bill_id).order_by(RenderJob.id.desc()).first()
+        if job is None:
+            status = 'done' if bill.pdf_path else 'pending'
+        else:
+            status = job.status
+        return {'bill_id': bill_id, 'status': status, 'pdf_path': bill.pdf_path}
+
+    def _run(self):
+        with self.app.app_context():
+            while not self._stopping.is_set():
+                try:
+                    processed = self._process_batch()
+                except Exception as e:
+                    logger.error(f"Error in render queue: {str(e)}")
+                    db.session.rollback()
+                    processed = 0
+                finally:
+                    db.session.remove()
+                if not processed:
+                    self._wakeup.wait(self.poll_interval)
+                    self._wakeup.clear()
+
+    def _claim(self, job_id):
+        # Conditional update so two processes never render the same job
+        claimed = RenderJob.query.filter_by(id=job_id, status='pending').update({
+            'status': 'running',
+            'attempts': RenderJob.attempts + 1,
+            'updated_date': datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    def _process_batch(self):
+        pending = db.session.query(RenderJob.id).filter_by(status='pending')\
+            .order_by(RenderJob.id).limit(self.workers * 4).all()
+        claimed = [job_id for (job_id,) in pending if self._claim(job_id)]
+        if not claimed:
+            return 0
+
+        rows = db.session.query(RenderJob, Bill, Guest, Room)\
+            .join(Bill, RenderJob.bill_id == Bill.id)\
+            .join(Guest, Bill.guest_id == Guest.id)\
+            .join(Room, Bill.room_id == Room.id)\
+            .filter(RenderJob.id.in_(claimed)).all()
+
+        futures = []
+        for job, bill, guest, room in rows:
+            render_job = (
+                job.id,
+                BillSnapshot(bill.billing_month, bill.billing_year, bill.total_days,
+                             bill.discount, bill.total_amount, bill.generated_date),
+                GuestSnapshot(guest.id, guest.full_name),
+                RoomSnapshot(room.id, room.room_number, room.room_type, room.price_per_month)
+            )
+            futures.append((job, bill, render_farm.submit('bill', render_bill_job, render_job)))
+
+        for job, bill, future in futures:
+            try:
+                _, render = future.result()
+            except Exception as e:
+                logger.error(f"Render farm failed on bill {bill.id}: {str(e)}")
+                render = None
+            if render is not None:
+                record_bill_render(render)
+                bill.pdf_path = render.path
+                register_document(render.path, 'bill', bill.billing_year, bill.billing_month, bill.id)
+                job.status = 'done'
+                job.error = None
+            elif job.attempts >= self.max_attempts:
+                job.status = 'failed'
+                job.error = 'PDF rendering failed'
+                logger.error(f"Giving up rendering bill {bill.id} after {job.attempts} attempts")
+            else:
+                job.status = 'pending'
+            db.session.commit()
+
+        logger.info(f"Rendered {len(futures)} queued bill PDFs")
+        return len(futures)
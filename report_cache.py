@@ -0,0 +1,114 @@
+import os
+import glob
+import threading
+from collections import OrderedDict
+import logging
+from config import Config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ReportCache:
+    """
+    Cache for monthly report PDFs and page data keyed by (year, month, version)
+
+    PDFs are stored on disk with the data version in their filename, so a
+    month whose data has not changed is served from the existing file across
+    restarts and workers. Page data for the HTML view is kept in a bounded
+    in-process LRU.
+    """
+
+    def __init__(self, reports_folder=None, max_entries=128):
+        self.reports_folder = reports_folder or os.path.join(Config.BASE_DIR, "reports")
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def pdf_filename(self, year, month, version):
+        return f"monthly_report_{year}_{month}_{version}.pdf"
+
+    def get_pdf(self, year, month, version, build):
+        """
+        Get the report PDF for a data version, building it on a miss
+
+        Args:
+            year: int, year of report
+            month: int, month of report
+            version: str, data version from ``monthly_report.report_totals``
+            build: callable taking the target filename and returning the PDF path
+
+        Returns:
+            str: Path to the PDF file
+        """
+        filepath = os.path.join(self.reports_folder, self.pdf_filename(year, month, version))
+        if os.path.exists(filepath):
+            self._record(True, f"report PDF {year}-{month} @ {version}")
+            return filepath
+
+        self._record(False, f"report PDF {year}-{month} @ {version}")
+        filepath = build(self.pdf_filename(year, month, version))
+        self._remove_stale_pdfs(year, month, filepath)
+        return filepath
+
+    def get_page(self, year, month, version, page, build):
+        """
+        Get the HTML page data for a data version, building it on a miss
+
+        Args:
+            year: int, year of report
+            month: int, month of report
+            version: str, data version from ``monthly_report.report_totals``
+            page: int, page number
+            build: callable returning the page data
+
+        Returns:
+            dict: page data
+        """
+        key = (year, month, version, page)
+        with self._lock:
+            data = self._pages.get(key)
+            if data is not None:
+                self._pages.move_to_end(key)
+        if data is not None:
+            self._record(True, f"report page {year}-{month} p{page} @ {version}")
+            return data
+
+        self._record(False, f"report page {year}-{month} p{page} @ {version}")
+        data = build()
+        with self._lock:
+            self._pages[key] = data
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+        return data
+
+    def stats(self):
+        """Get cache hit and miss counters"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+            'entries': len(self._pages)
+        }
+
+    def _record(self, hit, what):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        logger.info(f"Report cache {'hit' if hit else 'miss'}: {what} "
+                    f"(hits={self.hits}, misses={self.misses})")
+
+    def _remove_stale_pdfs(self, year, month, current):
+        # Older versions of the month can never be served again
+        pattern = os.path.join(self.reports_folder, f"monthly_report_{year}_{month}_*.pdf")
+        for path in glob.glob(pattern):
+            if os.path.abspath(path) != os.path.abspath(current):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Could not remove stale report {path}: {str(e)}")
@@ -1,4 +1,10 @@
-from app import app
+import os
+from app import app, init_schema, start_background_jobs
 
 if __name__ == "__main__":
-    app.run(host='0.0.0.0', port=8000, debug=True)
\ No newline at end of file
+    with app.app_context():
+        init_schema()
+    # With the reloader, only the serving child process runs the background jobs
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_jobs(app)
+    app.run(host='0.0.0.0', port=8000, debug=True)
@@ -0,0 +1,180 @@
+import random
+import time
+from datetime import datetime, date, timedelta
+import logging
+from db import db
+from models import Guest, Room, Payment, Expense, ROOM_PRICES, ROOM_CAPACITIES
+from allocation import sync_room_occupancy
+from ledger import rebuild_ledger
+from accrual import rebuild_accounts
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rows inserted per transaction
+DEFAULT_BATCH_SIZE = 10000
+
+EXPENSE_CATEGORIES = ('food', 'vegetables', 'snacks', 'milk', 'electricity', 'salary', 'water', 'meat', 'essentials')
+PAYMENT_STATUSES = ('paid', 'paid', 'paid', 'informed & pending', 'advance')
+FIRST_NAMES = ('Aarav', 'Vivaan', 'Aditya', 'Vihaan', 'Arjun', 'Sai', 'Reyansh', 'Ayaan', 'Krishna', 'Ishaan',
+               'Ananya', 'Diya', 'Aadhya', 'Saanvi', 'Myra', 'Kiara', 'Pari', 'Anika', 'Navya', 'Riya')
+LAST_NAMES = ('Sharma', 'Verma', 'Gupta', 'Singh', 'Kumar', 'Patel', 'Reddy', 'Nair', 'Iyer', 'Yadav',
+              'Thapa', 'Shrestha', 'Joshi', 'Mehta', 'Das')
+CITIES = ('Kathmandu', 'Pokhara', 'Delhi', 'Mumbai', 'Bengaluru', 'Pune', 'Chennai', 'Lalitpur')
+
+def _insert(model, rows):
+    db.session.execute(model.__table__.insert(), rows)
+    db.session.commit()
+
+def _batched(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _insert_batches(model, rows, batch_size, label):
+    inserted = 0
+    try:
+        for batch in _batched(rows, batch_size):
+            _insert(model, batch)
+            inserted += len(batch)
+            if inserted % (batch_size * 10) == 0:
+                logger.info(f"Generated {inserted} {label}")
+    except Exception as e:
+        logger.error(f"Error generating {label}: {str(e)}")
+        db.session.rollback()
+        raise
+    return inserted
+
+def _room_rows(rng, count, offset):
+    room_types = list(ROOM_PRICES)
+    for i in range(offset, offset + count):
+        room_type = rng.choice(room_types)
+        yield {
+            'room_number': f"S{i:06d}",
+            'room_type': room_type,
+            'price_per_month': ROOM_PRICES[room_type],
+            'capacity': ROOM_CAPACITIES[room_type],
+            'beds_occupied': 0,
+            'occupancy': False
+        }
+
+def _guest_rows(rng, count, offset, free_beds, start, today, occupied):
+    span = (today - start).days
+    room_ids = list(free_beds)
+    open_rooms = [room_id for room_id in room_ids if free_beds[room_id] > 0]
+    for i in range(offset, offset + count):
+        check_in = start + timedelta(days=rng.randrange(span))
+        # Most historical guests have left; guests checked in recently stay on while beds are free
+        check_out = None
+        if (today - check_in).days > 180 or rng.random() < 0.3 or not open_rooms:
+            check_out = min(check_in + timedelta(days=rng.randint(30, 720)), today)
+            room_id = rng.choice(room_ids)
+        else:
+            index = rng.randrange(len(open_rooms))
+            room_id = open_rooms[index]
+            free_beds[room_id] -= 1
+            if free_beds[room_id] == 0:
+                open_rooms[index] = open_rooms[-1]
+                open_rooms.pop()
+            occupied.add(room_id)
+        yield {
+            'full_name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            'citizen_number': f"SYN-{i:08d}",
+            'email': f"guest{i:08d}@example.com",
+            'emergency_contact': f"98{rng.randrange(10 ** 8):08d}",
+            'address': rng.choice(CITIES),
+            'date_of_birth': date(1970, 1, 1) + timedelta(days=rng.randrange(365 * 35)),
+            'food_preference': rng.choice(('veg', 'non-veg')),
+            'check_in_date': check_in,
+            'check_out_date': check_out,
+            'last_bill_date': None,
+            'room_id': room_id
+        }
+
+def _payment_rows(rng, count, guest_ids, start_ts, span_seconds):
+    for _ in range(count):
+        yield {
+            'guest_id': rng.choice(guest_ids),
+            'bill_id': None,
+            'amount': float(rng.randrange(1000, 15000)),
+            'date': datetime.fromtimestamp(start_ts + rng.randrange(span_seconds)),
+            'payment_status': rng.choice(PAYMENT_STATUSES)
+        }
+
+def _expense_rows(rng, count, start_ts, span_seconds):
+    for _ in range(count):
+        yield {
+            'category': rng.choice(EXPENSE_CATEGORIES),
+            'description': None,
+            'amount': round(rng.uniform(50, 20000), 2),
+            'date': datetime.fromtimestamp(start_ts + rng.randrange(span_seconds))
+        }
+
+def generate(rooms=10000, guests=100000, payments=2000000, expenses=1000000, years=5, seed=42,
+             batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Populate the database with reproducible synthetic hostel data
+
+    Rows are appended to whatever is already in the database; room numbers,
+    citizen numbers and emails continue from the existing row counts so the
+    unique constraints hold across runs. The same seed against the same
+    starting database produces the same rows, apart from timestamps being
+    relative to today.
+
+    Args:
+        rooms: int, rooms to create
+        guests: int, guests spread over the rooms
+        payments: int, payments spread over the guests
+        expenses: int, expenses across all categories
+        years: int, history length ending today
+        seed: int, random seed
+        batch_size: int, rows inserted per transaction
+
+    Returns:
+        dict: rows created per table, elapsed and rows_per_sec
+    """
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    today = date.today()
+    start = today - timedelta(days=365 * years)
+    start_ts = datetime.combine(start, datetime.min.time()).timestamp()
+    span_seconds = int((datetime.now().timestamp() - start_ts))
+
+    counts = {}
+    counts['rooms'] = _insert_batches(Room, _room_rows(rng, rooms, Room.query.count()), batch_size, 'rooms')
+    free_beds = dict(db.session.query(Room.id, Room.capacity - Room.beds_occupied).order_by(Room.id))
+
+    occupied = set()
+    if guests and free_beds:
+        guest_rows = _guest_rows(rng, guests, Guest.query.count(), free_beds, start, today, occupied)
+        counts['guests'] = _insert_batches(Guest, guest_rows, batch_size, 'guests')
+        sync_room_occupancy(occupied)
+    else:
+        counts['guests'] = 0
+
+    guest_ids = [i for (i,) in db.session.query(Guest.id).order_by(Guest.id)]
+    if payments and guest_ids:
+        counts['payments'] = _insert_batches(Payment, _payment_rows(rng, payments, guest_ids, start_ts, span_seconds),
+                                             batch_size, 'payments')
+    else:
+        counts['payments'] = 0
+    counts['expenses'] = _insert_batches(Expense, _expense_rows(rng, expenses, start_ts, span_seconds),
+                                         batch_size, 'expenses')
+
+    # Bulk inserts bypass the session events that maintain the daily ledger and balances
+    if counts['payments'] or counts['expenses']:
+        rebuild_ledger()
+    if counts['payments']:
+        rebuild_accounts()
+
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    rows_per_sec = total / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Generated {counts} in {elapsed:.1f}s ({rows_per_sec:.0f} rows/sec)")
+    return dict(counts, elapsed=elapsed, rows_per_sec=rows_per_sec)
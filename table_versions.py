@@ -0,0 +1,72 @@
+from datetime import datetime
+import logging
+from sqlalchemy import event
+from db import db
+from models import TableVersion
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tables whose writes are counted
+TRACKED_TABLES = ('room', 'guest', 'bill', 'payment', 'expense')
+
+def _bump(connection, table_name):
+    table = TableVersion.__table__
+    now = datetime.utcnow()
+    updated = connection.execute(
+        table.update().where(table.c.table_name == table_name)
+        .values(version=table.c.version + 1, updated_date=now)
+    )
+    if updated.rowcount == 0:
+        connection.execute(table.insert().values(table_name=table_name, version=1, updated_date=now))
+
+def _after_execute(connection, clauseelement, multiparams, params, execution_options, result):
+    if not getattr(clauseelement, 'is_dml', False):
+        return
+    table_name = getattr(getattr(clauseelement, 'table', None), 'name', None)
+    if table_name not in TRACKED_TABLES:
+        return
+    # One bump per table per transaction is enough to change its version
+    bumped = connection.info.setdefault('bumped_tables', set())
+    if table_name not in bumped:
+        bumped.add(table_name)
+        _bump(connection, table_name)
+
+def _reset(connection):
+    connection.info.pop('bumped_tables', None)
+
+def register_version_events(engine):
+    """
+    Count writes to the tracked tables in the ``table_version`` table
+
+    Every INSERT, UPDATE or DELETE statement on a tracked table, whether from
+    an ORM flush or a Core bulk statement, bumps that table's version inside
+    the same transaction, so a rolled back write leaves the version unchanged.
+    Raw SQL strings are not seen.
+
+    Args:
+        engine: SQLAlchemy engine to listen on
+    """
+    for name, listener in (('after_execute', _after_execute), ('begin', _reset),
+                           ('commit', _reset), ('rollback', _reset)):
+        if not event.contains(engine, name, listener):
+            event.listen(engine, name, listener)
+
+def table_versions(table_names):
+    """
+    Get the current version and last write time of some tables in one query
+
+    Args:
+        table_names: iterable of table names
+
+    Returns:
+        tuple: (versions in the order given, latest write time or None)
+    """
+    table_names = list(table_names)
+    rows = db.session.query(TableVersion.table_name, TableVersion.version, TableVersion.updated_date)\
+        .filter(TableVersion.table_name.in_(table_names)).all()
+    found = {name: (version, updated) for name, version, updated in rows}
+    versions = tuple(found.get(name, (0, None))[0] for name in table_names)
+    times = [updated for _, updated in found.values() if updated is not None]
+    return versions, max(times) if times else None
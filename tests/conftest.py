@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    from config import Config
+    from app import create_app
+    from db import db
+    monkeypatch.setattr(Config, 'BILLS_PATH', str(tmp_path / 'bills'))
+    app = create_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}", AUTO_CREATE_SCHEMA=True,
+                     TESTING=True)
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,44 @@
+import threading
+
+from db import db
+from models import Room
+from allocation import allocate_bed
+
+THREADS = 24
+
+def test_concurrent_allocations_never_overbook(app):
+    assert db.session.execute(db.text('PRAGMA journal_mode')).scalar() == 'wal'
+    room = Room('101', '4 seater')
+    db.session.add(room)
+    db.session.commit()
+    room_id = room.id
+
+    start = threading.Barrier(THREADS)
+    claims = []
+    errors = []
+
+    def claim():
+        with app.app_context():
+            try:
+                start.wait()
+                claimed = allocate_bed(room_id)
+                db.session.commit()
+                claims.append(claimed)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=claim) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(claims) == THREADS
+    assert claims.count(True) == room.capacity
+    db.session.expire_all()
+    room = db.session.get(Room, room_id)
+    assert room.beds_occupied == room.capacity
+    assert room.occupancy
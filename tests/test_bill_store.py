@@ -0,0 +1,27 @@
+import os
+from datetime import datetime
+
+from billing import BillSnapshot, GuestSnapshot, RoomSnapshot
+from utils import render_bill_pdf
+
+BILL = BillSnapshot(5, 2024, 31, 0.0, 12000.0, datetime(2024, 5, 27))
+ROOM = RoomSnapshot(1, '101', '1 seater', 12000)
+
+def test_same_bill_reuses_its_pdf(app):
+    first = render_bill_pdf(BILL, GuestSnapshot(1, 'Test Guest'), ROOM)
+    again = render_bill_pdf(BILL, GuestSnapshot(1, 'Test Guest'), ROOM)
+
+    assert first.status == 'rendered'
+    assert again.status == 'reused'
+    assert again.path == first.path
+    assert again.saved_bytes == os.path.getsize(first.path)
+
+def test_changed_field_gets_its_own_pdf(app):
+    first = render_bill_pdf(BILL, GuestSnapshot(1, 'Test Guest'), ROOM)
+    renamed = render_bill_pdf(BILL, GuestSnapshot(1, 'Other Guest'), ROOM)
+    discounted = render_bill_pdf(BILL._replace(discount=500.0, total_amount=11500.0),
+                                 GuestSnapshot(1, 'Test Guest'), ROOM)
+
+    assert renamed.status == discounted.status == 'rendered'
+    assert len({first.path, renamed.path, discounted.path}) == 3
+    assert all(os.path.exists(render.path) for render in (first, renamed, discounted))
@@ -0,0 +1,109 @@
+import os
+from datetime import date, datetime, timedelta
+
+from db import db
+from models import Guest, Room, Bill, Accrual, Payment, BillingAccount
+from accrual import unbilled_charges, outstanding_balance, rebuild_accounts, charge_paise
+from receivables import guest_balance
+import billing
+from billing import run_billing
+
+def make_guest(check_in_date):
+    room = Room('101', '1 seater')
+    db.session.add(room)
+    db.session.commit()
+    guest = Guest(full_name='Test Guest', citizen_number='c1', email='guest@example.com', emergency_contact='1',
+                  address='a', date_of_birth=date(2000, 1, 1), food_preference='veg',
+                  check_in_date=check_in_date, room_id=room.id)
+    db.session.add(guest)
+    db.session.commit()
+    return guest, room
+
+def test_manual_bill_is_not_billed_again_by_run_billing(app):
+    today = date.today()
+    guest, room = make_guest(today - timedelta(days=60))
+    run_billing(datetime.combine(today - timedelta(days=30), datetime.min.time()), workers=1)
+
+    days, _ = unbilled_charges(guest, room)
+    assert days == 30
+    response = app.test_client().post(f'/bill/{guest.id}', data={'total_days': days, 'discount': 0})
+    assert response.status_code == 302
+
+    manual = Bill.query.filter_by(idempotency_key=None).one()
+    assert sum(accrual.days for accrual in Accrual.query.filter_by(bill_id=manual.id)) == 30
+    assert unbilled_charges(guest, room) == (0, 0)
+
+    run_billing(datetime.combine(today + timedelta(days=31), datetime.min.time()), workers=1)
+    latest = Bill.query.order_by(Bill.id.desc()).first()
+    assert latest.total_days == 31
+    assert sum(bill.total_days for bill in Bill.query) == 60 + 31
+
+def test_manual_bill_keeps_account_and_billed_balances_equal(app):
+    today = date.today()
+    guest, room = make_guest(today - timedelta(days=45))
+    db.session.add(Payment(guest_id=guest.id, amount=1000, payment_status='paid'))
+    db.session.commit()
+
+    # The submitted day count is ignored: the bill covers every unbilled day
+    response = app.test_client().post(f'/bill/{guest.id}', data={'total_days': 5, 'discount': 250.50})
+    assert response.status_code == 302
+
+    manual = Bill.query.one()
+    assert manual.total_days == 45
+    assert manual.amount_paise == charge_paise(room.price_per_month, 45) - 25050
+    assert unbilled_charges(guest, room) == (0, 0)
+    assert outstanding_balance(guest.id) == guest_balance(guest.id)
+
+    rebuild_accounts()
+    assert outstanding_balance(guest.id) == guest_balance(guest.id)
+
+    run_billing(datetime.combine(today + timedelta(days=31), datetime.min.time()), workers=1)
+    assert outstanding_balance(guest.id) == guest_balance(guest.id)
+
+def test_payment_updates_and_deletes_keep_paid_balance_in_step(app):
+    guest, room = make_guest(date.today() - timedelta(days=10))
+    payments = [Payment(guest_id=guest.id, amount=100.0 * (i + 1), date=datetime(2024, 5, i + 1),
+                        payment_status='paid') for i in range(3)]
+    db.session.add_all(payments)
+    db.session.commit()
+
+    payments[0].amount = 150.0
+    payments[1].payment_status = 'informed & pending'
+    db.session.commit()
+    db.session.delete(payments[2])
+    db.session.commit()
+
+    paid = db.session.get(BillingAccount, guest.id).paid_paise
+    assert paid == 15000
+    rebuild_accounts()
+    assert db.session.get(BillingAccount, guest.id).paid_paise == paid
+
+def test_race_keeps_pdf_shared_with_a_surviving_bill(app, monkeypatch):
+    room = Room('201', '4 seater')
+    db.session.add(room)
+    db.session.commit()
+    # Same name and room, so both bills render to one shared file
+    guests = [Guest(full_name='Twin Guest', citizen_number=f'c{n}', email=f'twin{n}@example.com',
+                    emergency_contact='1', address='a', date_of_birth=date(2000, 1, 1), food_preference='veg',
+                    check_in_date=date.today() - timedelta(days=30), room_id=room.id) for n in range(2)]
+    db.session.add_all(guests)
+    db.session.commit()
+    taken, survivor = guests
+    current_date = datetime.now()
+
+    write_chunk = billing._write_chunk
+    def racing_write_chunk(bill_rows, *args):
+        # Another run bills the first guest between the check and the write
+        if not Bill.query.filter_by(guest_id=taken.id).count():
+            db.session.add(Bill(guest_id=taken.id, room_id=room.id, billing_month=current_date.month,
+                                billing_year=current_date.year, total_days=30, total_amount=0.0,
+                                idempotency_key=billing.billing_key(taken.id, current_date.year, current_date.month)))
+            db.session.commit()
+        return write_chunk(bill_rows, *args)
+    monkeypatch.setattr(billing, '_write_chunk', racing_write_chunk)
+
+    summary = run_billing(current_date, workers=1)
+
+    assert summary['billed'] == 1 and summary['skipped'] == 1
+    bill = Bill.query.filter_by(guest_id=survivor.id).one()
+    assert bill.pdf_path and os.path.exists(bill.pdf_path)
@@ -0,0 +1,31 @@
+import re
+from datetime import date, timedelta
+from html import unescape
+
+from db import db
+from models import Guest, Room
+
+def test_guest_listing_pages_by_cursor(app):
+    room = Room('101', '4 seater')
+    db.session.add(room)
+    db.session.commit()
+    for i in range(7):
+        db.session.add(Guest(full_name=f'Guest {i}', citizen_number=f'c{i}', email=f'guest{i}@example.com',
+                             emergency_contact='1', address='a', date_of_birth=date(2000, 1, 1),
+                             food_preference='veg', check_in_date=date.today() - timedelta(days=i),
+                             room_id=room.id))
+    db.session.commit()
+    client = app.test_client()
+
+    assert client.get('/guests').status_code == 200
+    first = client.get('/guests?per_page=5')
+    assert first.status_code == 200
+    next_url = re.search(r'href="(/guests\?[^"]*cursor=[^"]+)"', first.data.decode())
+    assert next_url is not None
+
+    assert len(set(re.findall(r'Guest \d', first.data.decode()))) == 5
+
+    second = client.get(unescape(next_url.group(1)))
+    assert second.status_code == 200
+    names = set(re.findall(r'Guest \d', first.data.decode())) | set(re.findall(r'Guest \d', second.data.decode()))
+    assert names == {f'Guest {i}' for i in range(7)}
@@ -0,0 +1,64 @@
+import threading
+from datetime import datetime, timedelta
+
+from db import db
+from models import JobRun
+from job_scheduler import claim_run, acquire_lease, release_lease
+
+OWNERS = ('host-a:1', 'host-b:2')
+
+def test_only_one_owner_claims_a_run(app):
+    start = threading.Barrier(len(OWNERS))
+    claims = {}
+    errors = []
+
+    def claim(owner):
+        with app.app_context():
+            try:
+                start.wait()
+                run = claim_run('auto_generate_bills', '2024-05', owner, stale_after=3600)
+                claims[owner] = run is not None
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=claim, args=(owner,)) for owner in OWNERS]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(claims.values()) == [False, True]
+    run = JobRun.query.filter_by(job_name='auto_generate_bills', run_key='2024-05').one()
+    assert claims[run.owner]
+    assert run.attempts == 1
+
+def test_stale_claim_is_taken_over(app):
+    first, second = OWNERS
+    run = claim_run('auto_generate_bills', '2024-05', first, stale_after=3600)
+    assert run is not None
+    assert claim_run('auto_generate_bills', '2024-05', second, stale_after=3600) is None
+
+    # The first owner died mid-run
+    run.started_date = datetime.utcnow() - timedelta(hours=2)
+    db.session.commit()
+
+    run = claim_run('auto_generate_bills', '2024-05', second, stale_after=3600)
+    assert run is not None
+    assert run.owner == second
+    assert run.attempts == 2
+
+def test_lease_is_held_until_it_expires(app):
+    first, second = OWNERS
+    assert acquire_lease(first, ttl=60)
+    assert not acquire_lease(second, ttl=60)
+    # The holder renews its own lease
+    assert acquire_lease(first, ttl=-1)
+    # An expired lease can be taken
+    assert acquire_lease(second, ttl=60)
+    assert not acquire_lease(first, ttl=60)
+
+    release_lease(second)
+    assert acquire_lease(first, ttl=60)
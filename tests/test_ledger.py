@@ -0,0 +1,48 @@
+from datetime import date, datetime
+
+from db import db
+from models import Guest, Room, Payment, Expense, DailyLedger
+from ledger import rebuild_ledger
+
+def ledger_rows():
+    return sorted((row.day, row.kind, row.category, round(row.total, 2), row.count)
+                  for row in DailyLedger.query if row.count)
+
+def make_guest(room_number, room_type, n):
+    room = Room(room_number, room_type)
+    db.session.add(room)
+    db.session.flush()
+    guest = Guest(full_name=f'Guest {n}', citizen_number=f'c{n}', email=f'guest{n}@example.com',
+                  emergency_contact='1', address='a', date_of_birth=date(2000, 1, 1), food_preference='veg',
+                  check_in_date=date(2024, 1, 1), room_id=room.id)
+    db.session.add(guest)
+    db.session.commit()
+    return guest
+
+def test_ledger_follows_inserts_updates_and_deletes(app):
+    single = make_guest('101', '1 seater', 1)
+    shared = make_guest('201', '4 seater', 2)
+
+    payments = [Payment(guest_id=single.id, amount=100.0 * (i + 1), date=datetime(2024, 5, i + 1),
+                        payment_status='paid') for i in range(4)]
+    expenses = [Expense(category='food', description='d', amount=40.0 * (i + 1), date=datetime(2024, 5, i + 1))
+                for i in range(4)]
+    db.session.add_all(payments + expenses)
+    db.session.commit()
+
+    payments[0].amount = 150.0
+    payments[1].date = datetime(2024, 6, 10)
+    payments[2].guest_id = shared.id
+    payments[3].payment_status = 'advance'
+    expenses[0].amount = 55.5
+    expenses[1].category = 'milk'
+    expenses[2].date = datetime(2024, 4, 30)
+    db.session.commit()
+
+    db.session.delete(payments[0])
+    db.session.delete(expenses[3])
+    db.session.commit()
+
+    incremental = ledger_rows()
+    rebuild_ledger()
+    assert incremental == ledger_rows()
@@ -1,52 +1,61 @@
+import io
 import os
-from datetime import datetime
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
+import tempfile
+from time import perf_counter
+from datetime import datetime, date, time
 import logging
 from config import Config
+from metrics import timed_pdf, BILL_RENDERS, BILL_RENDER_SAVED_BYTES, BILL_RENDER_SAVED_TIME
+from render_farm import render_farm
+import bill_store
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def calculate_bill(guest, room, last_bill_date, current_date, discount=0):
+# Rows per table in the monthly report PDF
+REPORT_TABLE_CHUNK_SIZE = 200
+
+def month_range(year, month):
     """
-    Calculate bill amount for a guest
+    Get the half-open date range covering a month
     
     Args:
-        guest: Guest model instance
-        room: Room model instance
-        last_bill_date: datetime object of last bill date
-        current_date: datetime object of current date
-        discount: float, discount amount
+        year: int, year
+        month: int, month
     
     Returns:
-        tuple: (total_days, total_amount)
+        tuple: (first day of the month, first day of the next month)
     """
-    try:
-        # Calculate total days
-        delta = current_date - last_bill_date
-        total_days = delta.days
-        
-        # Calculate daily rate (monthly rate / 30)
-        daily_rate = room.price_per_month / 30
-        
-        # Calculate total amount
-        total_amount = (total_days * daily_rate) - discount
-        
-        return total_days, round(total_amount, 2)
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+def month_datetime_range(year, month):
+    """
+    Get the half-open datetime range covering a month
     
-    except Exception as e:
-        logger.error(f"Error calculating bill: {str(e)}")
-        raise
+    Filtering ``start <= column < end`` lets the database use an index on
+    the column, unlike extracting the month and year from every row.
+    
+    Args:
+        year: int, year
+        month: int, month
+    
+    Returns:
+        tuple: (midnight of the first day, midnight of the first day of the next month)
+    """
+    start, end = month_range(year, month)
+    return datetime.combine(start, time.min), datetime.combine(end, time.min)
 
+@timed_pdf('bill')
 def generate_bill_pdf(bill, guest, room):
     """
     Generate PDF bill for a guest
     
+    Rendered by the render farm when one is running in this process. See
+    ``render_bill_pdf`` for how identical bills are deduplicated.
+    
     Args:
         bill: Bill model instance
         guest: Guest model instance
@@ -55,84 +64,157 @@ def generate_bill_pdf(bill, guest, room):
     Returns:
         str: Path to generated PDF file
     """
+    if render_farm.dispatching:
+        render = render_farm.render_bill(bill, guest, room)
+    else:
+        render = render_bill_pdf(bill, guest, room)
+    record_bill_render(render)
+    return render.path
+
+def _bill_rows(bill, guest, room):
+    # Everything printed on the bill; the bill date comes from the bill so a re-render is identical
+    bill_date = getattr(bill, 'generated_date', None) or datetime.now()
+    return [
+        ["Bill Date:", bill_date.strftime("%d-%m-%Y")],
+        ["Guest Name:", guest.full_name],
+        ["Room Number:", room.room_number],
+        ["Room Type:", room.room_type],
+        ["Period:", f"{bill.billing_month}-{bill.billing_year}"],
+        ["Total Days:", str(bill.total_days)],
+        ["Rate per Month:", f"₹{room.price_per_month}"],
+        ["Discount:", f"₹{bill.discount}"],
+        ["Total Amount:", f"₹{bill.total_amount}"]
+    ]
+
+def render_bill_pdf(bill, guest, room):
+    """
+    Render a bill PDF, or reuse an identical one
+    
+    Rendering is deterministic: ReportLab's invariant mode fixes the creation
+    date and document id, and the metadata is fixed, so the same bill always
+    gives the same bytes. The file is stored under its content hash (see
+    ``bill_store.store``), so identical bills share one file. Bills whose
+    printed fields hash to an earlier render are not rendered at all.
+    
+    Args:
+        bill: Bill model instance or BillSnapshot
+        guest: Guest model instance or GuestSnapshot
+        room: Room model instance or RoomSnapshot
+    
+    Returns:
+        BillRender: path of the PDF file, how it was produced and what was saved
+    """
+    # ReportLab is only imported by processes that render PDFs
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table
+    from pdf_templates import get_templates
+    
     try:
-        # Create the bills directory for current month if it doesn't exist
-        bills_folder = Config.get_current_bills_folder()
+        bill_info = _bill_rows(bill, guest, room)
+        key = bill_store.input_hash(bill_info)
+        earlier = bill_store.lookup(key)
+        if earlier is not None:
+            return bill_store.BillRender(earlier['path'], 'reused', 0.0, earlier['seconds'], earlier['size'])
         
-        # Generate PDF filename
-        filename = f"bill_{guest.full_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        filepath = os.path.join(bills_folder, filename)
+        started = perf_counter()
         
-        # Create PDF document
-        doc = SimpleDocTemplate(filepath, pagesize=letter)
-        styles = getSampleStyleSheet()
+        # Create PDF document in memory with fixed metadata
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=letter, invariant=1, title="Hostel Bill",
+                                author="Hostel Management", subject=f"Bill {bill.billing_month}-{bill.billing_year}",
+                                creator="Hostel Management")
+        templates = get_templates()
         elements = []
         
         # Add title
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30
-        )
-        elements.append(Paragraph("Hostel Bill", title_style))
-        elements.append(Spacer(1, 12))
-        
-        # Add bill details
-        bill_date = datetime.now().strftime("%d-%m-%Y")
-        bill_info = [
-            ["Bill Date:", bill_date],
-            ["Guest Name:", guest.full_name],
-            ["Room Number:", room.room_number],
-            ["Room Type:", room.room_type],
-            ["Period:", f"{bill.billing_month}-{bill.billing_year}"],
-            ["Total Days:", str(bill.total_days)],
-            ["Rate per Month:", f"₹{room.price_per_month}"],
-            ["Discount:", f"₹{bill.discount}"],
-            ["Total Amount:", f"₹{bill.total_amount}"]
-        ]
+        elements.append(templates.bill_title())
+        elements.append(templates.small_gap())
         
-        # Create table
-        table = Table(bill_info, colWidths=[2*inch, 4*inch])
-        table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
+        # Create table of bill details
+        table = Table(bill_info, colWidths=templates.detail_col_widths)
+        table.setStyle(templates.detail_table_style)
         
         elements.append(table)
         
         # Add footer
-        elements.append(Spacer(1, 30))
-        footer_text = "Thank you for staying with us!"
-        elements.append(Paragraph(footer_text, styles["Normal"]))
+        elements.append(templates.footer_gap())
+        elements.append(templates.bill_footer())
         
         # Build PDF
         doc.build(elements)
-        logger.info(f"PDF bill generated successfully: {filepath}")
+        data = buffer.getvalue()
+        seconds = perf_counter() - started
         
-        return filepath
+        filepath, existed = bill_store.store(data, bill.billing_year, bill.billing_month, key, seconds)
+        if existed:
+            logger.info(f"PDF bill identical to an existing file: {filepath}")
+            return bill_store.BillRender(filepath, 'deduplicated', seconds, 0.0, len(data))
+        logger.info(f"PDF bill generated successfully: {filepath}")
+        return bill_store.BillRender(filepath, 'rendered', seconds, 0.0, 0)
     
     except Exception as e:
         logger.error(f"Error generating PDF bill: {str(e)}")
         raise
 
-def generate_monthly_report_pdf(year, month, income_data, expense_data):
+def record_bill_render(render):
+    """Count a bill render and what deduplication saved in the metrics of this process"""
+    BILL_RENDERS.inc(result=render.status)
+    BILL_RENDER_SAVED_BYTES.inc(render.saved_bytes)
+    BILL_RENDER_SAVED_TIME.inc(render.saved_seconds)
+
+def _table_chunks(header, rows, col_widths, style, chunk_size):
+    """Yield fixed-size Table flowables for a stream of table rows"""
+    from reportlab.platypus import Table
+    
+    chunk = []
+    emitted = False
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            table = Table([header] + chunk, colWidths=col_widths, repeatRows=1)
+            table.setStyle(style)
+            yield table
+            emitted = True
+            chunk = []
+    if chunk or not emitted:
+        table = Table([header] + chunk, colWidths=col_widths, repeatRows=1)
+        table.setStyle(style)
+        yield table
+
+@timed_pdf('report')
+def generate_monthly_report_pdf(year, month, income_data, expense_data, totals=None,
+                                chunk_size=REPORT_TABLE_CHUNK_SIZE, filename=None):
     """
     Generate monthly financial report PDF
     
+    Income and expense records are consumed lazily and laid out as a series of
+    fixed-size tables, so iterators (e.g. from ``monthly_report``) can be
+    streamed into the PDF without holding the whole month in memory. When a
+    render farm is running in this process the rows are spooled to one of
+    its workers, still streamed.
+    
     Args:
         year: int, year of report
         month: int, month of report
-        income_data: list of income records
-        expense_data: list of expense records
+        income_data: iterable of income records
+        expense_data: iterable of expense records
+        totals: dict with total_income and total_expenses, computed from the
+            records when omitted (which requires them to be lists)
+        chunk_size: int, rows per table chunk
+        filename: str, name of the PDF file in the reports folder
     
     Returns:
         str: Path to generated PDF file
     """
+    if render_farm.dispatching:
+        return render_farm.render_report(year, month, income_data, expense_data, totals, chunk_size, filename)
+    return _render_monthly_report_pdf(year, month, income_data, expense_data, totals, chunk_size, filename)
+
+def _render_monthly_report_pdf(year, month, income_data, expense_data, totals, chunk_size, filename):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import Paragraph, Table
+    from pdf_templates import StreamingDocTemplate, get_templates
+    
     try:
         # Create the reports directory if it doesn't exist
         reports_folder = os.path.join(Config.BASE_DIR, "reports")
@@ -140,104 +222,81 @@ def generate_monthly_report_pdf(year, month, income_data, expense_data):
             os.makedirs(reports_folder)
         
         # Generate PDF filename
-        filename = f"monthly_report_{year}_{month}.pdf"
+        filename = filename or f"monthly_report_{year}_{month}.pdf"
         filepath = os.path.join(reports_folder, filename)
         
-        # Create PDF document
-        doc = SimpleDocTemplate(filepath, pagesize=letter)
-        styles = getSampleStyleSheet()
-        elements = []
-        
-        # Add title
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30
-        )
-        elements.append(Paragraph(f"Financial Report - {month}/{year}", title_style))
-        elements.append(Spacer(1, 12))
-        
         # Calculate totals
-        total_income = sum(record['amount'] for record in income_data)
-        total_expenses = sum(record['amount'] for record in expense_data)
+        if totals is None:
+            income_data = list(income_data)
+            expense_data = list(expense_data)
+            total_income = sum(record['amount'] for record in income_data)
+            total_expenses = sum(record['amount'] for record in expense_data)
+        else:
+            total_income = totals['total_income']
+            total_expenses = totals['total_expenses']
         net_balance = total_income - total_expenses
         
-        # Add summary
-        summary_data = [
-            ["Total Income:", f"₹{total_income}"],
-            ["Total Expenses:", f"₹{total_expenses}"],
-            ["Net Balance:", f"₹{net_balance}"]
-        ]
-        
-        summary_table = Table(summary_data, colWidths=[2*inch, 4*inch])
-        summary_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(summary_table)
-        elements.append(Spacer(1, 20))
+        # Create PDF document in a temporary file, moved into place once complete, so a
+        # concurrent request never serves a half-written report
+        fd, tmp_path = tempfile.mkstemp(dir=reports_folder, prefix=f".{filename}.", suffix='.tmp')
+        os.close(fd)
+        doc = StreamingDocTemplate(tmp_path, pagesize=letter, pageCompression=1)
+        templates = get_templates()
         
-        # Add detailed income table
-        elements.append(Paragraph("Income Details", styles['Heading2']))
-        elements.append(Spacer(1, 12))
-        
-        income_table_data = [["Date", "Guest", "Amount", "Status"]]
-        for record in income_data:
-            income_table_data.append([
+        def elements():
+            # Add title
+            yield Paragraph(f"Financial Report - {month}/{year}", templates.title_style)
+            yield templates.small_gap()
+            
+            # Add summary
+            summary_data = [
+                ["Total Income:", f"₹{total_income}"],
+                ["Total Expenses:", f"₹{total_expenses}"],
+                ["Net Balance:", f"₹{net_balance}"]
+            ]
+            
+            summary_table = Table(summary_data, colWidths=templates.detail_col_widths)
+            summary_table.setStyle(templates.detail_table_style)
+            
+            yield summary_table
+            yield templates.section_gap()
+            
+            # Add detailed income tables
+            yield templates.income_heading()
+            yield templates.small_gap()
+            
+            income_rows = ([
                 record['date'].strftime("%d-%m-%Y"),
                 record['guest_name'],
                 f"₹{record['amount']}",
                 record['status']
-            ])
-        
-        income_table = Table(income_table_data, colWidths=[1.5*inch, 2*inch, 1.5*inch, 1.5*inch])
-        income_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey)
-        ]))
-        
-        elements.append(income_table)
-        elements.append(Spacer(1, 20))
-        
-        # Add detailed expense table
-        elements.append(Paragraph("Expense Details", styles['Heading2']))
-        elements.append(Spacer(1, 12))
-        
-        expense_table_data = [["Date", "Category", "Description", "Amount"]]
-        for record in expense_data:
-            expense_table_data.append([
+            ] for record in income_data)
+            yield from _table_chunks(["Date", "Guest", "Amount", "Status"], income_rows,
+                                     templates.income_col_widths, templates.listing_table_style,
+                                     chunk_size)
+            yield templates.section_gap()
+            
+            # Add detailed expense tables
+            yield templates.expense_heading()
+            yield templates.small_gap()
+            
+            expense_rows = ([
                 record['date'].strftime("%d-%m-%Y"),
                 record['category'],
                 record['description'],
                 f"₹{record['amount']}"
-            ])
-        
-        expense_table = Table(expense_table_data, colWidths=[1.5*inch, 1.5*inch, 2*inch, 1.5*inch])
-        expense_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey)
-        ]))
-        
-        elements.append(expense_table)
+            ] for record in expense_data)
+            yield from _table_chunks(["Date", "Category", "Description", "Amount"], expense_rows,
+                                     templates.expense_col_widths, templates.listing_table_style,
+                                     chunk_size)
         
         # Build PDF
-        doc.build(elements)
+        try:
+            doc.build_stream(elements())
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
         logger.info(f"Monthly report PDF generated successfully: {filepath}")
         
         return filepath
@@ -245,68 +304,3 @@ def generate_monthly_report_pdf(year, month, income_data, expense_data):
     except Exception as e:
         logger.error(f"Error generating monthly report PDF: {str(e)}")
         raise
-
-def auto_generate_bills():
-    """
-    Automatically generate bills for all active guests on the 27th of each month
-    """
-    from models import Guest, Room, Bill
-    
-    try:
-        current_date = datetime.now()
-        
-        # Only proceed if it's the 27th of the month
-        if current_date.day == 27:
-            logger.info("Starting automatic bill generation")
-            
-            # Get all guests
-            guests = Guest.query.all()
-            
-            for guest in guests:
-                try:
-                    # Get associated room
-                    room = Room.query.filter_by(id=guest.room_id).first()
-                    if not room:
-                        logger.warning(f"No room found for guest {guest.id}")
-                        continue
-                    
-                    # Calculate bill
-                    last_bill_date = guest.last_bill_date or guest.check_in_date
-                    total_days, total_amount = calculate_bill(
-                        guest, room, last_bill_date, current_date
-                    )
-                    
-                    # Create new bill
-                    bill = Bill(
-                        guest_id=guest.id,
-                        room_id=room.id,
-                        billing_month=current_date.month,
-                        billing_year=current_date.year,
-                        total_days=total_days,
-                        total_amount=total_amount,
-                        generated_date=current_date
-                    )
-                    
-                    # Generate PDF
-                    pdf_path = generate_bill_pdf(bill, guest, room)
-                    bill.pdf_path = pdf_path
-                    
-                    # Update guest's last bill date
-                    guest.last_bill_date = current_date
-                    
-                    # Save to database
-                    db.session.add(bill)
-                    db.session.commit()
-                    
-                    logger.info(f"Bill generated successfully for guest {guest.id}")
-                
-                except Exception as e:
-                    logger.error(f"Error generating bill for guest {guest.id}: {str(e)}")
-                    db.session.rollback()
-                    continue
-            
-            logger.info("Automatic bill generation completed")
-    
-    except Exception as e:
-        logger.error(f"Error in auto_generate_bills: {str(e)}")
-        raise
\ No newline at end of file